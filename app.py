@@ -22,12 +22,15 @@ HONEYPOT_FIELD      = os.environ.get("HONEYPOT_FIELD", "hp_website")
 # Import analytics/behavior tracking functions
 from project.analyze_events import (
     save_session_result,
-    compute_behavioral_metrics,
-    compute_cognitive_metrics,
     aggregate_metrics,
     export_all,
     erase_participant,
+    count_sessions,
+    session_metrics,
+    iter_session_lines,
 )
+from project.metrics_table import get_metrics_table
+from project import columnar_export, erasure, log_metrics, log_segments, participant_index
 
 
 # ---------------------------
@@ -35,10 +38,36 @@ from project.analyze_events import (
 # ---------------------------
 app = Flask(__name__)
 
+# Counters are shared by all workers on the host through a SQLite WAL file
+# (project/limiter_storage.py registers the sqlite:// scheme). Set
+# LIMITER_STORAGE_URI to redis://... or memory:// to override.
+from project import limiter_storage  # noqa: F401
+LIMITER_STORAGE_URI = os.environ.get(
+    "LIMITER_STORAGE_URI",
+    "sqlite:///" + os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "ratelimit.sqlite"),
+)
+
+# Bot reputation (project/bot_reputation.py): time-decayed scores per IP hash,
+# fed by the deception audit events in audit_record. Suspects share one
+# limiter bucket; blocked clients are rejected by bot_tripwire up front.
+from project.bot_reputation import ReputationTable, event_weight
+
+bot_reputation = ReputationTable(
+    half_life_s=float(os.environ.get("BOT_SCORE_HALF_LIFE_S", 600)),
+    suspect_score=float(os.environ.get("BOT_SUSPECT_SCORE", 3)),
+    block_score=float(os.environ.get("BOT_BLOCK_SCORE", 8)),
+)
+
+def limiter_key():
+    """Client address, except that suspected bots are pooled into one bucket."""
+    if bot_reputation.suspect(_client_key()):
+        return "bot-suspect"
+    return get_remote_address()
+
 limiter = Limiter(
-    key_func=get_remote_address,
+    key_func=limiter_key,
     app=app,
-    storage_uri=os.environ.get("LIMITER_STORAGE_URI","memory://"), 
+    storage_uri=LIMITER_STORAGE_URI,
     default_limits=["120 per minute"],
     headers_enabled=True
 )
@@ -130,91 +159,92 @@ def generate_honeypot_field() -> str:
     """Return a short random honeypot field name, e.g. 'hp_ab12cd34'."""
     return "hp_" + secrets.token_hex(4)
 
+# Pre-keyed signer with an LRU of recent signatures (project/cookie_signer.py);
+# HP_SIGN_CACHE bounds the entries. Changing HMAC_KEY in the environment
+# rotates the key and drops the cache on the next call.
+from project.cookie_signer import CookieSigner
+
+_hp_signer = CookieSigner(HMAC_KEY, max_entries=int(os.environ.get("HP_SIGN_CACHE", 4096)))
+
+def _signer() -> CookieSigner:
+    _hp_signer.ensure_key(os.environ.get("HMAC_KEY") or HMAC_KEY)
+    return _hp_signer
+
 def sign_val(val: str) -> str:
     """Return hex HMAC-SHA256 of val using HMAC_KEY."""
-    key = HMAC_KEY.encode("utf-8")
-    mac = hmac.new(key, val.encode("utf-8"), hashlib.sha256).hexdigest()
-    return mac
+    return _signer().sign(val)
 
 def verify_val(val: str, sig: str) -> bool:
     """Verify HMAC signature constant-time; return True if match."""
-    key = HMAC_KEY.encode("utf-8")
-    expected = hmac.new(key, val.encode("utf-8"), hashlib.sha256).hexdigest()
-    # use hmac.compare_digest for constant-time comparison
-    return hmac.compare_digest(expected, sig)
+    return _signer().verify(val, sig)
 
-@app.before_request
-def rotate_honeypot_cookie():
-    """
-    Ensure a signed hp_field cookie exists on each session.
-    Cookie format stored: "<field_name>|<sig>"
-    - cookie is readable by JS (NOT HttpOnly) because client-side rotation reads it.
-    - server verifies signature on use (see bot_tripwire update below).
-    """
+def parse_hp_cookie(raw: str) -> Optional[str]:
+    """Field name from a signed "<name>|<sig>" hp_field cookie; None if unsigned or invalid."""
     try:
-        raw = request.cookies.get("hp_field", "")
-        valid_name: Optional[str] = None
-        if raw and "|" in raw:
+        if "|" in raw:
             name, sig = raw.split("|", 1)
             if name.startswith("hp_") and verify_val(name, sig):
-                valid_name = name
-
-        # If cookie missing or invalid -> generate new signed cookie
-        if not valid_name:
-            new_name = generate_honeypot_field()
-            sig = sign_val(new_name)
-            cookie_value = f"{new_name}|{sig}"
-            # store for after_request to attach to outgoing response
-            # don't directly call make_response here (Flask catch-alls make it messy)
-            from flask import g
-            g.hp_cookie_to_set = cookie_value
+                return name
     except Exception:
-        # never block user flow if sign/rotate fails
+        # never block user flow on verification errors
         pass
+    return None
 
 
 # -------------------------------
-# Dynamic Honeypot Field Helper (Upgrade #4)
+# Security pipeline
 # -------------------------------
-
-import secrets
-
-def generate_honeypot_field():
-    """Generate a random honeypot field name."""
-    return "hp_" + secrets.token_hex(4)
+# One before_request hook builds the per-request context (cookie verified and
+# body parsed once, see project/security_pipeline.py) and runs the stages
+# below in order. SECURITY_SERVER_TIMING=1 adds a Server-Timing header with
+# the cost of each stage; /admin/security_timing has the running totals.
+from project.security_pipeline import RequestContext, SecurityPipeline, server_timing
+
+security = SecurityPipeline()
+SECURITY_SERVER_TIMING = os.environ.get("SECURITY_SERVER_TIMING", "0") == "1"
+
+def _security_ctx() -> RequestContext:
+    ctx = getattr(g, "security", None)
+    if ctx is None:
+        ctx = g.security = RequestContext(request, parse_hp_cookie, HONEYPOT_FIELD)
+    return ctx
+
+def _client_key() -> str:
+    """Hashed client address for this request (reputation key), computed once."""
+    ctx = _security_ctx()
+    if ctx.client_key is None:
+        ctx.client_key = ip_hash(ctx.ip)
+    return ctx.client_key
 
 @app.before_request
-def rotate_honeypot_cookie():
-    """
-    Rotate honeypot field name occasionally for better bot resistance.
-    Stores field name in user cookie 'hp_field' if missing.
-    """
-    if not request.cookies.get("hp_field"):
-        from flask import g
-        g.hp_cookie_to_get = generate_honeypot_field()
+def security_pipeline():
+    return security.run(_security_ctx())
 
 @app.after_request
-def apply_honeypot_cookie(resp):
+def apply_security_headers(resp):
     """
-    If rotate_honeypot_cookie scheduled a cookie (saved on g.hp_cookie_to_set),
-    attach it to the response here so every response carries the cookie.
+    Attach the hp_field cookie scheduled by the pipeline (so every response
+    carries a signed one) and, if enabled, the Server-Timing header.
     """
-    from flask import g
+    ctx = getattr(g, "security", None)
+    if ctx is None:
+        return resp
     try:
-        if hasattr(g, "hp_cookie_to_set") and g.hp_cookie_to_set:
+        if ctx.hp_cookie_to_set:
             # IMPORTANT: the cookie must be readable by client-side JS so we do NOT set HttpOnly=True
             resp.set_cookie(
                 "hp_field",
-                g.hp_cookie_to_set,
+                ctx.hp_cookie_to_set,
                 max_age=60 * 60 * 24,   # 1 day
                 httponly=False,         # JS needs to read it to set hidden input name
                 samesite="Lax",
                 path="/"
             )
+        if SECURITY_SERVER_TIMING:
+            resp.headers["Server-Timing"] = server_timing(ctx)
     except Exception:
         # never block normal flow if cookie attach fails
         pass
-
     return resp
 
 # ----------------------------
@@ -233,80 +263,95 @@ def handle_rate_limit(e):
 # -----------------------------
 # Host Allow-List Siteguard (Upgrade #2)
 # -----------------------------
-@app.before_request
-def host_siteguard():
+@security.stage("host")
+def host_siteguard(ctx):
     # If allow-list not configured, skip
     if not ALLOWED_ORIGIN_HOST:
-        return
-
-    # Extract host portion without port
-    host = (request.host or "").split(":")[0]
+        return None
 
     # If mismatched, block + audit
-    if host and host != ALLOWED_ORIGIN_HOST:
+    if ctx.host and ctx.host != ALLOWED_ORIGIN_HOST:
         audit_record(
             action="host_block",
             status="denied",
-            extra={"seen_host": host, "path": request.path}
+            extra={"seen_host": ctx.host, "path": ctx.path}
         )
         return jsonify({"error": "host_not_allowed"}), 403
+    return None
+
+
+# -------------------------------
+# Signed honeypot cookie rotation
+# -------------------------------
+@security.stage("hp_cookie")
+def rotate_honeypot_cookie(ctx):
+    """
+    Ensure a signed hp_field cookie exists on each session.
+    Cookie format stored: "<field_name>|<sig>"
+    - cookie is readable by JS (NOT HttpOnly) because client-side rotation reads it.
+    - if missing or invalid, a new one is scheduled for apply_security_headers.
+    """
+    if not ctx.hp_verified:
+        try:
+            new_name = generate_honeypot_field()
+            ctx.hp_cookie_to_set = f"{new_name}|{sign_val(new_name)}"
+        except Exception:
+            # never block user flow if sign/rotate fails
+            pass
+    return None
 
 
 # ------------------------------------------------------------------
 # Honeypot + Bot Tripwire (Upgrade #3) - signed cookie-aware version
 # ------------------------------------------------------------------
+@security.stage("tripwire", on_demand=True)
+def _tripwire_stage(ctx):
+    # known bots: rejected before the body is parsed or anything is logged
+    if bot_reputation.blocked(_client_key()):
+        return jsonify({"error": "bot_detected"}), 400
+    body = ctx.body
+    for hp_name in ctx.hp_fields():
+        # body (JSON or form), then querystring (rare, but cover all)
+        honeypot_val = body.get(hp_name) or ctx.request.args.get(hp_name)
+        if isinstance(honeypot_val, str) and honeypot_val.strip():
+            # honeypot field is filled -> suspicious -> log + block
+            try:
+                audit_record(
+                    action="honeypot_trigger",
+                    actor="unknown",
+                    subject=ctx.path,
+                    status="denied",
+                    extra={"hp_field": hp_name, "ip": ctx.ip}
+                )
+            except Exception:
+                pass
+            return jsonify({"error": "bot_detected"}), 400
+    return None
+
 def bot_tripwire():
     """
     Return Flask response to block if bot is suspected; otherwise return None.
-    Uses signed hp_field cookie of form: "<field_name>|<sig>" where sig = HMAC(name).
-    Falls back to env HONEYPOT_FIELD if cookie missing/invalid.
+    Clients whose bot reputation is over BOT_BLOCK_SCORE are blocked outright.
+    Otherwise checks the field named by the verified hp_field cookie (HONEYPOT_FIELD
+    if missing/invalid) and the raw cookie value the templates render.
     """
-    honeypot_val = None
-    hp_name = None
+    return security.run_stage(_security_ctx(), "tripwire")
 
-    # --- Read and verify signed cookie if present ---
-    try:
-        raw = request.cookies.get("hp_field", "")
-        if raw and "|" in raw:
-            name, sig = raw.split("|", 1)
-            # accept only names that look like our hp_ prefix and verify signature
-            if name.startswith("hp_") and verify_val(name, sig):
-                hp_name = name
-    except Exception:
-        # don't break request flow on verification errors
-        hp_name = None
 
-    # Fallback to env/default configured name
-    if not hp_name:
-        hp_name = os.environ.get("HONEYPOT_FIELD", "hp_website")
-
-    # --- Extract submitted value from possible input types ---
-    if request.is_json:
-        body = request.get_json(silent=True) or {}
-        honeypot_val = (body.get(hp_name) or "").strip()
-    else:
-        honeypot_val = (request.form.get(hp_name) or "").strip()
-
-    # check querystring as well (rare, but cover all)
-    if not honeypot_val:
-        honeypot_val = (request.args.get(hp_name) or "").strip()
-
-    # If honeypot field is filled -> suspicious -> log + block
-    if honeypot_val:
-        try:
-            audit_record(
-                action="honeypot_trigger",
-                actor="unknown",
-                subject=request.path,
-                status="denied",
-                extra={"hp_field": hp_name, "ip": request.remote_addr}
-            )
-        except Exception:
-            pass
-
-        return jsonify({"error": "bot_detected"}), 400
+@app.route("/admin/security_timing", methods=["GET"])
+@admin_required
+def admin_security_timing():
+    """Per-stage security pipeline cost since process start."""
+    return jsonify({"ok": True, "stages": security.stats()})
 
-    return None
+@app.route("/admin/bot_reputation", methods=["GET"])
+@admin_required
+def admin_bot_reputation():
+    """Highest current bot scores by client hash (?n=, default 20)."""
+    n = _lim(request.args.get("n", 20), 20)
+    return jsonify({"ok": True, "suspect_score": bot_reputation.suspect_score,
+                    "block_score": bot_reputation.block_score,
+                    "top": [{"client": k, "score": round(v, 3)} for k, v in bot_reputation.top(n)]})
 
 # ------------------------------
 # Fake / Decoy Endpoints + Snare
@@ -383,6 +428,10 @@ def snare_endpoint():
     - Records ip, user-agent, a trimmed header snapshot and the payload
     - Returns {"ok": True} on success
     """
+    trip = bot_tripwire()
+    if trip:
+        return trip
+
     # Accept JSON (preferred) or form data
     data = request.get_json(silent=True) or {}
     if not data and request.form:
@@ -435,6 +484,10 @@ def fake_login():
     A deceptive login page (non-functional). Logs any attempts.
     """
     if request.method == "POST":
+        trip = bot_tripwire()
+        if trip:
+            return trip
+
         # log attempt but don't authenticate
         username = request.form.get("username", "")
         # purposely don't store raw password - only indicator length/exists
@@ -511,7 +564,6 @@ def admin_metrics(participant_id):
 
 
 import hashlib
-import shutil
 from flask import send_file
 
 # ---------- Participant export + erase endpoints (D3) ----------
@@ -536,8 +588,30 @@ def _read_jsonl_file(path):
     except PermissionError:
         return
 
-def _collect_participant_records(participant_id):
-    """Collect records mentioning participant_id from known log files."""
+def _record_mentions(obj, participant_id):
+    """True if a log record refers to participant_id."""
+    if not isinstance(obj, dict):
+        return False
+    # quick checks for participant id in common fields
+    if obj.get("participant_id") == participant_id:
+        return True
+    # actor might include "participant:xxxx"
+    actor = obj.get("actor", "")
+    if isinstance(actor, str) and actor.endswith(participant_id):
+        return True
+    # nested extra fields often contain participant_id
+    extra = obj.get("extra", {})
+    if isinstance(extra, dict) and extra.get("participant_id") == participant_id:
+        return True
+    # a loose search across values
+    return any(str(v) == participant_id for v in obj.values())
+
+
+def _iter_participant_records(participant_id):
+    """
+    Yield records mentioning participant_id from known log files.
+    Uses the participant index sidecars, so only that participant's lines are read.
+    """
     files_to_scan = []
     # adjust these names if your module uses different constants
     try:
@@ -546,30 +620,18 @@ def _collect_participant_records(participant_id):
         # fallback to logs by path if constants missing
         files_to_scan = ["logs/audit_log.jsonl", "logs/consent_log.jsonl", "logs/data_log.jsonl"]
 
-    out = []
+    flush_audit()
     for path in files_to_scan:
-        for obj in _read_jsonl_file(path):
-            # some logs embed participant_id at top-level or inside 'actor' etc.
-            if not isinstance(obj, dict):
-                continue
-            # quick checks for participant id in common fields
-            if obj.get("participant_id") == participant_id:
-                out.append({"file": path, "record": obj})
-                continue
-            # actor might include "participant:xxxx"
-            actor = obj.get("actor", "")
-            if isinstance(actor, str) and actor.endswith(participant_id):
-                out.append({"file": path, "record": obj})
-                continue
-            # nested extra fields often contain participant_id
-            extra = obj.get("extra", {})
-            if isinstance(extra, dict) and extra.get("participant_id") == participant_id:
-                out.append({"file": path, "record": obj})
-                continue
-            # a loose search across values
-            if any(str(v) == participant_id for v in obj.values()):
-                out.append({"file": path, "record": obj})
-    return out
+        # sealed segments first (oldest to newest), then the live log
+        for seg in log_segments.segment_files(path):
+            for obj in participant_index.iter_lookup(seg, participant_id):
+                # the index can over-match on actor/subject suffixes; confirm here
+                if _record_mentions(obj, participant_id):
+                    yield {"file": seg, "record": obj}
+
+def _collect_participant_records(participant_id):
+    """Collect records mentioning participant_id from known log files."""
+    return list(_iter_participant_records(participant_id))
 
 
 @app.route("/admin/export/<participant_id>", methods=["GET"])
@@ -595,72 +657,21 @@ def export_participant(participant_id):
         return jsonify({"ok": False, "error": "export_failed"}), 500
 
 
-def _anonymize_and_replace_in_file(path, participant_id, replacement_token):
+def _pseudonym(participant_id):
+    """Deterministic pseudonym, so anonymized records stay linkable to each other."""
+    h = hashlib.sha256(participant_id.encode("utf-8")).hexdigest()[:16]
+    return f"anonymized:{h}"
+
+def _erase_participants(tokens, paths=None, mode="pseudonymize", mark=None):
     """
-    Read path, write a temp file with participant_id replaced by replacement_token,
-    then atomically move the temp file over original (after backup).
-    Returns number of lines changed.
+    Erase the participants in ``tokens`` (participant_id -> replacement) from
+    the logs in one pass, rewriting only their lines in place (project/erasure.py).
     """
-    import json, tempfile, os
-    changed = 0
-    tmp_fd, tmp_path = tempfile.mkstemp(prefix="rewrite_", dir=".")
-    os.close(tmp_fd)
-    try:
-        with open(path, "r", encoding="utf-8") as rf, open(tmp_path, "w", encoding="utf-8") as wf:
-            for line in rf:
-                if participant_id in line:
-                    # attempt safe json load/modify/write, otherwise do text replace
-                    try:
-                        obj = json.loads(line)
-                        modified = False
-                        # replace in top-level participant_id if present
-                        if obj.get("participant_id") == participant_id:
-                            obj["participant_id"] = replacement_token
-                            modified = True
-                        # replace in actor if matches
-                        actor = obj.get("actor")
-                        if isinstance(actor, str) and actor.endswith(participant_id):
-                            obj["actor"] = actor.replace(participant_id, replacement_token)
-                            modified = True
-                        # replace in extras recursively (shallow)
-                        extra = obj.get("extra", {})
-                        if isinstance(extra, dict) and extra.get("participant_id") == participant_id:
-                            extra["participant_id"] = replacement_token
-                            obj["extra"] = extra
-                            modified = True
-                        if modified:
-                            wf.write(json.dumps(obj, separators=(",", ":"), ensure_ascii=False) + "\n")
-                            changed += 1
-                            continue
-                    except Exception:
-                        # fallback to text replace
-                        new_line = line.replace(participant_id, replacement_token)
-                        if new_line != line:
-                            changed += 1
-                        wf.write(new_line)
-                        continue
-                wf.write(line)
-    except FileNotFoundError:
-        # nothing to do if file missing
-        try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
-        return 0
-    # backup original (timestamped)
-    try:
-        bak_path = f"{path}.bak-{int(time.time())}"
-        shutil.copy2(path, bak_path)
-        # replace file atomically
-        shutil.move(tmp_path, path)
-    except Exception:
-        # cleanup tmp if move failed
-        try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
-        raise
-    return changed
+    if paths is None:
+        paths = [AUDIT_LOG, CONSENT_LOG, DATA_LOG]
+    flush_audit()  # queued audit lines must be on disk (and indexed) first
+    job = erasure.ErasureJob(paths, tokens, ERASURE_BACKUP_DIR, mode=mode, mark=mark, lock=_log_write_lock)
+    return job.run()
 
 
 @app.route("/admin/erase/<participant_id>", methods=["POST"])
@@ -672,30 +683,13 @@ def erase_participant_admin(participant_id):
     Note: This is a best-effort pseudonymization that keeps records but removes the clear identifier.
     """
     try:
-        # create a deterministic pseudonym to keep ability to link anonymized records
-        h = hashlib.sha256(participant_id.encode("utf-8")).hexdigest()[:16]
-        replacement = f"anonymized:{h}"
-        files_to_scan = []
-        try:
-            files_to_scan = [AUDIT_LOG, CONSENT_LOG, DATA_LOG]
-        except Exception:
-            files_to_scan = ["logs/audit_log.jsonl", "logs/consent_log.jsonl", "logs/data_log.jsonl"]
-
-        total_changed = 0
-        for path in files_to_scan:
-            try:
-                changed = _anonymize_and_replace_in_file(path, participant_id, replacement)
-                total_changed += changed
-            except Exception as e:
-                # log failure in audit log but continue
-                try:
-                    audit_record(action="erase_partial_fail", actor="admin", subject=f"erase:{participant_id}", status="error", extra={"path": path, "error": str(e)})
-                except Exception:
-                    pass
+        replacement = _pseudonym(participant_id)
+        result = _erase_participants({participant_id: replacement})
+        total_changed = result["changed_lines"]
 
         # final audit record for the erase action
         try:
-            audit_record(action="erase_performed", actor="admin", subject=f"erase:{participant_id}", status="ok", extra={"replacement": replacement, "changed_lines": total_changed})
+            audit_record(action="erase_performed", actor="admin", subject=f"erase:{participant_id}", status="ok", extra={"replacement": replacement, "changed_lines": total_changed, "backup": result["backup"]})
         except Exception:
             pass
 
@@ -708,6 +702,31 @@ def erase_participant_admin(participant_id):
         return jsonify({"ok": False, "error": "erase_failed"}), 500
 
 
+@app.route("/admin/erase", methods=["POST"])
+@admin_required
+def erase_participants_admin():
+    """
+    Batch erase: {"participant_ids": [...]} anonymized together in one pass
+    over the logs (same pseudonyms as /admin/erase/<participant_id>).
+    """
+    data = request.get_json(silent=True) or {}
+    pids = data.get("participant_ids")
+    if not isinstance(pids, list) or not pids or not all(isinstance(p, str) and p for p in pids):
+        return jsonify({"ok": False, "error": "participant_ids must be a non-empty list of strings"}), 400
+    try:
+        tokens = {pid: _pseudonym(pid) for pid in pids}
+        result = _erase_participants(tokens)
+        audit_record(action="erase_performed", actor="admin", subject=f"erase:batch:{len(tokens)}", status="ok",
+                     extra={"participants": len(tokens), "changed_lines": result["changed_lines"], "backup": result["backup"]})
+        return jsonify({"ok": True, "replacements": tokens, "changed_lines": result["changed_lines"]}), 200
+    except Exception as e:
+        try:
+            audit_record(action="erase_failed", actor="admin", subject="erase:batch", status="error", extra={"error": str(e)})
+        except Exception:
+            pass
+        return jsonify({"ok": False, "error": "erase_failed"}), 500
+
+
 @app.route("/erase", methods=["POST"])
 def erase_participant_self():
     """
@@ -720,21 +739,8 @@ def erase_participant_self():
             return jsonify({"ok": False, "error": "no_participant_cookie"}), 400
         # delegate to admin-style erasure (use same replacement)
         # (we don't require admin token here because it's a user self-erase)
-        h = hashlib.sha256(part.encode("utf-8")).hexdigest()[:16]
-        replacement = f"anonymized:{h}"
-        files_to_scan = []
-        try:
-            files_to_scan = [AUDIT_LOG, CONSENT_LOG, DATA_LOG]
-        except Exception:
-            files_to_scan = ["logs/audit_log.jsonl", "logs/consent_log.jsonl", "logs/data_log.jsonl"]
-
-        total_changed = 0
-        for path in files_to_scan:
-            try:
-                changed = _anonymize_and_replace_in_file(path, part, replacement)
-                total_changed += changed
-            except Exception:
-                pass
+        replacement = _pseudonym(part)
+        total_changed = _erase_participants({part: replacement})["changed_lines"]
 
         try:
             audit_record(action="erase_self", actor=f"participant:{part}", subject=f"erase:self", status="ok", extra={"replacement": replacement, "changed_lines": total_changed})
@@ -756,13 +762,14 @@ from flask import send_from_directory, url_for
 @app.route("/admin/dashboard", methods=["GET"])
 @admin_required
 def admin_dashboard():
+    flush_audit()
     # small summary counts (use your existing constants or compute)
     try:
         counts = {
-            "audit_log_lines": sum(1 for _ in _read_jsonl_file(AUDIT_LOG)) if 'AUDIT_LOG' in globals() else None,
-            "consent_log_lines": sum(1 for _ in _read_jsonl_file(CONSENT_LOG)) if 'CONSENT_LOG' in globals() else None,
-            "data_log_lines": sum(1 for _ in _read_jsonl_file(DATA_LOG)) if 'DATA_LOG' in globals() else None,
-            "sessions": len(session_data()) if 'session_data' in globals() else None
+            "audit_log_lines": log_metrics.counts(AUDIT_LOG)["lines"],
+            "consent_log_lines": log_metrics.counts(CONSENT_LOG)["lines"],
+            "data_log_lines": log_metrics.counts(DATA_LOG)["lines"],
+            "sessions": count_sessions()
         }
     except Exception:
         counts = {"audit_log_lines": None, "consent_log_lines": None, "data_log_lines": None, "sessions": None}
@@ -770,7 +777,7 @@ def admin_dashboard():
     # sample recent events: tail of audit_log (best-effort)
     recent = []
     try:
-        for obj in list(_read_jsonl_file(AUDIT_LOG or "logs/audit_log.jsonl"))[-10:]:
+        for obj in log_metrics.recent(AUDIT_LOG, 10):
             recent.append({
                 "ts": obj.get("ts"),
                 "action": obj.get("action"),
@@ -799,41 +806,60 @@ def extract_admin_token_from_request() -> str:
             or auth.strip())
 
 # ---- Admin export download (Phase 4 - D2) ----
-from flask import send_file
+from flask import send_file, Response, stream_with_context
 import json
-import tempfile
 import os
+from project import export_stream
+
+def _export_options():
+    """(format, gzip) for streaming exports: ?format=json|ndjson, ?gzip=1 or Accept-Encoding."""
+    fmt = (request.args.get("format") or "json").lower()
+    if fmt not in ("json", "ndjson"):
+        fmt = "json"
+    use_gzip = request.args.get("gzip") in ("1", "true", "yes") or \
+        "gzip" in (request.headers.get("Accept-Encoding") or "").lower()
+    return fmt, use_gzip
+
+def _stream_response(chunks, mimetype, use_gzip):
+    """Chunked response; the body is generated while it is being sent."""
+    if use_gzip:
+        chunks = export_stream.gzip_chunks(chunks)
+    resp = Response(stream_with_context(chunks), mimetype=mimetype)
+    if use_gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.headers["Vary"] = "Accept-Encoding"
+    return resp
 
 @app.route("/admin/download/<participant_id>", methods=["GET"])
 @admin_required
 def admin_download(participant_id):
     """
     Download the exported JSON for a participant.
-    This wraps the data into a temporary file and returns it.
+    The document is streamed as it is read from the logs (?format=ndjson for
+    one record per line, ?gzip=1 or Accept-Encoding: gzip to compress).
     """
     try:
-        # reuse your D3 export helper
-        records = _collect_participant_records(participant_id)
+        fmt, use_gzip = _export_options()
+        matches = {"n": 0}
 
-        # create temp file
-        tmp_fd, tmp_path = tempfile.mkstemp(prefix=f"export-{participant_id}-", suffix=".json")
-        os.close(tmp_fd)
+        def docs():
+            for rec in _iter_participant_records(participant_id):
+                matches["n"] += 1
+                yield export_stream.dumps_bytes(rec)
 
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            json.dump({
-                "ok": True,
-                "participant_id": participant_id,
-                "matches": len(records),
-                "records": records
-            }, f, indent=2, ensure_ascii=False)
-
-        # send as file
-        return send_file(
-            tmp_path,
-            mimetype="application/json",
-            as_attachment=True,
-            download_name=f"export-{participant_id}.json"
-        )
+        if fmt == "ndjson":
+            chunks = export_stream.ndjson_chunks(docs())
+            mimetype, ext = "application/x-ndjson", "ndjson"
+        else:
+            chunks = export_stream.json_object_chunks(
+                {"ok": True, "participant_id": participant_id}, "records", docs(),
+                tail_fn=lambda: {"matches": matches["n"]},
+            )
+            mimetype, ext = "application/json", "json"
+
+        resp = _stream_response(chunks, mimetype, use_gzip)
+        resp.headers["Content-Disposition"] = f'attachment; filename="export-{participant_id}.{ext}"'
+        return resp
 
     except Exception as e:
         try:
@@ -850,6 +876,79 @@ def admin_download(participant_id):
         return jsonify({"ok": False, "error": "download_failed"}), 500
 
 
+@app.route("/admin/snapshot", methods=["GET"])
+@admin_required
+def admin_snapshot():
+    """
+    Columnar snapshot of per-session metrics for offline analysis.
+    ?format=parquet (default) or ?format=arrow (Arrow IPC file).
+    """
+    fmt = (request.args.get("format") or "parquet").lower()
+    if fmt not in columnar_export.FORMATS:
+        return jsonify({"ok": False, "error": "unknown_format",
+                        "formats": sorted(columnar_export.FORMATS)}), 400
+    if not columnar_export.snapshot_available():
+        return jsonify({"ok": False, "error": "pyarrow_not_installed"}), 501
+    try:
+        buf = columnar_export.write_snapshot(fmt)
+    except columnar_export.SnapshotUnavailable:
+        return jsonify({"ok": False, "error": "snapshot_busy"}), 503
+    except Exception as e:
+        audit_record(
+            action="snapshot_export_failed",
+            actor="admin",
+            subject=f"snapshot:{fmt}",
+            status="error",
+            extra={"error": str(e)}
+        )
+        return jsonify({"ok": False, "error": "snapshot_failed"}), 500
+
+    audit_record(
+        action="snapshot_export",
+        actor="admin",
+        subject=f"snapshot:{fmt}",
+        status="ok",
+        extra={"bytes": buf.getbuffer().nbytes}
+    )
+    mimetype, ext = columnar_export.FORMATS[fmt]
+    stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    resp = make_response(buf.getvalue())
+    resp.headers["Content-Type"] = mimetype
+    resp.headers["Content-Disposition"] = f'attachment; filename="metrics-snapshot-{stamp}.{ext}"'
+    return resp
+
+
+_LOG_NAMES = {"audit": "AUDIT_LOG", "consent": "CONSENT_LOG", "data": "DATA_LOG"}
+
+@app.route("/admin/logs/<log_name>", methods=["GET"])
+@admin_required
+def admin_log_range(log_name):
+    """
+    NDJSON stream of one log's records across all its segments, oldest first.
+    Optional ?since= / ?until= (ISO timestamps, inclusive) skip segments by
+    their manifest time range; ?gzip=1 compresses the stream.
+    """
+    if log_name not in _LOG_NAMES:
+        return jsonify({"ok": False, "error": "unknown_log", "logs": sorted(_LOG_NAMES)}), 404
+    since, until = request.args.get("since"), request.args.get("until")
+    for val in (since, until):
+        if val and log_segments.parse_ts(val) is None:
+            return jsonify({"ok": False, "error": "invalid_timestamp"}), 400
+    path = globals()[_LOG_NAMES[log_name]]
+    if log_name == "audit":
+        flush_audit()
+    _, use_gzip = _export_options()
+    audit_record(
+        action="log_range_export",
+        actor="admin",
+        subject=f"logs:{log_name}",
+        status="ok",
+        extra={"since": since, "until": until}
+    )
+    docs = (export_stream.dumps_bytes(rec) for rec in log_segments.iter_records(path, since, until))
+    return _stream_response(export_stream.ndjson_chunks(docs), "application/x-ndjson", use_gzip)
+
+
 # --------------------------
 #  APP INITIALIZATION
 # --------------------------
@@ -867,6 +966,7 @@ LOG_DIR = os.path.join(BASE_DIR, "logs")
 os.makedirs(LOG_DIR, exist_ok=True)
 
 CONSENT_LOG = os.path.join(LOG_DIR, "consent_log.jsonl")
+ERASURE_BACKUP_DIR = os.path.join(LOG_DIR, "erasure_backups")
 DATA_LOG = os.path.join(LOG_DIR, "data_log.jsonl")
 AUDIT_LOG = os.path.join(LOG_DIR, "audit_log.jsonl")
 
@@ -901,25 +1001,13 @@ LOG_MAX_BYTES = _lim(os.environ.get("LOG_MAX_BYTES", 512 * 1024), 512 * 1024)  #
 LOG_BACKUPS   = _lim(os.environ.get("LOG_BACKUPS", 5), 5)                     # keep 5 backups
 LOG_HMAC_KEY_HEX = os.environ.get("LOG_HMAC_KEY", "").strip()                 # set to random hex for tamper-evidence
 
-def _rotate_file_if_needed(path: str):
+def _rotate_file(path: str):
+    """Seal the live log as a numbered segment (see project/log_segments.py); caller holds the write lock."""
     try:
-        if not os.path.exists(path):
-            return
-        if os.path.getsize(path) <= LOG_MAX_BYTES:
-            return
-        # rotate: .4 -> .5, .3 -> .4, ... path -> .1
-        for i in range(LOG_BACKUPS, 0, -1):
-            src = f"{path}.{i}" if i > 1 else path
-            dst = f"{path}.{i+1}" if i > 0 else None
-            if os.path.exists(src):
-                if i == LOG_BACKUPS:
-                    try:
-                        os.remove(f"{path}.{LOG_BACKUPS+1}")
-                    except Exception:
-                        pass
-                os.rename(src, f"{path}.{i+1}")
-        # create fresh file
-        open(path, "a", encoding="utf-8").close()
+        entry = log_segments.seal(path, LOG_BACKUPS)
+        if entry is not None and LOG_HMAC_KEY_HEX:
+            # the fresh live file continues the chain from the sealed segment
+            _CHAIN_HEADS[path] = (os.stat(path).st_ino, 0, entry.get("head"))
     except Exception as e:
         # last resort: don't crash app because rotation failed
         print(f"[WARN] rotation failed for {path}: {e}")
@@ -937,53 +1025,168 @@ def _last_chain_hmac(path: str) -> str | None:
             f.seek(max(0, size - step))
             tail = f.read().decode("utf-8", errors="ignore")
         lines = [ln for ln in tail.strip().splitlines() if ln.strip()]
-        if not lines:
-            return None
-        last = lines[-1]
-        try:
-            j = json.loads(last)
+        for last in reversed(lines):
+            try:
+                j = json.loads(last)
+            except Exception:
+                return None
+            if j.get("_erased") and "_h" not in j:
+                continue  # tombstone too short to keep its chain link
             return j.get("_h")
-        except Exception:
-            return None
+        return None
     except Exception:
         return None
 
+try:
+    _LOG_HMAC_KEY_BYTES = bytes.fromhex(LOG_HMAC_KEY_HEX) if LOG_HMAC_KEY_HEX else None
+except ValueError:
+    _LOG_HMAC_KEY_BYTES = None
+
 def _sign_line(payload_bytes: bytes, prev_h: str | None) -> str | None:
     """Return hex HMAC over (prev_h||payload) if LOG_HMAC_KEY_HEX is set."""
-    if not LOG_HMAC_KEY_HEX:
+    if not _LOG_HMAC_KEY_BYTES:
         return None
-    try:
-        key = bytes.fromhex(LOG_HMAC_KEY_HEX)
-    except ValueError:
-        return None
-    hm = hmac.new(key, digestmod=hashlib.sha256)
+    hm = hmac.new(_LOG_HMAC_KEY_BYTES, digestmod=hashlib.sha256)
     if prev_h:
         hm.update(prev_h.encode("utf-8"))
     hm.update(payload_bytes)
     return hm.hexdigest()
 
+# ---- Chain-head cache ----
+# The last _h of each log is kept in memory so an append does not have to
+# re-read and parse the file tail. Entries are (inode, size, head): if another
+# worker appended (size moved) or the file was rotated/rewritten (inode moved)
+# the tail is read once to resync. A per-log flock serializes writers across
+# processes so the chain stays linear.
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev machines: in-process locking only
+    fcntl = None
+
+_CHAIN_HEADS: dict = {}        # path -> (st_ino, st_size, head)
+_LOG_LOCKS: dict = {}          # path -> threading.Lock
+_LOG_LOCK_FDS: dict = {}       # path -> (pid, fd) for the cross-process flock
+_LOG_LOCKS_GUARD = threading.Lock()
+
+@contextmanager
+def _log_write_lock(path: str):
+    with _LOG_LOCKS_GUARD:
+        tlock = _LOG_LOCKS.setdefault(path, threading.Lock())
+    with tlock:
+        if fcntl is None:
+            yield
+            return
+        pid, fd = _LOG_LOCK_FDS.get(path, (None, None))
+        if pid != os.getpid():
+            # never reuse a descriptor inherited across fork
+            fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+            _LOG_LOCK_FDS[path] = (os.getpid(), fd)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+def _chain_head(path: str, st) -> str | None:
+    """Return the previous link for an append to a file with stat ``st``."""
+    cached = _CHAIN_HEADS.get(path)
+    if cached and cached[0] == st.st_ino and cached[1] == st.st_size:
+        return cached[2]
+    if st.st_size == 0:
+        return log_segments.last_head(path)
+    return _last_chain_hmac(path)
+
+def seed_chain_heads(paths):
+    """Read each log's tail once at startup so appends start from the cache."""
+    for path in paths:
+        try:
+            with _log_write_lock(path):
+                st = os.stat(path)
+                _CHAIN_HEADS[path] = (st.st_ino, st.st_size, _last_chain_hmac(path))
+        except OSError:
+            continue
+
 def append_jsonl_secure(path: str, obj: dict):
     """
     Append one JSON object per line with:
       - size-based rotation
       - optional tamper-evident hash chain (_h with previous link _p)
     """
-    _rotate_file_if_needed(path)
-
-    # prepare
-    prev_h = _last_chain_hmac(path)
-    # attach signed fields non-destructively
-    to_write = dict(obj)
-    if LOG_HMAC_KEY_HEX:
-        # NOTE: we compute HMAC over the line WITHOUT _h, then store _h and _p
-        payload_bytes = json.dumps(to_write, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
-        h = _sign_line(payload_bytes, prev_h)
-        to_write["_p"] = prev_h  # previous hash (or None)
-        to_write["_h"] = h       # current hash (or None if key invalid)
-
-    line = json.dumps(to_write, ensure_ascii=False)
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(line + "\n")
+    append_jsonl_secure_many(path, [obj])
+
+def append_jsonl_secure_many(path: str, objs: list, fsync: bool = False):
+    """Append several chained lines with a single write (and optional fsync)."""
+    if not objs:
+        return
+    with _log_write_lock(path):
+        f = open(path, "ab")
+        st = os.fstat(f.fileno())
+        if st.st_size > LOG_MAX_BYTES:
+            f.close()
+            _rotate_file(path)
+            f = open(path, "ab")
+            st = os.fstat(f.fileno())
+
+        with f:
+            prev_h = _chain_head(path, st) if LOG_HMAC_KEY_HEX else None
+            lines = []
+            written = []
+            for obj in objs:
+                # attach signed fields non-destructively
+                to_write = dict(obj)
+                if LOG_HMAC_KEY_HEX:
+                    # NOTE: we compute HMAC over the line WITHOUT _h, then store _h and _p
+                    payload_bytes = json.dumps(to_write, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                    h = _sign_line(payload_bytes, prev_h)
+                    to_write["_p"] = prev_h  # previous hash (or None)
+                    to_write["_h"] = h       # current hash (or None if key invalid)
+                    prev_h = h
+                lines.append((json.dumps(to_write, ensure_ascii=False) + "\n").encode("utf-8"))
+                written.append(to_write)
+
+            data = b"".join(lines)
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+            # O_APPEND: the position after our write is the end of our lines
+            end = f.tell()
+            if LOG_HMAC_KEY_HEX:
+                _CHAIN_HEADS[path] = (os.fstat(f.fileno()).st_ino, end, prev_h)
+
+        log_metrics.record_append(path, st.st_ino, end - len(data), end, len(lines), written)
+        offset = end - len(data)
+        for line, to_write in zip(lines, written):
+            participant_index.record_append(path, offset, len(line), to_write)
+            offset += len(line)
+
+def adopt_log_manifests(paths):
+    """Persist each log's segment manifest once, so readers never re-scan legacy backups."""
+    for path in paths:
+        try:
+            with _log_write_lock(path):
+                log_segments.ensure_manifest(path)
+        except OSError as e:
+            print(f"[WARN] manifest setup failed for {path}: {e}")
+
+adopt_log_manifests([AUDIT_LOG, CONSENT_LOG, DATA_LOG])
+if LOG_HMAC_KEY_HEX:
+    seed_chain_heads([AUDIT_LOG, CONSENT_LOG, DATA_LOG])
+
+def checkpoint_log_metrics():
+    """Store each log's live line/byte counters in its manifest (runs at exit)."""
+    for path in (AUDIT_LOG, CONSENT_LOG, DATA_LOG):
+        try:
+            with _log_write_lock(path):
+                log_metrics.checkpoint(path)
+        except Exception as e:
+            print(f"[WARN] log metrics checkpoint failed for {path}: {e}")
+
+import atexit
+atexit.register(checkpoint_log_metrics)
 
 def now_iso():
     return datetime.datetime.now(datetime.timezone.utc).astimezone().isoformat()
@@ -993,55 +1196,58 @@ def ip_hash(ip):
         return ""
     return hashlib.sha256(ip.encode("utf-8")).hexdigest()
 
-def bot_tripwire():
-    """
-    Return a Flask Response to block if bot is suspected; otherwise return None.
-    Uses a dynamic honeypot field name stored in cookie 'hp_field' if present,
-    otherwise falls back to HONEYPOT_FIELD (env/default).
-    """
-    honeypot_val = None
-
-    # Determine expected honeypot field name (cookie preferred)
-    hp_name = request.cookies.get("hp_field") or os.environ.get("HONEYPOT_FIELD", "hp_website")
+# ---- Audit writer (group commit) ----
+# AUDIT_DURABILITY: "sync" writes on the request thread, "group" waits for a
+# shared batch fsync, "async" (default) returns immediately and the background
+# writer batches lines every AUDIT_GROUP_COMMIT_MS.
+from project.audit_writer import LogWriter
+
+AUDIT_DURABILITY = os.environ.get("AUDIT_DURABILITY", "async").strip().lower()
+audit_writer = LogWriter(
+    append_jsonl_secure_many,
+    mode=AUDIT_DURABILITY,
+    batch_ms=_lim(os.environ.get("AUDIT_GROUP_COMMIT_MS", 5), 5),
+    max_queue=_lim(os.environ.get("AUDIT_QUEUE_MAX", 10000), 10000),
+)
 
-    # Handle JSON bodies (API-style)
-    if request.is_json:
-        body = request.get_json(silent=True) or {}
-        honeypot_val = (body.get(hp_name) or "").strip()
-    else:
-        # Form submissions
-        honeypot_val = (request.form.get(hp_name) or "").strip()
+# Denial events (host_block, admin_access_denied, honeypot_trigger) are
+# written once per (action, ip) per AUDIT_AGGREGATE_S seconds; the rest of
+# the window becomes one summary line (project/audit_aggregator.py). 0 disables.
+from project.audit_aggregator import AuditAggregator
 
-    # If honeypot field is filled -> suspicious -> block + audit
-    if honeypot_val:
-        try:
-            audit_record(
-                action="honeypot_trigger",
-                actor="unknown",
-                subject=request.path,
-                status="denied",
-                extra={"hp_field": hp_name, "ip": request.remote_addr}
-            )
-        except Exception:
-            pass
-
-        return jsonify({"error": "bot_detected"}), 400
+audit_aggregator = AuditAggregator(
+    lambda rec: audit_writer.submit(AUDIT_LOG, rec),
+    interval_s=float(os.environ.get("AUDIT_AGGREGATE_S", 10)),
+)
 
-    return None
+def flush_audit():
+    """Make queued audit lines visible before reading AUDIT_LOG."""
+    try:
+        # only windows that are already due; open ones close on their own or at exit,
+        # so polling /status or a dashboard cannot shorten the aggregation window
+        audit_aggregator.flush(due_only=True)
+        audit_writer.flush()
+    except Exception as e:
+        # readers go on with what is on disk; the writer already logged the lost lines
+        print(f"[WARN] audit flush: {e}")
 
 def audit_record(action: str,
                  actor: str = None,
                  subject: str = None,
                  status: str = None,
                  extra: dict | None = None,
-                 notes: str | None = None):
-    """Append a structured audit line to AUDIT_LOG (JSONL)."""
+                 notes: str | None = None,
+                 target_id: str | None = None):
+    """Queue a structured audit line for AUDIT_LOG (JSONL)."""
     # Back-compat: allow callers to pass notes=... (string)
     if notes:
         if isinstance(extra, dict) and extra:
             extra = {"notes": notes, **extra}
         else:
             extra = {"notes": notes}
+    # Back-compat: several routes pass target_id=...; keep it with the extras
+    if target_id is not None:
+        extra = {**(extra or {}), "target_id": target_id}
 
     try:
         rec = {
@@ -1064,7 +1270,13 @@ def audit_record(action: str,
             "extra": extra or {},
         }
 
-    append_jsonl_secure(AUDIT_LOG, rec)
+    weight = event_weight(rec)
+    if weight and rec["ip"]:
+        bot_reputation.observe(ip_hash(rec["ip"]), weight)
+
+    if audit_aggregator.add(rec):
+        return  # counted into this key's summary record
+    audit_writer.submit(AUDIT_LOG, rec)
 
 def require_admin(f):
     """Decorator identical to admin_required (compatibility)."""
@@ -1149,8 +1361,8 @@ def validate_cognitive_session(s: dict):
 # --------------------------
 #  MAIN ROUTES
 # --------------------------
-@limiter.limit("30 per minute")
 @app.route('/', methods=['GET', 'POST'])
+@limiter.limit("30 per minute")
 def index():
     result = None
     user_answer = ""
@@ -1188,8 +1400,8 @@ def index():
     )
 
 
-@limiter.limit("5 per minute")
 @app.route('/consent', methods=['POST'])
+@limiter.limit("5 per minute")
 def consent():
     trip = bot_tripwire()
     if trip:
@@ -1252,15 +1464,7 @@ def submit_result():
     saved = save_session_result(session)
 
     # detect session type and compute metrics
-    if isinstance(saved, dict) and "events" in saved:
-        metrics = compute_behavioral_metrics(saved)
-        session_type = "behavioral"
-    elif isinstance(saved, dict) and "modules" in saved:
-        metrics = compute_cognitive_metrics(saved)
-        session_type = "cognitive"
-    else:
-        metrics = {"note": "Unknown data type; no metrics computed"}
-        session_type = "unknown"
+    session_type, metrics = session_metrics(saved)
     # ✅ AUDIT LOG HERE
     audit_record(
         actor=f"participant:{saved.get('participant_id', 'unknown')}",
@@ -1277,12 +1481,17 @@ def submit_result():
 @admin_required
 @limiter.limit("10 per minute") 
 def last_audit(n):
+    """
+    The n newest audit entries (oldest first). The log is read backwards from
+    the end, continuing into sealed segments; pass the returned next_before
+    as ?before= to page further back.
+    """
+    flush_audit()
     try:
-        entries = []
-        with open(AUDIT_LOG, "r", encoding="utf-8") as f:
-            for line in f:
-                entries.append(json.loads(line))
-        return jsonify({"audit": entries[-n:]}), 200
+        entries, next_before = log_segments.tail(AUDIT_LOG, n, request.args.get("before"))
+        return jsonify({"audit": entries, "next_before": next_before}), 200
+    except ValueError as e:
+        return jsonify({"error": "invalid cursor", "detail": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "failed to read audit log", "detail": str(e)}), 500
 
@@ -1309,18 +1518,29 @@ def metrics():
 @admin_required
 @limiter.limit("5 per minute") 
 def export():
-    """Return all stored session rows (admin only)."""
-    rows = export_all()
-
+    """
+    Stream all stored session rows (admin only).
+    ?format=json (default, a JSON array) or ndjson; ?gzip=1 or Accept-Encoding: gzip compresses.
+    """
+    fmt, use_gzip = _export_options()
+    streamed = {"rows": 0}
 
-    #AUDIT LOG: admin exported data
-    audit_record(
-        actor="admin",
-        action="export_all_data",
-        notes=f"rows={len(rows)}"
-    )
+    def docs():
+        try:
+            for line in iter_session_lines():
+                streamed["rows"] += 1
+                yield line
+        finally:
+            #AUDIT LOG: admin exported data
+            audit_record(
+                actor="admin",
+                action="export_all_data",
+                notes=f"rows={streamed['rows']} format={fmt}"
+            )
 
-    return jsonify(rows), 200
+    if fmt == "ndjson":
+        return _stream_response(export_stream.ndjson_chunks(docs()), "application/x-ndjson", use_gzip)
+    return _stream_response(export_stream.json_array_chunks(docs()), "application/json", use_gzip)
 
 
 @app.route("/erase/<participant_id>", methods=["DELETE"])
@@ -1379,110 +1599,15 @@ def export_dashboard():
     - Behavioral sessions -> performance_score, total_time, hints, retries, hesitation
     """
     try:
-        rows = export_all()   # already implemented in your project
+        # per-session metrics are scored once by the shared kernel and cached;
+        # a refresh only scores sessions stored since the previous request
+        series = get_metrics_table().dashboard()
     except Exception as e:
         return jsonify({"error": "failed to read data", "detail": str(e)}), 500
 
-    # Structures to hold chart series
-    cognitive = {
-        "index": [],
-        "accuracy_pct": [],
-        "avg_time_s": [],
-        "avg_hesitation_s": [],
-        "avg_retries": [],
-    }
-
-    behavioral = {
-        "index": [],
-        "performance_score": [],
-        "total_time_s": [],
-        "hints": [],
-        "retries": [],
-        "hesitation_s": [],
-    }
-
-    cog_i = beh_i = 0
-
-    # Loop through every session record
-    for entry in rows:
-
-        # ==========================================================
-        # COGNITIVE SESSION (modules → questions)
-        # ==========================================================
-        if isinstance(entry, dict) and "modules" in entry:
-            modules = entry.get("modules", [])
-
-            total_questions = 0
-            correct = 0
-            total_time = 0.0
-            total_hesitation = 0.0
-            total_retries = 0.0
-
-            for m in modules:
-                for q in m.get("questions", []):
-                    total_questions += 1
-                    if q.get("correct"):
-                        correct += 1
-                    total_time += q.get("time_taken_seconds", 0) or 0
-                    total_hesitation += q.get("hesitation_seconds", 0) or 0
-                    total_retries += q.get("retries", 0) or 0
-
-            if total_questions > 0:
-                cog_i += 1
-                cognitive["index"].append(cog_i)
-                cognitive["accuracy_pct"].append(round((correct / total_questions) * 100, 2))
-                cognitive["avg_time_s"].append(round(total_time / total_questions, 2))
-                cognitive["avg_hesitation_s"].append(round(total_hesitation / total_questions, 2))
-                cognitive["avg_retries"].append(round(total_retries / total_questions, 2))
-
-
-        # ==========================================================
-        # BEHAVIORAL SESSION (events → timestamps)
-        # ==========================================================
-        elif isinstance(entry, dict) and "events" in entry:
-
-            start = entry.get("start_ts")
-            end = entry.get("end_ts")
-            total_ms = max(0, (end - start)) if (start and end) else None
-            events = entry.get("events", [])
-
-            # Count hints + retries
-            hints = sum(1 for e in events if e.get("type") == "hint")
-            retries = sum(1 for e in events if e.get("type") == "retry")
-
-            # Hesitation calculation (gaps > 1500ms)
-            timestamps = sorted([e.get("ts") for e in events if isinstance(e.get("ts"), (int, float))])
-            hesitation_ms = 0
-            for a, b in zip(timestamps, timestamps[1:]):
-                gap = b - a
-                if gap > 1500:
-                    hesitation_ms += gap
-
-            # Performance score (lightweight version of compute_behavioral_metrics)
-            score = 100
-            if total_ms is not None:
-                score -= (total_ms / 1000.0) * 0.5
-            score -= hints * 5
-            score -= retries * 3
-            score = round(max(0, score), 2)
-
-            beh_i += 1
-            behavioral["index"].append(beh_i)
-            behavioral["performance_score"].append(score)
-            behavioral["total_time_s"].append(round(total_ms / 1000.0, 3) if total_ms else None)
-            behavioral["hints"].append(hints)
-            behavioral["retries"].append(retries)
-            behavioral["hesitation_s"].append(round(hesitation_ms / 1000.0, 3))
-
-        # ==========================================================
-        # UNKNOWN ENTRY (should not happen but safe to ignore)
-        # ==========================================================
-        else:
-            continue
-
     return jsonify({
-        "cognitive": cognitive,
-        "behavioral": behavioral
+        "cognitive": series["cognitive"],
+        "behavioral": series["behavioral"]
     }), 200
 
 
@@ -1491,9 +1616,9 @@ def export_dashboard():
 # ============================================================
 
 def _count_jsonl_lines(path):
+    """Lines across the log's retained segments, from the maintained counters."""
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return sum(1 for _ in f)
+        return log_metrics.counts(path)["lines"]
     except Exception:
         return None  # unreadable or missing
 
@@ -1506,12 +1631,13 @@ def _read_json_file(path):
     except Exception:
         return True, None  # exists but invalid JSON
 
-@limiter.limit("30 per minute")
 @app.route("/status", methods=["GET"])
+@limiter.limit("30 per minute")
 def status():
     # Uses variables you already defined earlier in app.py:
     # BASE_DIR, LOG_DIR, CONSENT_LOG, DATA_LOG, AUDIT_LOG
     session_file = os.path.join(BASE_DIR, "session_data.json")
+    # counts are what is on disk; queued audit lines are reported, not waited for
 
     exists = {
         "log_dir": os.path.isdir(LOG_DIR),
@@ -1535,12 +1661,11 @@ def status():
 
     admin_token_configured = bool(get_admin_token())
 
-    if isinstance(session_data, list):
-        session_count = len(session_data)
-    elif isinstance(session_data, dict):
-        session_count = 1
-    else:
-        session_count = 0 if session_parsable else None
+    # sessions live in the append-only store; session_data.json is only the legacy import source
+    try:
+        session_count = count_sessions()
+    except Exception:
+        session_count = None
 
     ok_flags = [
         exists["log_dir"],
@@ -1560,6 +1685,7 @@ def status():
             "sessions": session_count,
             "consent_log_lines": consent_count,
             "audit_log_lines": audit_count,
+            "audit_queue_depth": audit_writer.pending(),
             "data_log_lines": data_log_count,
         },
     }), 200
@@ -1572,32 +1698,16 @@ def status():
 def anonymize_data_for_participant(pid):
     """Replace participant_id in DATA_LOG with 'erased_' token (keeps audit)."""
     erased_token = f"erased_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
-    temp_path = DATA_LOG + ".tmp"
 
     if not os.path.exists(DATA_LOG):
         return False, "No data log found."
 
     try:
-        with open(DATA_LOG, "r", encoding="utf-8") as fin, open(temp_path, "w", encoding="utf-8") as fout:
-            for line in fin:
-                try:
-                    j = json.loads(line)
-                except:
-                    fout.write(line)
-                    continue
-                if j.get("participant_id") == pid:
-                    j["participant_id"] = erased_token
-                    j["erased"] = True
-                    j["erasure_timestamp"] = now_iso()
-                fout.write(json.dumps(j, ensure_ascii=False) + "\n")
-
-        backup = DATA_LOG + ".bak." + datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        os.rename(DATA_LOG, backup)
-        os.rename(temp_path, DATA_LOG)
-        return True, f"Entries anonymized; backup at {backup}"
+        # lines are rewritten in place at the same length: the token already
+        # carries the erasure time, and the mark is dropped where it won't fit
+        result = _erase_participants({pid: erased_token}, paths=[DATA_LOG], mark={"erased": True})
+        return True, f"{result['changed_lines']} entries anonymized; backup at {result['backup']}"
     except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         return False, str(e)
 
 
@@ -1620,16 +1730,10 @@ def export_data(participant_id):
                      extra={"ip": request.remote_addr})
         return jsonify({"error": "Unauthorized"}), 401
 
-    results = []
-    if os.path.exists(DATA_LOG):
-        with open(DATA_LOG, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    j = json.loads(line)
-                    if j.get("participant_id") == participant_id:
-                        results.append(j)
-                except Exception:
-                    pass
+    # every DATA_LOG segment, sealed ones first, so rotation does not hide older records
+    results = [j for seg in log_segments.segment_files(DATA_LOG)
+               for j in participant_index.iter_lookup(seg, participant_id)
+               if j.get("participant_id") == participant_id]
 
     audit_record(actor=actor, action="export", subject=participant_id,
                  status="ok", extra={"count": len(results)})
@@ -1664,29 +1768,14 @@ def admin_delete(participant_id):
     if not os.path.exists(DATA_LOG):
         return jsonify({"error": "No data log"}), 400
 
-    backup = DATA_LOG + ".bak." + datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-
     try:
-        os.rename(DATA_LOG, backup)
-        kept, removed = 0, 0
-        with open(backup, "r", encoding="utf-8") as fin, open(DATA_LOG, "w", encoding="utf-8") as fout:
-            for line in fin:
-                try:
-                    j = json.loads(line)
-                    if j.get("participant_id") == participant_id:
-                        removed += 1
-                        continue
-                    fout.write(json.dumps(j, ensure_ascii=False) + "\n")
-                    kept += 1
-                except:
-                    fout.write(line)
-                    kept += 1
+        # matching lines become tombstones in place; their original bytes go to the backup journal
+        result = _erase_participants({participant_id: ""}, paths=[DATA_LOG], mode="tombstone")
+        removed, backup = result["changed_lines"], result["backup"]
         audit_record(actor="admin", action="delete_participant",
                      target_id=participant_id, notes=f"removed {removed} entries; backup at {backup}")
         return jsonify({"ok": True, "removed": removed, "backup": backup})
     except Exception as e:
-        if os.path.exists(backup) and not os.path.exists(DATA_LOG):
-            os.rename(backup, DATA_LOG)
         return jsonify({"error": "Failed delete", "details": str(e)}), 500
 
 
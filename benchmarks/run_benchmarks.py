@@ -0,0 +1,304 @@
+"""
+Benchmarks for the ingest and analytics hot paths.
+
+    python benchmarks/run_benchmarks.py                      # 1k scale, compare with baseline
+    python benchmarks/run_benchmarks.py --scale 100k --scale 1m
+    python benchmarks/run_benchmarks.py --only log_event --only aggregate_catch_up
+    python benchmarks/run_benchmarks.py --update-baseline    # record this machine's numbers
+
+Synthetic participants, events and sessions are generated with
+make_mock_event (seeded, so runs are repeatable) and every benchmark works in
+a throwaway directory, never on the real logs or session store. Results are
+reported as operations per second and compared with benchmarks/baseline.json;
+anything slower than the baseline by more than --tolerance is flagged and the
+runner exits with status 1.
+
+The baseline is only meaningful on the machine that recorded it and for the
+code it was recorded against. After a change to a measured path (store
+format, event backend, log writer, ...) or on a new machine, regenerate it
+from scratch and commit it with the change:
+
+    rm benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --scale 1k --scale 100k --update-baseline
+
+--update-baseline merges into an existing file, so removing it first drops
+entries for benchmarks or scales that are no longer run.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import secrets
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# keep app/analyze_events away from the real store and give the audit chain a key
+os.environ.setdefault("SESSION_STORE_DIR", tempfile.mkdtemp(prefix="bench-store-"))
+os.environ.setdefault("LOG_HMAC_KEY", secrets.token_hex(32))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app  # noqa: E402
+    from project import analyze_events  # noqa: E402
+    from project.processors import event_logger  # noqa: E402
+    from project.processors.mock_events import make_mock_event  # noqa: E402
+    from project.processors.segment_log import SegmentLog  # noqa: E402
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+SEED = 1234
+
+# the "json" event backend rewrites its whole array per call, so it is capped to keep large scales finishing
+LOG_EVENT_JSON_MAX = 2_000
+# participant lookups timed per run of collect_participant_records
+LOOKUPS = 200
+# rows per write while populating stores and logs (setup, not timed)
+POPULATE_CHUNK = 1024
+
+
+# ---------- synthetic data ----------
+
+def n_participants(n: int) -> int:
+    return max(n // 100, 1)
+
+
+def synthetic_events(n: int) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(SEED)
+    random.seed(SEED)  # make_mock_event draws from the module-level generator
+    participants = n_participants(n)
+    for i in range(n):
+        yield make_mock_event(
+            participant_id=f"p{rng.randrange(participants):06d}",
+            task_id=f"task_{i % 5}",
+            difficulty=(i % 3) + 1,
+        )
+
+
+def synthetic_sessions(n: int) -> Iterator[Dict[str, Any]]:
+    """Behavioral sessions built from mock events, with every fourth one cognitive."""
+    base = 1_700_000_000_000
+    for i, ev in enumerate(synthetic_events(n)):
+        m = ev["metrics"]
+        if i % 4 == 3:
+            yield {"participant_id": ev["participant_id"], "task_id": ev["task_id"], "modules": [
+                {"module_name": ev["task_id"], "questions": [{
+                    "correct": bool(m["accuracy"]),
+                    "time_taken_seconds": m["response_time_ms"] / 1000.0,
+                    "hesitation_seconds": m["cursor_idle_ms"] / 1000.0,
+                    "retries": m["retries"],
+                }]},
+            ]}
+            continue
+        start = base + i * 10_000
+        events = [{"type": "keypress", "ts": start + 100}]
+        if m["hint_used"]:
+            events.append({"type": "hint", "ts": start + 200})
+        for r in range(m["retries"]):
+            events.append({"type": "retry", "ts": start + 300 + r * m["cursor_idle_ms"]})
+        yield {
+            "participant_id": ev["participant_id"],
+            "task_id": ev["task_id"],
+            "start_ts": start,
+            "end_ts": start + m["response_time_ms"],
+            "events": events,
+        }
+
+
+def audit_records(n: int) -> Iterator[Dict[str, Any]]:
+    base = 1_700_000_000
+    for i, ev in enumerate(synthetic_events(n)):
+        yield {
+            "ts": base + i,
+            "action": ev["event_type"],
+            "actor": f"participant:{ev['participant_id']}",
+            "subject": ev["task_id"],
+            "status": "ok",
+            "extra": {"participant_id": ev["participant_id"]},
+        }
+
+
+def chunked(it, size: int = POPULATE_CHUNK) -> Iterator[List[Any]]:
+    buf = []
+    for item in it:
+        buf.append(item)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+@contextlib.contextmanager
+def patched(obj, **attrs):
+    old = {k: getattr(obj, k) for k in attrs}
+    for k, v in attrs.items():
+        setattr(obj, k, v)
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            setattr(obj, k, v)
+
+
+@contextlib.contextmanager
+def session_store(work: Path):
+    store_dir = work / "store"
+    with patched(analyze_events,
+                 DATA_PATH=work / "session_data.json",
+                 STORE_DIR=store_dir,
+                 AGGREGATE_PATH=store_dir / "aggregate.json",
+                 AGGREGATE_LOCK=store_dir / "aggregate.lock",
+                 _STORE=None):
+        yield analyze_events
+
+
+def populate_store(n: int) -> SegmentLog:
+    store = analyze_events.get_store()
+    for rows in chunked(synthetic_sessions(n)):
+        store.append_many(rows)
+    store.flush()
+    return store
+
+
+# ---------- benchmarks: (n, work dir) -> (operations, seconds) ----------
+
+def bench_save_session_result(n: int, work: Path) -> Tuple[int, float]:
+    with session_store(work) as ae:
+        sessions = list(synthetic_sessions(n))
+        t0 = time.perf_counter()
+        for s in sessions:
+            ae.save_session_result(s)
+        ae.get_store().flush()
+        return n, time.perf_counter() - t0
+
+
+def bench_log_event(n: int, work: Path) -> Tuple[int, float]:
+    """log_event with the configured EVENT_LOG_BACKEND."""
+    if event_logger.EVENT_LOG_BACKEND == "json":
+        n = min(n, LOG_EVENT_JSON_MAX)
+    events = list(synthetic_events(n))
+    with patched(event_logger, LOG_FILE=str(work / "events.json"),
+                 EVENT_LOG_DIR=str(work / "event_log"), _EVENT_LOG=None), \
+            contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        for ev in events:
+            event_logger.log_event(ev)
+        if event_logger.EVENT_LOG_BACKEND == "ndjson":
+            event_logger.get_event_log().flush()
+        return n, time.perf_counter() - t0
+
+
+def bench_append_jsonl_secure(n: int, work: Path) -> Tuple[int, float]:
+    path = str(work / "audit_log.jsonl")
+    records = list(audit_records(n))
+    t0 = time.perf_counter()
+    for rec in records:
+        app.append_jsonl_secure(path, rec)
+    return n, time.perf_counter() - t0
+
+
+def bench_aggregate_catch_up(n: int, work: Path) -> Tuple[int, float]:
+    """First aggregate read over a store it has never seen (folds every session)."""
+    with session_store(work) as ae:
+        populate_store(n)
+        t0 = time.perf_counter()
+        ae.aggregate_metrics()
+        return n, time.perf_counter() - t0
+
+
+def bench_aggregate_full(n: int, work: Path) -> Tuple[int, float]:
+    """aggregate_metrics over explicit rows streamed from the store."""
+    with session_store(work) as ae:
+        populate_store(n)
+        t0 = time.perf_counter()
+        ae.aggregate_metrics(ae.iter_sessions())
+        return n, time.perf_counter() - t0
+
+
+def bench_collect_participant_records(n: int, work: Path) -> Tuple[int, float]:
+    logs = {name: str(work / f"{name.lower()}.jsonl") for name in ("AUDIT_LOG", "CONSENT_LOG", "DATA_LOG")}
+    with patched(app, LOG_MAX_BYTES=1 << 62, **logs):
+        for batch in chunked(audit_records(n)):
+            app.append_jsonl_secure_many(logs["AUDIT_LOG"], batch)
+        rng = random.Random(SEED)
+        pids = [f"p{rng.randrange(n_participants(n)):06d}" for _ in range(LOOKUPS)]
+        t0 = time.perf_counter()
+        for pid in pids:
+            app._collect_participant_records(pid)
+        return LOOKUPS, time.perf_counter() - t0
+
+
+BENCHMARKS: Dict[str, Callable[[int, Path], Tuple[int, float]]] = {
+    "save_session_result": bench_save_session_result,
+    "log_event": bench_log_event,
+    "append_jsonl_secure": bench_append_jsonl_secure,
+    "aggregate_catch_up": bench_aggregate_catch_up,
+    "aggregate_full": bench_aggregate_full,
+    "collect_participant_records": bench_collect_participant_records,
+}
+
+
+# ---------- runner ----------
+
+def run(names: List[str], scales: List[str]) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for scale in scales:
+        for name in names:
+            with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as tmp:
+                ops, seconds = BENCHMARKS[name](SCALES[scale], Path(tmp))
+            key = f"{name}@{scale}"
+            results[key] = {"ops": ops, "seconds": round(seconds, 6),
+                            "ops_per_sec": round(ops / seconds, 1) if seconds else None}
+            print(f"{key:<40} {ops:>9} ops {seconds:>10.3f} s {results[key]['ops_per_sec']:>14,.1f} ops/s",
+                  flush=True)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float) -> List[str]:
+    regressions = []
+    for key, res in results.items():
+        base = baseline.get(key)
+        if not base or not base.get("ops_per_sec") or not res.get("ops_per_sec"):
+            continue
+        ratio = res["ops_per_sec"] / base["ops_per_sec"]
+        flag = "REGRESSION" if ratio < 1 - tolerance else "ok"
+        print(f"{key:<40} {ratio:>6.2f}x baseline  {flag}")
+        if flag != "ok":
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", action="append", choices=sorted(SCALES), help="repeatable; default 1k")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="repeatable; default all")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed slowdown vs baseline before flagging (0.3 = 30%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="merge these results into the baseline")
+    parser.add_argument("--output", type=Path, help="also write results as JSON here")
+    args = parser.parse_args(argv)
+
+    results = run(args.only or list(BENCHMARKS), args.scale or ["1k"])
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.update_baseline:
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + "\n")
+        print(f"baseline updated: {args.baseline}")
+        return 0
+    return 1 if compare(results, baseline, args.tolerance) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
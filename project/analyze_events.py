@@ -1,18 +1,36 @@
 import json
+import os
 import time
+import uuid
 from pathlib import Path
-from typing import Dict, Any, List, Union
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+from project.processors.segment_log import SegmentLog, exclusive_lock, write_atomic
+
+try:
+    import numpy as np
+except ImportError:  # batch metrics fall back to the scalar path
+    np = None
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA_PATH = ROOT / "session_data.json"
+STORE_DIR = Path(os.environ.get("SESSION_STORE_DIR", ROOT / "session_store"))
+SEGMENT_MAX_BYTES = int(os.environ.get("SESSION_SEGMENT_MAX_BYTES", 8 * 1024 * 1024))
+FSYNC_EVERY = int(os.environ.get("SESSION_FSYNC_EVERY", 32))
+FSYNC_INTERVAL_MS = int(os.environ.get("SESSION_FSYNC_INTERVAL_MS", 200))
 
 if not DATA_PATH.exists():
     DATA_PATH.write_text("[]", encoding="utf-8")
 
+_STORE: Optional[SegmentLog] = None
 
-def _read_all() -> List[Dict[str, Any]]:
-    """Reads both JSON array or newline-delimited JSON entries."""
-    text = DATA_PATH.read_text(encoding="utf-8").strip()
+
+def _read_legacy() -> List[Dict[str, Any]]:
+    """Reads both JSON array or newline-delimited JSON entries from the old session_data.json."""
+    try:
+        text = DATA_PATH.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return []
     if not text:
         return []
     try:
@@ -33,18 +51,52 @@ def _read_all() -> List[Dict[str, Any]]:
     return rows
 
 
+def get_store() -> SegmentLog:
+    """Open the append-only session store, importing legacy session_data.json once."""
+    global _STORE
+    if _STORE is None:
+        store = SegmentLog(
+            STORE_DIR,
+            segment_max_bytes=SEGMENT_MAX_BYTES,
+            fsync_every=FSYNC_EVERY,
+            fsync_interval_ms=FSYNC_INTERVAL_MS,
+        )
+        # the store's meta.json marks the import as done; the legacy file is left as is
+        store.bootstrap(_read_legacy)
+        _STORE = store
+    return _STORE
+
+
+def iter_sessions(start: int = 0) -> Iterator[Dict[str, Any]]:
+    """Stream stored sessions in append order, optionally from row ``start``."""
+    return get_store().iter_rows(start)
+
+
+def iter_session_lines() -> Iterator[bytes]:
+    """Stream stored sessions as raw JSON lines (no decode/re-encode), for exports."""
+    return get_store().iter_raw()
+
+
+def count_sessions() -> int:
+    return get_store().count()
+
+
+def _read_all() -> List[Dict[str, Any]]:
+    return list(iter_sessions())
+
+
 def _write_all(rows: List[Dict[str, Any]]) -> None:
-    with DATA_PATH.open("w", encoding="utf-8") as f:
-        json.dump(rows, f, indent=2, ensure_ascii=False)
+    get_store().rewrite(rows)
+    refresh_aggregate()
 
 
 def save_session_result(session: Dict[str, Any]) -> Dict[str, Any]:
-    """Appends a behavioral or cognitive session to file."""
-    rows = _read_all()
+    """Appends a behavioral or cognitive session to the session store."""
     session = dict(session)
     session.setdefault("server_ts", int(time.time() * 1000))
-    rows.append(session)
-    _write_all(rows)
+    session.setdefault("session_id", uuid.uuid4().hex)
+    # the aggregate is not touched here: the next read folds new rows in from its cursor
+    get_store().append(session)
     return session
 
 
@@ -91,10 +143,96 @@ def compute_behavioral_metrics(session: Dict[str, Any]) -> Dict[str, Any]:
     return metrics
 
 
+# Event type codes used by the columnar batch path; anything else is "other".
+_EVENT_CODES = {"hint": 0, "retry": 1, "keypress": 2}
+_N_CODES = 4
+
+
+def compute_behavioral_metrics_batch(sessions: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Same results as compute_behavioral_metrics for every session, computed in one
+    pass over columnar arrays (session index, type code, ts) instead of per-event
+    Python loops. Falls back to the scalar function when NumPy is unavailable.
+    """
+    sessions = list(sessions)
+    if np is None or not sessions:
+        return [compute_behavioral_metrics(s) for s in sessions]
+
+    n = len(sessions)
+    lengths: List[int] = []
+    codes: List[int] = []
+    ts_owner: List[int] = []
+    ts_vals: List[float] = []
+    ts_float: List[bool] = []
+    totals: List[Any] = []
+    code_of = _EVENT_CODES.get
+    other = _N_CODES - 1
+    for i, s in enumerate(sessions):
+        start = s.get("start_ts")
+        end = s.get("end_ts")
+        totals.append(max(0, end - start) if (start and end) else None)
+        events = s.get("events", []) or []
+        lengths.append(len(events))
+        for e in events:
+            codes.append(code_of(e.get("type"), other))
+            ts = e.get("ts")
+            if isinstance(ts, (int, float)):
+                ts_owner.append(i)
+                ts_vals.append(ts)
+                ts_float.append(isinstance(ts, float))
+
+    # counts per (session, type code)
+    owner = np.repeat(np.arange(n), lengths)
+    counts = np.bincount(owner * _N_CODES + np.asarray(codes, dtype=np.int64),
+                         minlength=n * _N_CODES).reshape(n, _N_CODES)
+
+    # hesitation: sort by (session, ts) and sum same-session gaps over the threshold;
+    # like the scalar loop, the sum only turns float once a float gap is added
+    hesitation = np.zeros(n)
+    float_hesitation = np.zeros(n, dtype=bool)
+    if len(ts_vals) > 1:
+        t_owner = np.asarray(ts_owner, dtype=np.int64)
+        t_vals = np.asarray(ts_vals, dtype=np.float64)
+        t_float = np.asarray(ts_float, dtype=bool)
+        order = np.lexsort((t_vals, t_owner))
+        t_owner, t_vals, t_float = t_owner[order], t_vals[order], t_float[order]
+        gaps = np.diff(t_vals)
+        mask = (t_owner[1:] == t_owner[:-1]) & (gaps > 1500)
+        hesitation = np.bincount(t_owner[1:][mask], weights=gaps[mask], minlength=n)
+        gap_float = mask & (t_float[1:] | t_float[:-1])
+        float_hesitation = np.bincount(t_owner[1:][gap_float], minlength=n) > 0
+
+    # performance score with the scalar function's operation order
+    timed = np.array([bool(t) for t in totals])
+    total_ms = np.array([float(t) if t else 0.0 for t in totals])
+    hints, retries, keypresses = counts[:, 0], counts[:, 1], counts[:, 2]
+    score = np.where(timed, 100 - total_ms / 1000.0 * 0.5, 100.0)
+    score = score - hints * 5
+    score = score - retries * 3
+
+    out = []
+    for i in range(n):
+        sc = float(score[i]) if timed[i] else int(score[i])
+        hes = float(hesitation[i]) if float_hesitation[i] else int(hesitation[i])
+        out.append({
+            "total_time_ms": totals[i],
+            "hints_used": int(hints[i]),
+            "retries": int(retries[i]),
+            "keypress_count": int(keypresses[i]),
+            "hesitation_ms": hes,
+            "performance_score": round(max(0, sc), 2),
+            "type": "behavioral",
+        })
+    return out
+
+
 # ---------- COGNITIVE METRICS ----------
 
 def compute_cognitive_metrics(session: Dict[str, Any]) -> Dict[str, Any]:
-    """Compute averages across all modules/questions in structured test data."""
+    """
+    Compute averages across all modules/questions in structured test data.
+    Null ``questions`` lists and null per-question numbers count as empty / 0.
+    """
     modules = session.get("modules", [])
     if not modules:
         return {"type": "cognitive", "modules": 0, "avg_accuracy": 0, "avg_time": 0}
@@ -106,14 +244,14 @@ def compute_cognitive_metrics(session: Dict[str, Any]) -> Dict[str, Any]:
     total_retries = 0
 
     for module in modules:
-        questions = module.get("questions", [])
+        questions = module.get("questions", []) or []
         for q in questions:
             total_questions += 1
             if q.get("correct"):
                 correct_count += 1
-            total_time += q.get("time_taken_seconds", 0)
-            total_hesitation += q.get("hesitation_seconds", 0)
-            total_retries += q.get("retries", 0)
+            total_time += q.get("time_taken_seconds", 0) or 0
+            total_hesitation += q.get("hesitation_seconds", 0) or 0
+            total_retries += q.get("retries", 0) or 0
 
     avg_accuracy = (correct_count / total_questions * 100) if total_questions else 0
     avg_time = (total_time / total_questions) if total_questions else 0
@@ -131,55 +269,181 @@ def compute_cognitive_metrics(session: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+# ---------- SHARED METRICS KERNEL ----------
+
+def session_metrics(session: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Classify a stored session and score it. Every consumer (submit_result,
+    the running aggregate, the per-session metrics table) goes through here so
+    the formulas live in exactly one place.
+
+    A row carrying both ``events`` and ``modules`` is behavioral, as it always
+    was for submit_result and the aggregate. The old inline dashboard code
+    checked ``modules`` first; it now agrees with the other consumers.
+    """
+    if isinstance(session, dict) and "events" in session:
+        return "behavioral", compute_behavioral_metrics(session)
+    if isinstance(session, dict) and "modules" in session:
+        return "cognitive", compute_cognitive_metrics(session)
+    return "unknown", {"note": "Unknown data type; no metrics computed"}
+
+
 # ---------- MAIN METRIC AGGREGATOR ----------
+#
+# Running sums are persisted next to the store, so /metrics does not re-read
+# history. The state carries the store position it has seen; reads fold in
+# whatever was appended past that position and save the state again. Saving
+# happens only on reads and skips the fsync, because the state can always be
+# rebuilt from the store. Submits therefore never take the aggregate lock.
+# A new store generation (erase) or AGGREGATE_VERSION bump triggers a full
+# rebuild.
 
-def aggregate_metrics() -> Dict[str, Any]:
-    rows = _read_all()
-    if not rows:
-        return {"count_total": 0}
+AGGREGATE_VERSION = 1
+AGGREGATE_PATH = STORE_DIR / "aggregate.json"
+AGGREGATE_LOCK = STORE_DIR / "aggregate.lock"
 
-    behavioral = []
-    cognitive = []
 
-    for s in rows:
-        if "events" in s:
-            behavioral.append(compute_behavioral_metrics(s))
-        elif "modules" in s:
-            cognitive.append(compute_cognitive_metrics(s))
+def _empty_aggregate(generation: int = 0) -> Dict[str, Any]:
+    return {
+        "version": AGGREGATE_VERSION,
+        "generation": generation,
+        "cursor": None,
+        "count_total": 0,
+        "behavioral": {"count": 0, "time_n": 0, "time_s": 0, "hints": 0, "retries": 0, "score": 0},
+        "cognitive": {"count": 0, "accuracy": 0, "time_s": 0, "hesitation_s": 0, "retries": 0},
+    }
+
+
+def _fold_session(state: Dict[str, Any], s: Dict[str, Any]) -> None:
+    state["count_total"] += 1
+    kind, m = session_metrics(s)
+    if kind == "behavioral":
+        b = state["behavioral"]
+        b["count"] += 1
+        if m.get("total_time_ms"):
+            b["time_n"] += 1
+            b["time_s"] += m["total_time_ms"] / 1000.0
+        b["hints"] += m["hints_used"]
+        b["retries"] += m["retries"]
+        b["score"] += m["performance_score"]
+    elif kind == "cognitive":
+        c = state["cognitive"]
+        c["count"] += 1
+        c["accuracy"] += m.get("avg_accuracy", 0)
+        c["time_s"] += m.get("avg_time_seconds", 0)
+        c["hesitation_s"] += m.get("avg_hesitation_seconds", 0)
+        c["retries"] += m.get("avg_retries", 0)
+
+
+def _summarize(state: Dict[str, Any]) -> Dict[str, Any]:
+    if not state["count_total"]:
+        return {"count_total": 0}
 
-    def mean(values):
-        return round(sum(values) / len(values), 2) if values else 0
+    def mean(total, n):
+        return round(total / n, 2) if n else 0
 
+    b = state["behavioral"]
+    c = state["cognitive"]
     behavioral_summary = {
-        "count": len(behavioral),
-        "avg_time_s": mean([m["total_time_ms"] / 1000.0 for m in behavioral if m.get("total_time_ms")]),
-        "avg_hints": mean([m["hints_used"] for m in behavioral]),
-        "avg_retries": mean([m["retries"] for m in behavioral]),
-        "avg_score": mean([m["performance_score"] for m in behavioral]),
+        "count": b["count"],
+        "avg_time_s": mean(b["time_s"], b["time_n"]),
+        "avg_hints": mean(b["hints"], b["count"]),
+        "avg_retries": mean(b["retries"], b["count"]),
+        "avg_score": mean(b["score"], b["count"]),
     }
 
     cognitive_summary = {
-        "count": len(cognitive),
-        "avg_accuracy": mean([m["avg_accuracy"] for m in cognitive]),
-        "avg_time_s": mean([m["avg_time_seconds"] for m in cognitive]),
-        "avg_hesitation_s": mean([m["avg_hesitation_seconds"] for m in cognitive]),
-        "avg_retries": mean([m["avg_retries"] for m in cognitive]),
+        "count": c["count"],
+        "avg_accuracy": mean(c["accuracy"], c["count"]),
+        "avg_time_s": mean(c["time_s"], c["count"]),
+        "avg_hesitation_s": mean(c["hesitation_s"], c["count"]),
+        "avg_retries": mean(c["retries"], c["count"]),
     }
 
     return {
-        "count_total": len(rows),
+        "count_total": state["count_total"],
         "behavioral_summary": behavioral_summary,
         "cognitive_summary": cognitive_summary,
     }
 
 
+def _load_aggregate() -> Dict[str, Any]:
+    try:
+        return json.loads(AGGREGATE_PATH.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return _empty_aggregate()
+
+
+def _save_aggregate(state: Dict[str, Any]) -> None:
+    # no fsync: a lost or stale state is rebuilt from the store by position
+    write_atomic(AGGREGATE_PATH, json.dumps(state).encode("utf-8"), fsync=False)
+
+
+def _catch_up(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold in every row past the state's cursor, rebuilding on generation/schema change."""
+    store = get_store()
+    for _ in range(2):
+        generation = store.generation
+        if state.get("version") != AGGREGATE_VERSION or state.get("generation") != generation:
+            state = _empty_aggregate(generation)
+        cursor = tuple(state["cursor"]) if state.get("cursor") else None
+        try:
+            for line, pos in store.iter_raw_from(cursor):
+                cursor = pos
+                try:
+                    row = json.loads(line)
+                except Exception:
+                    continue
+                _fold_session(state, row)
+        except ValueError:
+            # store rewritten while we were reading; start over on the new generation
+            state = _empty_aggregate()
+            continue
+        state["cursor"] = list(cursor) if cursor else None
+        return state
+    return state
+
+
+def refresh_aggregate() -> Dict[str, Any]:
+    """Bring the persisted aggregate state up to date with the store and return it."""
+    get_store()
+    with exclusive_lock(AGGREGATE_LOCK):
+        state = _load_aggregate()
+        before = (state.get("generation"), state.get("cursor"), state.get("version"))
+        state = _catch_up(state)
+        if (state.get("generation"), state.get("cursor"), state.get("version")) != before:
+            _save_aggregate(state)
+    return state
+
+
+def aggregate_metrics(rows: Optional[Iterable[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Summarize sessions. Without ``rows`` this reads the persisted running
+    aggregate (constant time); with ``rows`` it summarizes just those sessions.
+    """
+    if rows is not None:
+        state = _empty_aggregate()
+        for s in rows:
+            _fold_session(state, s)
+        return _summarize(state)
+    return _summarize(refresh_aggregate())
+
+
 def export_all() -> List[Dict[str, Any]]:
     return _read_all()
 
 
 def erase_participant(participant_id: str) -> int:
-    rows = _read_all()
-    remaining = [r for r in rows if r.get("participant_id") != participant_id]
-    removed = len(rows) - len(remaining)
-    _write_all(remaining)
+    removed = 0
+
+    def remaining():
+        nonlocal removed
+        for r in iter_sessions():
+            if r.get("participant_id") == participant_id:
+                removed += 1
+                continue
+            yield r
+
+    get_store().rewrite(remaining())
+    refresh_aggregate()
     return removed
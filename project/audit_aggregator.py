@@ -0,0 +1,134 @@
+"""
+Aggregation of high-volume denial events before they reach the audit log.
+
+For the actions in ACTIONS, the first event per (action, ip) is written as
+usual and opens a window of ``interval_s`` seconds. Further events for the
+same key inside the window are only counted. When the window closes, one
+summary record is written in their place, with the same action and status
+and ``extra.aggregate``::
+
+    {"count": 812, "first_ts": "...", "last_ts": "...",
+     "paths": ["/admin/x", "/wp-login.php"], "window_s": 10}
+
+``paths`` holds up to ``sample_paths`` distinct paths. Summaries go through
+the same writer as every other audit line, so they are chained and HMAC'd
+like the rest of the log. Only the per-event lines are replaced by their
+count.
+
+Once ``max_keys`` windows are open, events for new ips are counted under an
+``ip="*"`` key, so a spread-out scan cannot grow the table. A daemon thread
+(started lazily in each process) closes windows when they are due, even when
+traffic stops. ``flush`` closes all open windows at once (used at exit);
+readers use ``flush(due_only=True)``.
+"""
+import atexit
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+ACTIONS = ("host_block", "admin_access_denied", "honeypot_trigger")
+
+
+def _path(rec: Dict[str, Any]) -> Optional[str]:
+    extra = rec.get("extra") or {}
+    return extra.get("path") or rec.get("subject")
+
+
+class AuditAggregator:
+    def __init__(self, emit: Callable[[Dict[str, Any]], None], interval_s: float = 10.0,
+                 actions=ACTIONS, sample_paths: int = 5, max_keys: int = 10000):
+        self.emit = emit
+        self.interval_s = interval_s
+        self.actions = frozenset(actions)
+        self.sample_paths = sample_paths
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._windows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        atexit.register(self.flush)
+
+    def add(self, rec: Dict[str, Any]) -> bool:
+        """
+        Offer an audit record. Returns True if it was absorbed into a window
+        (the caller must not write it), False if it should be written now.
+        """
+        action = rec.get("action")
+        if self.interval_s <= 0 or action not in self.actions:
+            return False
+        self._ensure_started()
+        now = time.monotonic()
+        key = (action, rec.get("ip") or "")
+        with self._lock:
+            w = self._windows.get(key)
+            if w is None and len(self._windows) >= self.max_keys:
+                key = (action, "*")
+                w = self._windows.get(key)
+            if w is None:
+                # first event opens the window and is written in full
+                self._windows[key] = {"opened": now, "template": rec, "count": 0,
+                                      "first_ts": None, "last_ts": None, "paths": []}
+                return False
+            w["count"] += 1
+            w["first_ts"] = w["first_ts"] or rec.get("ts")
+            w["last_ts"] = rec.get("ts")
+            path = _path(rec)
+            if path and path not in w["paths"] and len(w["paths"]) < self.sample_paths:
+                w["paths"].append(path)
+        return True
+
+    def _summary(self, key: Tuple[str, str], w: Dict[str, Any]) -> Dict[str, Any]:
+        t = w["template"]
+        return {
+            "ts": w["last_ts"],
+            "ip": key[1] or None,
+            "action": key[0],
+            "actor": t.get("actor"),
+            "subject": t.get("subject") if len(w["paths"]) <= 1 else None,
+            "status": t.get("status"),
+            "extra": {"aggregate": {
+                "count": w["count"],
+                "first_ts": w["first_ts"],
+                "last_ts": w["last_ts"],
+                "paths": w["paths"],
+                "window_s": self.interval_s,
+            }},
+        }
+
+    def flush(self, due_only: bool = False) -> int:
+        """Close windows (all, or only those older than interval_s) and emit their summaries."""
+        now = time.monotonic()
+        with self._lock:
+            closing = [(k, w) for k, w in self._windows.items()
+                       if not due_only or now - w["opened"] >= self.interval_s]
+            for k, _ in closing:
+                del self._windows[k]
+        summaries = [self._summary(k, w) for k, w in closing if w["count"]]
+        for rec in summaries:
+            try:
+                self.emit(rec)
+            except Exception as e:
+                print(f"[WARN] audit summary write failed: {e}")
+        return len(summaries)
+
+    # ---------- background closer ----------
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None:
+                self._windows = {}  # windows inherited across fork belong to the parent
+                self._thread = threading.Thread(target=self._run, name="audit-aggregator", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def _run(self) -> None:
+        tick = max(0.05, min(1.0, self.interval_s / 4))
+        while True:
+            time.sleep(tick)
+            try:
+                self.flush(due_only=True)
+            except Exception as e:
+                print(f"[WARN] audit aggregator flush failed: {e}")
@@ -0,0 +1,195 @@
+"""
+Background group-commit writer for audit lines.
+
+Request threads hand records to ``LogWriter.submit``; a single writer thread
+drains the queue every ``batch_ms`` and hands each log's batch to
+``write_batch(path, records, fsync)`` so many audit lines share one write and
+one fsync.
+
+Durability modes:
+  sync   - write (and fsync) on the calling thread, as before
+  group  - queue, then block the caller until its batch is on disk
+  async  - queue and return immediately; lines are fsynced per batch
+
+If the queue is full the record is written inline rather than dropped. If
+a batch write fails, its records are retried one by one (up to
+WRITE_ATTEMPTS each); a record that still fails is counted in ``failed``
+and the error is raised to whoever waits on it (a ``group`` submitter or a
+``flush``) instead of being lost silently.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MODES = ("sync", "group", "async")
+# per-record attempts after a failed batch write
+WRITE_ATTEMPTS = 3
+RETRY_DELAY_S = 0.05
+
+_STOP = object()
+
+
+class AuditWriteError(RuntimeError):
+    """Audit records could not be written after retries."""
+
+
+class _Done(threading.Event):
+    """Completion signal for a queued item; ``error`` is set if its batch lost records."""
+
+    def __init__(self):
+        super().__init__()
+        self.error: Optional[BaseException] = None
+
+
+class LogWriter:
+    def __init__(self,
+                 write_batch: Callable[[str, List[Dict[str, Any]], bool], None],
+                 mode: str = "async",
+                 batch_ms: int = 5,
+                 max_batch: int = 512,
+                 max_queue: int = 10000):
+        if mode not in MODES:
+            raise ValueError(f"unknown durability mode: {mode!r} (expected one of {MODES})")
+        self.write_batch = write_batch
+        self.mode = mode
+        self.batch_ms = batch_ms
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self.failed = 0  # records given up on after WRITE_ATTEMPTS
+        atexit.register(self.close)
+
+    # ---------- lifecycle ----------
+
+    def _ensure_started(self) -> queue.Queue:
+        # started lazily so each forked worker gets its own thread
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return self._queue
+        with self._start_lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+        return self._queue
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Drain pending records and stop the writer thread (flush-on-shutdown hook)."""
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """
+        Block until everything submitted so far is written. Raises
+        AuditWriteError if records were given up on while waiting.
+        """
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            return
+        failed = self.failed
+        done = _Done()
+        try:
+            self._queue.put((None, None, done), timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+        if done.error is not None:
+            raise done.error
+        if self.failed != failed:
+            raise AuditWriteError(f"{self.failed - failed} audit record(s) could not be written")
+
+    def pending(self) -> int:
+        """Records queued in this process and not yet handed to ``write_batch`` (approximate)."""
+        if self._pid != os.getpid() or self._queue is None:
+            return 0
+        return self._queue.qsize()
+
+    # ---------- producer side ----------
+
+    def submit(self, path: str, record: Dict[str, Any]) -> None:
+        if self.mode == "sync":
+            self.write_batch(path, [record], True)
+            return
+        q = self._ensure_started()
+        done = _Done() if self.mode == "group" else None
+        try:
+            q.put_nowait((path, record, done))
+        except queue.Full:
+            # never drop audit lines; pay the inline cost instead
+            self.write_batch(path, [record], True)
+            return
+        if done is not None:
+            done.wait()
+            if done.error is not None:
+                raise done.error
+
+    # ---------- writer thread ----------
+
+    def _run(self) -> None:
+        q = self._queue
+        stopping = False
+        while not stopping:
+            item = q.get()
+            batch = [item]
+            deadline = time.monotonic() + self.batch_ms / 1000.0
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stopping = any(b is _STOP for b in batch)
+            if stopping:
+                # take whatever else is already queued before exiting
+                while True:
+                    try:
+                        batch.append(q.get_nowait())
+                    except queue.Empty:
+                        break
+            self._commit([b for b in batch if b is not _STOP])
+
+    def _commit(self, batch: List[Tuple[Optional[str], Any, Optional[threading.Event]]]) -> None:
+        by_path: Dict[str, List[Dict[str, Any]]] = {}
+        for path, record, _ in batch:
+            if path is not None:
+                by_path.setdefault(path, []).append(record)
+        error: Optional[BaseException] = None
+        for path, records in by_path.items():
+            try:
+                self.write_batch(path, records, True)
+            except Exception as e:
+                print(f"[WARN] audit batch write failed for {path}, retrying per record: {e}")
+                error = self._retry(path, records) or error
+        for _, _, done in batch:
+            if done is not None:
+                done.error = error
+                done.set()
+
+    def _retry(self, path: str, records: List[Dict[str, Any]]) -> Optional[BaseException]:
+        """Write ``records`` one at a time; returns the last error if any were given up on."""
+        error = None
+        for record in records:
+            for attempt in range(WRITE_ATTEMPTS):
+                try:
+                    self.write_batch(path, [record], True)
+                    break
+                except Exception as e:
+                    if attempt + 1 < WRITE_ATTEMPTS:
+                        time.sleep(RETRY_DELAY_S)
+                        continue
+                    self.failed += 1
+                    error = AuditWriteError(f"audit record for {path} not written: {e}")
+                    print(f"[WARN] {error}")
+        return error
@@ -0,0 +1,93 @@
+"""
+In-memory bot reputation per client (keyed by IP hash), fed by the audit
+events that the deception endpoints already write.
+
+Each key has a score that decays exponentially with HALF_LIFE_S. Scoring an
+event costs one multiply and one add, and so does reading a score; no
+history is kept. The table is bounded: when it is full, the least recently
+touched key is evicted.
+
+Audit actions and their weights:
+
+  snare_trigger       1 (+2 when deception.js reports a submit faster than FAST_SUBMIT_MS)
+  decoy_hit           2
+  fake_login_attempt  3
+  honeypot_trigger    5
+
+``suspect`` (score >= suspect_score) and ``blocked`` (score >= block_score)
+are O(1) checks, cheap enough to run before any body parsing.
+"""
+import collections
+import math
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+WEIGHTS = {
+    "snare_trigger": 1.0,
+    "decoy_hit": 2.0,
+    "fake_login_attempt": 3.0,
+    "honeypot_trigger": 5.0,
+}
+FAST_SUBMIT_MS = 1500
+FAST_SUBMIT_WEIGHT = 2.0
+
+
+def event_weight(rec: Dict[str, Any]) -> float:
+    """Reputation weight of one audit record (0 for actions that say nothing about bots)."""
+    weight = WEIGHTS.get(rec.get("action"), 0.0)
+    if rec.get("action") == "snare_trigger":
+        payload = (rec.get("extra") or {}).get("payload") or {}
+        elapsed = payload.get("elapsed_ms") if isinstance(payload, dict) else None
+        if isinstance(elapsed, (int, float)) and 0 <= elapsed < FAST_SUBMIT_MS:
+            weight += FAST_SUBMIT_WEIGHT
+    return weight
+
+
+class ReputationTable:
+    def __init__(self, half_life_s: float = 600.0, suspect_score: float = 3.0,
+                 block_score: float = 8.0, max_entries: int = 100000):
+        self.decay = math.log(2) / half_life_s
+        self.suspect_score = suspect_score
+        self.block_score = block_score
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._scores: "collections.OrderedDict[str, Tuple[float, float]]" = collections.OrderedDict()
+
+    def _decayed(self, entry: Tuple[float, float], now: float) -> float:
+        score, at = entry
+        return score * math.exp(-self.decay * max(0.0, now - at))
+
+    def observe(self, key: str, weight: float, now: Optional[float] = None) -> float:
+        """Add ``weight`` to ``key``'s decayed score; return the new score."""
+        if not key or weight <= 0:
+            return self.score(key, now)
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._scores.pop(key, None)
+            score = (self._decayed(entry, now) if entry else 0.0) + weight
+            self._scores[key] = (score, now)
+            if len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+        return score
+
+    def score(self, key: str, now: Optional[float] = None) -> float:
+        if not key:
+            return 0.0
+        entry = self._scores.get(key)
+        if entry is None:
+            return 0.0
+        return self._decayed(entry, time.time() if now is None else now)
+
+    def suspect(self, key: str) -> bool:
+        return self.score(key) >= self.suspect_score
+
+    def blocked(self, key: str) -> bool:
+        return self.score(key) >= self.block_score
+
+    def top(self, n: int = 20) -> list:
+        """The ``n`` highest current scores as [(key, score)], highest first."""
+        now = time.time()
+        with self._lock:
+            scored = [(k, self._decayed(e, now)) for k, e in self._scores.items()]
+        return sorted(scored, key=lambda kv: kv[1], reverse=True)[:n]
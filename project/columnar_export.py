@@ -0,0 +1,108 @@
+"""
+Columnar snapshot of per-session metrics (Parquet or Arrow IPC).
+
+One row per stored session with the compute_behavioral_metrics /
+compute_cognitive_metrics fields plus participant_id, task_id and server_ts.
+Rows come from the MetricsTable, which scores each session once; converted
+Arrow record batches are cached so a new snapshot only converts sessions
+stored since the previous one. If the store is rewritten while a snapshot
+is taken, the table is re-synced and the snapshot retried; after
+SNAPSHOT_ATTEMPTS it raises SnapshotUnavailable instead of returning a
+partial or empty table. pyarrow is optional: without it
+``snapshot_available()`` is False.
+"""
+import io
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from project.analyze_events import get_store
+from project.metrics_table import COLUMNS, get_metrics_table
+
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),
+}
+
+_STRING_COLUMNS = ("session_key", "kind", "participant_id", "task_id")
+_INT_COLUMNS = ("server_ts", "hints_used", "retries", "keypress_count", "modules", "questions")
+
+
+def snapshot_available() -> bool:
+    return pa is not None
+
+
+def _schema():
+    fields = []
+    for name in COLUMNS:
+        if name in _STRING_COLUMNS:
+            fields.append(pa.field(name, pa.string()))
+        elif name in _INT_COLUMNS:
+            fields.append(pa.field(name, pa.int64()))
+        else:
+            fields.append(pa.field(name, pa.float64()))
+    return pa.schema(fields)
+
+
+def _coerce(name: str, values: List[Any]) -> List[Any]:
+    if name in _STRING_COLUMNS:
+        return [None if v is None else str(v) for v in values]
+    if name in _INT_COLUMNS:
+        return [v if isinstance(v, int) and not isinstance(v, bool) else None for v in values]
+    return [float(v) if isinstance(v, (int, float)) else None for v in values]
+
+
+# generation -> converted record batches / row count
+_CACHE: Dict[str, Any] = {"generation": None, "rows": 0, "batches": []}
+_CACHE_LOCK = threading.Lock()
+# re-syncs tried when the store is rewritten mid-snapshot
+SNAPSHOT_ATTEMPTS = 3
+
+
+class SnapshotUnavailable(RuntimeError):
+    """The session store kept changing while a snapshot was being taken."""
+
+
+def snapshot_table():
+    """Arrow table for every stored session, converting only rows not seen before."""
+    schema = _schema()
+    for _ in range(SNAPSHOT_ATTEMPTS):
+        table = get_metrics_table()
+        with _CACHE_LOCK:
+            if _CACHE["generation"] != table.generation:
+                _CACHE.update(generation=table.generation, rows=0, batches=[])
+            generation, cols = table.snapshot_columns(COLUMNS, start=_CACHE["rows"])
+            if generation != _CACHE["generation"] or generation != get_store().generation:
+                # store rewritten (erase) between the reads: re-sync and try again
+                _CACHE.update(generation=None, rows=0, batches=[])
+                continue
+            added = len(cols["session_key"])
+            if added:
+                arrays = [pa.array(_coerce(name, cols[name]), type=schema.field(name).type) for name in COLUMNS]
+                _CACHE["batches"].append(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                _CACHE["rows"] += added
+            return pa.Table.from_batches(list(_CACHE["batches"]), schema=schema)
+    raise SnapshotUnavailable(f"session store changed during {SNAPSHOT_ATTEMPTS} snapshot attempts")
+
+
+def write_snapshot(fmt: str, sink: Optional[io.BytesIO] = None) -> io.BytesIO:
+    """Serialize the snapshot as ``fmt`` ("parquet" or "arrow") into ``sink``."""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown snapshot format: {fmt!r}")
+    sink = sink or io.BytesIO()
+    tbl = snapshot_table()
+    if fmt == "parquet":
+        pq.write_table(tbl, sink, compression="zstd")
+    else:
+        with pa_ipc.new_file(sink, tbl.schema) as writer:
+            writer.write_table(tbl)
+    sink.seek(0)
+    return sink
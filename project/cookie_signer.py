@@ -0,0 +1,65 @@
+"""
+HMAC-SHA256 signing for short cookie values (the signed hp_field cookie).
+
+The key is absorbed once into a base HMAC object. Each signature is then a
+``copy()`` of that object plus one update, so the key is never re-encoded or
+re-padded per call. Signatures of recently seen values are kept in a bounded
+LRU keyed by the value. A repeat visitor's cookie therefore costs a dict
+lookup and a constant-time ``compare_digest`` of the presented signature
+against the cached one. Only computed signatures are cached, never the
+presented ones, so a forged signature for a cached name is still rejected.
+``rotate`` (or ``ensure_key`` with a changed key) clears the cache.
+"""
+import collections
+import hashlib
+import hmac
+import threading
+from typing import Optional
+
+
+class CookieSigner:
+    def __init__(self, key: str, max_entries: int = 4096):
+        self.max_entries = max(0, int(max_entries))
+        self._lock = threading.Lock()
+        self._cache: "collections.OrderedDict[str, str]" = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._key: Optional[str] = None
+        self.rotate(key)
+
+    def rotate(self, key: str) -> None:
+        """Switch to ``key``; signatures cached under the old key are dropped."""
+        base = hmac.new(key.encode("utf-8"), digestmod=hashlib.sha256)
+        with self._lock:
+            self._key, self._base = key, base
+            self._cache.clear()
+
+    def ensure_key(self, key: str) -> None:
+        """Rotate if ``key`` differs from the current one (supports live rotation via env)."""
+        if key != self._key:
+            self.rotate(key)
+
+    def _compute(self, val: str) -> str:
+        h = self._base.copy()
+        h.update(val.encode("utf-8"))
+        return h.hexdigest()
+
+    def sign(self, val: str) -> str:
+        """Hex HMAC-SHA256 of ``val``."""
+        with self._lock:
+            sig = self._cache.get(val)
+            if sig is not None:
+                self._cache.move_to_end(val)
+                self.hits += 1
+                return sig
+            self.misses += 1
+            sig = self._compute(val)
+            if self.max_entries:
+                self._cache[val] = sig
+                if len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return sig
+
+    def verify(self, val: str, sig: str) -> bool:
+        """Constant-time check of ``sig`` against the signature of ``val``."""
+        return hmac.compare_digest(self.sign(val), sig)
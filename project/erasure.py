@@ -0,0 +1,214 @@
+"""
+In-place participant erasure for the JSONL logs.
+
+The participant index gives the exact (offset, length) of every line that
+mentions a participant in every segment, so an erasure job only reads and
+rewrites those lines. Each affected line is overwritten in place with a
+record of the same byte length:
+
+  pseudonymize - identifiers replaced by the participant's token, re-encoded
+                 compactly and padded with spaces before the newline; the
+                 optional ``mark`` fields are added only if they still fit
+  tombstone    - ``{"_erased": true, "ts": ...}`` (also the fallback when a
+                 pseudonymized line would not fit)
+
+Line lengths never change, so line offsets, tail cursors and the segment
+line/byte counters stay valid. Rewritten lines keep their ``_p``/``_h``
+chain fields (a tombstone drops them only when the line is too short to
+hold them, and app.py's tail read skips such a line), so the chain head of each segment (the manifest's ``head``
+and app.py's chain-head cache) is unchanged and later appends still link to
+it. The HMAC of a rewritten line no longer matches its content; a verifier
+must treat lines carrying ``_erased`` or a pseudonym as links only. What
+does change is derived from line content: each rewritten segment's
+participant index is rebuilt (the erased ids leave the sidecar and the
+pseudonyms become searchable) and its recent-entry ring in log_metrics is
+dropped.
+
+Before a segment is touched, the original bytes of just its affected lines
+are appended (and fsynced) to the job's backup journal, one JSON object per
+line: ``{"file", "offset", "length", "line"}``. ``restore`` writes them back.
+Several participants are handled in one pass over the affected segments.
+"""
+import contextlib
+import datetime
+import json
+import os
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from project import log_metrics, log_segments, participant_index
+
+MODES = ("pseudonymize", "tombstone")
+# hash-chain fields written by append_jsonl_secure; kept on every rewritten line
+CHAIN_FIELDS = ("_p", "_h")
+
+
+def _mentions(obj: Any, pid: str) -> bool:
+    if not isinstance(obj, dict):
+        return False
+    if pid in participant_index.participant_keys(obj):
+        return True
+    return any(v == pid for v in obj.values() if isinstance(v, str))
+
+
+def _pseudonymize(obj: Dict[str, Any], hits: Dict[str, str], mark: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    obj = dict(obj)
+    for pid, token in hits.items():
+        for field in ("actor", "subject"):
+            val = obj.get(field)
+            if isinstance(val, str) and val.endswith(pid):
+                obj[field] = val[: len(val) - len(pid)] + token
+        extra = obj.get("extra")
+        if isinstance(extra, dict):
+            extra = dict(extra)
+            for field in ("participant_id", "target_id"):
+                if extra.get(field) == pid:
+                    extra[field] = token
+            obj["extra"] = extra
+        for key, val in obj.items():
+            if val == pid:
+                obj[key] = token
+    if mark:
+        obj.update(mark)
+    return obj
+
+
+def _fit(obj: Optional[Dict[str, Any]], length: int) -> Optional[bytes]:
+    """``obj`` as a line of exactly ``length`` bytes (padded), or None if it does not fit."""
+    body = b"" if obj is None else json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(body) + 1 > length:
+        return None
+    return body + b" " * (length - 1 - len(body)) + b"\n"
+
+
+def _tombstone(obj: Any, length: int) -> bytes:
+    ts = (obj.get("ts") or obj.get("timestamp")) if isinstance(obj, dict) else None
+    stamp = {"ts": ts} if ts else {}
+    chain = {k: obj[k] for k in CHAIN_FIELDS if k in obj} if isinstance(obj, dict) else {}
+    candidates = ({"_erased": True, **stamp, **chain}, {"_erased": True, **chain},
+                  {"_erased": True, **stamp}, {"_erased": True})
+    for candidate in candidates:
+        line = _fit(candidate, length)
+        if line is not None:
+            return line
+    return _fit(None, length)  # blank line; readers skip it
+
+
+class ErasureJob:
+    """
+    One erasure pass over ``paths`` (each with all of its segments) for the
+    participants in ``tokens`` (participant_id -> replacement token).
+    ``lock(path)`` must serialize with appends to that log.
+    """
+
+    def __init__(self, paths: Iterable[str], tokens: Dict[str, str], backup_dir: str,
+                 mode: str = "pseudonymize", mark: Optional[Dict[str, Any]] = None,
+                 lock: Optional[Callable[[str], Any]] = None):
+        if mode not in MODES:
+            raise ValueError(f"unknown erasure mode: {mode!r} (expected one of {MODES})")
+        self.paths = list(paths)
+        self.tokens = dict(tokens)
+        self.mode = mode
+        self.mark = mark
+        self.lock = lock or (lambda path: contextlib.nullcontext())
+        stamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        self.backup_path = os.path.join(backup_dir, f"erase-{stamp}-{uuid.uuid4().hex[:8]}.jsonl")
+        self.changed: Dict[str, int] = {}
+        self.tombstoned = 0
+
+    def run(self) -> Dict[str, Any]:
+        for path in self.paths:
+            with self.lock(path):
+                for seg in log_segments.segment_files(path):
+                    self._erase_segment(seg)
+        return {
+            "changed_lines": sum(self.changed.values()),
+            "files": self.changed,
+            "tombstoned": self.tombstoned,
+            "backup": self.backup_path if self.changed else None,
+        }
+
+    def _erase_segment(self, seg: str) -> None:
+        found = sorted({span for pid in self.tokens for span in participant_index.spans(seg, pid)})
+        if not found:
+            return
+        try:
+            fd = os.open(seg, os.O_RDWR)
+        except FileNotFoundError:
+            return
+        try:
+            edits: List[Tuple[int, bytes, bytes]] = []
+            for offset, length in found:
+                raw = os.pread(fd, length, offset)
+                if len(raw) != length or not raw.endswith(b"\n"):
+                    continue
+                try:
+                    obj = json.loads(raw)
+                except Exception:
+                    continue
+                hits = {pid: tok for pid, tok in self.tokens.items() if _mentions(obj, pid)}
+                if not hits:
+                    continue  # index over-match (e.g. actor suffix) or already erased
+                new = None
+                if self.mode == "pseudonymize":
+                    new = _fit(_pseudonymize(obj, hits, self.mark), length)
+                    if new is None and self.mark:
+                        new = _fit(_pseudonymize(obj, hits, None), length)
+                if new is None:
+                    new = _tombstone(obj, length)
+                    self.tombstoned += 1
+                edits.append((offset, raw, new))
+            if not edits:
+                return
+            self._backup(seg, edits)
+            for offset, _, new in edits:
+                os.pwrite(fd, new, offset)
+            os.fsync(fd)
+            self.changed[seg] = self.changed.get(seg, 0) + len(edits)
+        finally:
+            os.close(fd)
+        # the sidecar still maps the erased ids to these lines
+        participant_index.rebuild(seg)
+        log_metrics.invalidate(seg)
+
+    def _backup(self, seg: str, edits: List[Tuple[int, bytes, bytes]]) -> None:
+        """Copy-on-write: persist the original bytes before overwriting them."""
+        os.makedirs(os.path.dirname(self.backup_path), exist_ok=True)
+        data = b"".join(
+            (json.dumps({"file": seg, "offset": off, "length": len(raw),
+                         "line": raw.decode("utf-8", errors="replace")}, ensure_ascii=False) + "\n").encode("utf-8")
+            for off, raw, _ in edits
+        )
+        fd = os.open(self.backup_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def restore(backup_path: str, lock: Optional[Callable[[str], Any]] = None) -> int:
+    """Write the original lines recorded in a backup journal back into place."""
+    lock = lock or (lambda path: contextlib.nullcontext())
+    by_file: Dict[str, List[Dict[str, Any]]] = {}
+    with open(backup_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                e = json.loads(line)
+                by_file.setdefault(e["file"], []).append(e)
+    restored = 0
+    for seg, entries in by_file.items():
+        with lock(seg):
+            fd = os.open(seg, os.O_RDWR)
+            try:
+                for e in entries:
+                    data = e["line"].encode("utf-8")
+                    if len(data) == e["length"]:
+                        os.pwrite(fd, data, e["offset"])
+                        restored += 1
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            participant_index.rebuild(seg)
+            log_metrics.invalidate(seg)
+    return restored
@@ -0,0 +1,72 @@
+"""
+Chunked encoders for streaming exports.
+
+Each helper turns an iterator of already-serialized JSON documents (bytes)
+into response chunks, so an export never holds the full dataset in memory.
+"""
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator
+
+CHUNK_BYTES = 64 * 1024
+
+
+def _buffered(parts: Iterable[bytes], chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    buf = []
+    size = 0
+    for part in parts:
+        buf.append(part)
+        size += len(part)
+        if size >= chunk_bytes:
+            yield b"".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield b"".join(buf)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def ndjson_chunks(docs: Iterable[bytes]) -> Iterator[bytes]:
+    """One JSON document per line."""
+    return _buffered(doc + b"\n" for doc in docs)
+
+
+def json_array_chunks(docs: Iterable[bytes]) -> Iterator[bytes]:
+    """A JSON array emitted element by element."""
+    def parts():
+        yield b"["
+        first = True
+        for doc in docs:
+            yield doc if first else b"," + doc
+            first = False
+        yield b"]"
+    return _buffered(parts())
+
+
+def json_object_chunks(head: Dict[str, Any], key: str, docs: Iterable[bytes],
+                       tail_fn=None) -> Iterator[bytes]:
+    """
+    ``{**head, key: [docs...], **tail_fn()}`` streamed; ``tail_fn`` runs after
+    the array so it can report totals that are only known at the end.
+    """
+    def parts():
+        opening = dumps_bytes(head)[:-1]
+        yield opening + (b"," if head else b"") + dumps_bytes(key) + b":"
+        yield from json_array_chunks(docs)
+        tail = tail_fn() if tail_fn else {}
+        if tail:
+            yield b"," + dumps_bytes(tail)[1:-1]
+        yield b"}"
+    return _buffered(parts())
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a chunk stream on the fly (gzip container)."""
+    comp = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
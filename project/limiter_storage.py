@@ -0,0 +1,177 @@
+"""
+SQLite rate-limit storage for flask-limiter, shared by every worker process
+on a host without a network service.
+
+Importing this module registers the ``sqlite`` scheme with ``limits``::
+
+    LIMITER_STORAGE_URI=sqlite:////var/lib/shape/ratelimit.sqlite
+
+All workers open the same database file in WAL mode. Counters live in one
+``(key, value, expiry)`` table. A fixed-window hit is a single
+``INSERT .. ON CONFLICT DO UPDATE .. RETURNING`` statement, which restarts
+expired windows in place and needs no explicit transaction. A sliding-window
+hit reads the previous and current buckets and increments the current one
+inside one ``BEGIN IMMEDIATE`` transaction, so concurrent workers never
+overshoot the limit. With ``synchronous=NORMAL``, commits in WAL mode do not
+fsync. Counters are ephemeral, so a power loss at worst forgets the last few
+hits.
+
+Connections are opened per thread and per process (never shared across
+fork). Expired rows are swept every SWEEP_EVERY writes on a connection.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+
+# writes per connection between sweeps of expired counters
+SWEEP_EVERY = 1000
+BUSY_TIMEOUT_MS = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key    TEXT PRIMARY KEY,
+    value  INTEGER NOT NULL,
+    expiry REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+_INCR = """
+INSERT INTO counters (key, value, expiry) VALUES (?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET
+    value  = CASE WHEN counters.expiry <= ? THEN excluded.value  ELSE counters.value + excluded.value END,
+    expiry = CASE WHEN counters.expiry <= ? THEN excluded.expiry ELSE counters.expiry END
+RETURNING value
+"""
+
+
+def _path_from_uri(uri: str) -> str:
+    # sqlite:///relative.db -> relative.db, sqlite:////abs/path.db -> /abs/path.db
+    path = uri.split("://", 1)[1] if "://" in uri else uri
+    if path.startswith("/"):
+        path = path[1:]
+    if not path:
+        raise ValueError(f"sqlite storage uri needs a file path: {uri!r}")
+    return path
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Rate-limit counters in a WAL-mode SQLite file (``sqlite:///<path>``)."""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = os.path.abspath(_path_from_uri(uri))
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._local = threading.local()
+        self._conn().execute(_SCHEMA)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _conn(self) -> sqlite3.Connection:
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is None or local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000.0,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            local.conn, local.pid, local.writes = conn, os.getpid(), 0
+        return conn
+
+    def _wrote(self, conn: sqlite3.Connection, now: float) -> None:
+        local = self._local
+        local.writes += 1
+        if local.writes >= SWEEP_EVERY:
+            local.writes = 0
+            conn.execute("DELETE FROM counters WHERE expiry <= ?", (now,))
+
+    # ---------- fixed window ----------
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        conn = self._conn()
+        now = time.time()
+        (value,) = conn.execute(_INCR, (key, amount, now + expiry, now, now)).fetchone()
+        self._wrote(conn, now)
+        return value
+
+    def get(self, key: str) -> int:
+        row = self._conn().execute(
+            "SELECT value FROM counters WHERE key = ? AND expiry > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT expiry FROM counters WHERE key = ? AND expiry > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def clear(self, key: str) -> None:
+        self._conn().execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def reset(self) -> int:
+        return self._conn().execute("DELETE FROM counters").rowcount
+
+    def check(self) -> bool:
+        try:
+            self._conn().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    # ---------- sliding window ----------
+
+    def _window(self, conn, previous_key, current_key, expiry, now):
+        rows = dict(conn.execute(
+            "SELECT key, value FROM counters WHERE key IN (?, ?) AND expiry > ?",
+            (previous_key, current_key, now),
+        ).fetchall())
+        previous_count = rows.get(previous_key, 0)
+        current_count = rows.get(current_key, 0)
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        conn = self._conn()
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            previous_count, previous_ttl, current_count, _ = self._window(
+                conn, previous_key, current_key, expiry, now)
+            weighted = previous_count * previous_ttl / expiry + current_count
+            allowed = math.floor(weighted) + amount <= limit
+            if allowed:
+                # the current bucket is read as the previous one for another window
+                conn.execute(_INCR, (current_key, amount, now + 2 * expiry, now, now)).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if allowed:
+            self._wrote(conn, now)
+        return allowed
+
+    def get_sliding_window(self, key: str, expiry: int):
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        return self._window(self._conn(), previous_key, current_key, expiry, now)
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self._conn().execute("DELETE FROM counters WHERE key IN (?, ?)", (previous_key, current_key))
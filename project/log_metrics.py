@@ -0,0 +1,129 @@
+"""
+Line/byte counters and recent-entry ring buffers for the JSONL logs.
+
+Totals are the sealed segments' counts from the manifest plus the live log's
+counters. append_jsonl_secure reports each write (``record_append``) so the
+live counters and ring buffers advance without touching the file. When
+another worker has appended in the meantime (the live file is larger than
+last seen), only the new bytes are read: newlines are counted for the line
+total and the ring is refilled with a tail read. ``checkpoint`` stores the
+live counters in the manifest so a restart resumes counting from there
+instead of from the top of the live file.
+"""
+import collections
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from project import log_segments
+
+# recent entries kept per tracked log
+RECENT_MAX = 50
+COUNT_BLOCK = 1024 * 1024
+
+_LOCK = threading.RLock()
+_LIVE: Dict[str, Dict[str, int]] = {}       # path -> {"ino", "bytes", "lines"}
+_RECENT: Dict[str, Dict[str, Any]] = {}     # path -> {"ino", "bytes", "entries": deque}
+
+
+def _count_newlines(path: str, start: int, end: int) -> int:
+    n = 0
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(COUNT_BLOCK, remaining))
+            if not chunk:
+                break
+            n += chunk.count(b"\n")
+            remaining -= len(chunk)
+    return n
+
+
+def _live(path: str, st) -> Dict[str, int]:
+    """Live-log counters brought up to ``st`` (reads only bytes not yet counted)."""
+    c = _LIVE.get(path)
+    if c is None or c["ino"] != st.st_ino or c["bytes"] > st.st_size:
+        saved = log_segments.load_manifest(path).get("live") or {}
+        if saved.get("ino") == st.st_ino and saved.get("bytes", 0) <= st.st_size:
+            c = {"ino": st.st_ino, "bytes": saved["bytes"], "lines": saved.get("lines", 0)}
+        else:
+            c = {"ino": st.st_ino, "bytes": 0, "lines": 0}
+        _LIVE[path] = c
+    if c["bytes"] < st.st_size:
+        c["lines"] += _count_newlines(path, c["bytes"], st.st_size)
+        c["bytes"] = st.st_size
+    return c
+
+
+def record_append(path: str, ino: int, start: int, end: int, lines: int,
+                  records: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Called after a write of ``lines`` lines at [start, end) of the live log (inode ``ino``)."""
+    with _LOCK:
+        c = _LIVE.get(path)
+        if c is not None and c["ino"] == ino and c["bytes"] == start:
+            c["bytes"], c["lines"] = end, c["lines"] + lines
+        r = _RECENT.get(path)
+        if r is not None and records is not None and r["ino"] == ino and r["bytes"] == start:
+            r["entries"].extend(records)
+            r["bytes"] = end
+
+
+def counts(path: str) -> Dict[str, Any]:
+    """{"lines", "bytes", "segments", "live_lines", "live_bytes"} over the retained history."""
+    sealed = log_segments.load_manifest(path).get("segments") or []
+    out = {
+        "lines": sum(s.get("lines", 0) for s in sealed),
+        "bytes": sum(s.get("bytes", 0) for s in sealed),
+        "segments": len(sealed),
+        "live_lines": 0,
+        "live_bytes": 0,
+    }
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return out
+    with _LOCK:
+        c = _live(path, st)
+        out["live_lines"], out["live_bytes"] = c["lines"], c["bytes"]
+    out["lines"] += out["live_lines"]
+    out["bytes"] += out["live_bytes"]
+    return out
+
+
+def recent(path: str, n: int = 10) -> List[Dict[str, Any]]:
+    """The ``n`` (<= RECENT_MAX) newest records, oldest first."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        st = None
+    with _LOCK:
+        r = _RECENT.get(path)
+        stale = r is None or st is None or r["ino"] != st.st_ino or r["bytes"] != st.st_size
+        if stale:
+            entries, _ = log_segments.tail(path, RECENT_MAX)
+            r = {"ino": st.st_ino if st else None, "bytes": st.st_size if st else 0,
+                 "entries": collections.deque(entries, maxlen=RECENT_MAX)}
+            _RECENT[path] = r
+        return list(r["entries"])[-n:]
+
+
+def invalidate(path: str) -> None:
+    """Drop the recent-entry ring of ``path`` after its lines were rewritten in place."""
+    with _LOCK:
+        _RECENT.pop(path, None)
+
+
+def checkpoint(path: str) -> None:
+    """Persist the live counters into the manifest (callers hold the log's write lock)."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return
+    with _LOCK:
+        c = dict(_live(path, st))
+    manifest = dict(log_segments.load_manifest(path))
+    if manifest.get("live") == c:
+        return
+    manifest["live"] = c
+    log_segments.save_manifest(path, manifest)
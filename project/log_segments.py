@@ -0,0 +1,365 @@
+"""
+Segment manifest for the JSONL logs written by append_jsonl_secure.
+
+The live log stays at ``<path>``. When it outgrows LOG_MAX_BYTES it is sealed
+by renaming it to ``<path>.<seq>`` (seq increases forever, so sealed names
+never change), together with its participant index sidecar, and an entry is
+added to ``<path>.manifest.json``::
+
+    {"v": 1, "next_seq": 4, "segments": [
+        {"seq": 3, "file": "audit_log.jsonl.000003", "first_ts": "...",
+         "last_ts": "...", "lines": 1830, "bytes": 524411, "head": "<last _h>"},
+        ...]}
+
+Sealed segments are listed oldest first. ``head`` is the last chain link of
+the segment, so the hash chain continues into the next segment. Readers use
+the manifest to walk the full history (``segment_files``, ``iter_records``)
+and to skip segments outside a time range without opening them.
+
+Backups left by the old ``.1 .. .N`` rotation scheme are adopted (oldest
+first, with negative seqs) the first time a log's manifest is built.
+``ensure_manifest`` persists that first manifest (app.py calls it at startup
+under each log's write lock); until then readers share one adopted manifest
+per process instead of re-scanning the backups on every call.
+
+``tail`` reads the newest records backwards in blocks and pages through
+older history with ``"<seq>:<offset>"`` cursors. The live log is addressed by
+the seq it will be sealed under, so a cursor stays valid across rotation.
+"""
+import datetime
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from project import participant_index
+from project.processors.segment_log import write_atomic
+
+MANIFEST_VERSION = 1
+
+# legacy ".N" backups are looked for up to this suffix when adopting them
+LEGACY_BACKUPS_MAX = 32
+
+# block size for reading logs backwards
+TAIL_BLOCK = 64 * 1024
+
+# path -> ((st_mtime_ns, st_size), manifest) for readers
+_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_CACHE_LOCK = threading.Lock()
+# path -> manifest adopted from legacy backups, while no manifest file exists
+_ADOPTED: Dict[str, Dict[str, Any]] = {}
+
+
+def manifest_path(path: str) -> str:
+    return path + ".manifest.json"
+
+
+def _record_ts(obj: Any) -> Optional[str]:
+    if not isinstance(obj, dict):
+        return None
+    ts = obj.get("ts") or obj.get("timestamp")
+    return ts if isinstance(ts, str) else None
+
+
+def parse_ts(ts: Any) -> Optional[datetime.datetime]:
+    if isinstance(ts, datetime.datetime):
+        dt = ts
+    elif isinstance(ts, str):
+        try:
+            dt = datetime.datetime.fromisoformat(ts)
+        except ValueError:
+            return None
+    else:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt
+
+
+def segment_stats(seg_path: str) -> Dict[str, Any]:
+    """One pass over a segment: first/last ts, line count, byte size and last chain link."""
+    stats = {"first_ts": None, "last_ts": None, "lines": 0, "bytes": 0, "head": None}
+    try:
+        f = open(seg_path, "rb")
+    except FileNotFoundError:
+        return stats
+    with f:
+        for line in f:
+            stats["bytes"] += len(line)
+            if not line.strip():
+                continue
+            stats["lines"] += 1
+            try:
+                obj = json.loads(line)
+            except Exception:
+                continue
+            ts = _record_ts(obj)
+            if ts:
+                stats["first_ts"] = stats["first_ts"] or ts
+                stats["last_ts"] = ts
+            if isinstance(obj, dict) and "_h" in obj:
+                stats["head"] = obj["_h"]
+    return stats
+
+
+def _adopt_legacy(path: str) -> Dict[str, Any]:
+    """Fresh manifest listing any ``<path>.N`` backups from the old rotation scheme."""
+    legacy = [f"{path}.{n}" for n in range(LEGACY_BACKUPS_MAX, 0, -1) if os.path.isfile(f"{path}.{n}")]
+    # negative seqs keep them ordered before the segments this module creates
+    segments = [{"seq": i - len(legacy), "file": os.path.basename(p), **segment_stats(p)}
+                for i, p in enumerate(legacy)]
+    return {"v": MANIFEST_VERSION, "next_seq": 1, "segments": segments}
+
+
+def _adopted(path: str) -> Dict[str, Any]:
+    with _CACHE_LOCK:
+        manifest = _ADOPTED.get(path)
+    if manifest is None:
+        manifest = _adopt_legacy(path)
+        with _CACHE_LOCK:
+            manifest = _ADOPTED.setdefault(path, manifest)
+    return manifest
+
+
+def _read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """The persisted manifest for ``path`` (cached), or None if there is no valid one."""
+    mpath = manifest_path(path)
+    try:
+        st = os.stat(mpath)
+    except FileNotFoundError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _CACHE_LOCK:
+        cached = _CACHE.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    try:
+        with open(mpath, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get("v") != MANIFEST_VERSION:
+        return None
+    with _CACHE_LOCK:
+        _CACHE[path] = (stamp, manifest)
+    return manifest
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """Current manifest for ``path`` (cached; built once from legacy backups if missing)."""
+    manifest = _read_manifest(path)
+    return manifest if manifest is not None else _adopted(path)
+
+
+def save_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    """Persist ``manifest`` atomically (callers hold the log's write lock)."""
+    write_atomic(Path(manifest_path(path)), (json.dumps(manifest, ensure_ascii=False) + "\n").encode("utf-8"))
+    with _CACHE_LOCK:
+        _ADOPTED.pop(path, None)
+
+
+def ensure_manifest(path: str) -> Dict[str, Any]:
+    """Write the adopted manifest if ``path`` has no valid one yet (callers hold the log's write lock)."""
+    manifest = _read_manifest(path)
+    if manifest is None:
+        manifest = _adopted(path)
+        save_manifest(path, manifest)
+    return manifest
+
+
+def last_head(path: str) -> Optional[str]:
+    """Chain link the next line of an empty live log should continue from."""
+    segments = load_manifest(path).get("segments") or []
+    return segments[-1].get("head") if segments else None
+
+
+def seal(path: str, keep: int) -> Optional[Dict[str, Any]]:
+    """
+    Seal the live log as the next segment and start a fresh one, keeping at
+    most ``keep`` sealed segments. Callers hold the log's write lock.
+    Returns the new manifest entry (None if there was nothing to seal).
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        return None
+    manifest = json.loads(json.dumps(load_manifest(path)))  # private copy
+    seq = manifest["next_seq"]
+    seg = f"{path}.{seq:06d}"
+    entry = {"seq": seq, "file": os.path.basename(seg), **segment_stats(path)}
+
+    os.rename(path, seg)
+    # rename keeps the inode, so the sidecar index stays valid for the segment
+    try:
+        os.rename(participant_index.index_path(path), participant_index.index_path(seg))
+    except FileNotFoundError:
+        pass
+
+    manifest["segments"].append(entry)
+    manifest["next_seq"] = seq + 1
+    manifest.pop("live", None)  # live-log counters (log_metrics) restart with the new file
+    dropped = manifest["segments"][:-keep] if keep > 0 else manifest["segments"]
+    manifest["segments"] = manifest["segments"][len(dropped):]
+    save_manifest(path, manifest)
+
+    for old in dropped:
+        old_path = os.path.join(os.path.dirname(path), old["file"])
+        for p in (old_path, participant_index.index_path(old_path), old_path + ".idx.lock"):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+    open(path, "a", encoding="utf-8").close()
+    participant_index.rebuild(path)
+    return entry
+
+
+def segment_files(path: str, include_live: bool = True) -> List[str]:
+    """Paths of the sealed segments (oldest first), then the live log."""
+    base = os.path.dirname(path)
+    files = [os.path.join(base, s["file"]) for s in load_manifest(path).get("segments") or []]
+    if include_live:
+        files.append(path)
+    return files
+
+
+def _overlaps(entry: Dict[str, Any], since, until) -> bool:
+    first, last = parse_ts(entry.get("first_ts")), parse_ts(entry.get("last_ts"))
+    if since is not None and last is not None and last < since:
+        return False
+    if until is not None and first is not None and first > until:
+        return False
+    return True
+
+
+def iter_records(path: str, since=None, until=None) -> Iterator[Dict[str, Any]]:
+    """
+    Records from every segment of ``path``, oldest first. ``since``/``until``
+    (datetime or ISO string, inclusive) skip whole segments by their manifest
+    time range and filter records by their ``ts``/``timestamp``.
+    """
+    since, until = parse_ts(since), parse_ts(until)
+    base = os.path.dirname(path)
+    targets = [(os.path.join(base, s["file"]), s) for s in load_manifest(path).get("segments") or []]
+    targets.append((path, None))
+    for seg, entry in targets:
+        if entry is not None and not _overlaps(entry, since, until):
+            continue
+        try:
+            f = open(seg, "r", encoding="utf-8")
+        except FileNotFoundError:
+            continue  # pruned or sealed while we were reading
+        with f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    obj = json.loads(line)
+                except Exception:
+                    continue
+                if since is not None or until is not None:
+                    ts = parse_ts(_record_ts(obj))
+                    if ts is None or (since is not None and ts < since) or (until is not None and ts > until):
+                        continue
+                yield obj
+
+
+def _reverse_lines(seg: str, end: Optional[int]) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset, line) for complete lines before byte ``end`` (None: file end), newest first."""
+    try:
+        f = open(seg, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        pos = size if end is None else min(end, size)
+        if pos == size and pos:
+            f.seek(pos - 1)
+            if f.read(1) != b"\n":
+                # torn or in-flight last line: start from the previous newline
+                while pos > 0:
+                    start = max(0, pos - TAIL_BLOCK)
+                    f.seek(start)
+                    nl = f.read(pos - start).rfind(b"\n")
+                    if nl >= 0:
+                        pos = start + nl + 1
+                        break
+                    pos = start
+        # bytes [pos, limit) of a line whose start lies in an earlier block
+        pending = b""
+        while pos > 0:
+            start = max(0, pos - TAIL_BLOCK)
+            f.seek(start)
+            parts = (f.read(pos - start) + pending).split(b"\n")[:-1]
+            if start > 0:
+                head, parts = parts[0], parts[1:]
+                off = start + len(head) + 1
+                pending = head + b"\n"
+            else:
+                off = 0
+                pending = b""
+            offsets = []
+            for ln in parts:
+                offsets.append(off)
+                off += len(ln) + 1
+            for ln_off, ln in zip(reversed(offsets), reversed(parts)):
+                if ln.strip():
+                    yield ln_off, ln
+            pos = start
+
+
+def _parse_cursor(cursor: Any, live_seq: int) -> Optional[Tuple[int, int]]:
+    """``"<seq>:<offset>"``, or a bare offset into the live log."""
+    if cursor is None or cursor == "":
+        return None
+    text = str(cursor)
+    try:
+        if ":" in text:
+            seq, off = text.split(":", 1)
+            return int(seq), int(off)
+        return live_seq, int(text)
+    except ValueError:
+        raise ValueError(f"invalid cursor: {cursor!r}")
+
+
+def tail(path: str, n: int, before: Any = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    The ``n`` newest records of ``path`` (across segments) that lie before
+    the ``before`` cursor, oldest first, plus the cursor for the next older
+    page (None once the start of the retained history is reached).
+    """
+    manifest = load_manifest(path)
+    base = os.path.dirname(path)
+    live_seq = manifest.get("next_seq", 1)
+    chain = [(s["seq"], os.path.join(base, s["file"])) for s in manifest.get("segments") or []]
+    chain.append((live_seq, path))
+
+    cursor = _parse_cursor(before, live_seq)
+    if cursor is None:
+        i, end = len(chain) - 1, None
+    else:
+        seqs = [seq for seq, _ in chain]
+        if cursor[0] not in seqs:
+            return [], None  # pruned
+        i, end = seqs.index(cursor[0]), cursor[1]
+
+    out: List[Tuple[int, int, Dict[str, Any]]] = []
+    while i >= 0 and len(out) < n:
+        seq, seg = chain[i]
+        for off, line in _reverse_lines(seg, end):
+            try:
+                obj = json.loads(line)
+            except Exception:
+                continue
+            out.append((seq, off, obj))
+            if len(out) >= n:
+                break
+        if len(out) < n:
+            i, end = i - 1, None
+
+    if not out:
+        return [], None
+    seq, off, _ = out[-1]
+    more = off > 0 or any(s < seq for s, _ in chain)
+    return [obj for _, _, obj in reversed(out)], (f"{seq}:{off}" if more else None)
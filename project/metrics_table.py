@@ -0,0 +1,185 @@
+"""
+Per-session metrics table kept in sync with the session store.
+
+Each stored session is scored once through the shared kernel in
+analyze_events (behavioral rows in batches via the columnar path) and kept in
+columns keyed by session id. Syncing only reads rows appended since the last
+sync, so dashboards and exports slice columns instead of re-parsing and
+re-scoring the whole store. A new store generation (erase) resets the table.
+"""
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from project.analyze_events import (
+    compute_behavioral_metrics,
+    compute_behavioral_metrics_batch,
+    get_store,
+    session_metrics,
+)
+from project.processors.segment_log import Position
+
+KEY_COLUMNS = ("session_key", "kind", "participant_id", "task_id", "server_ts")
+BEHAVIORAL_COLUMNS = (
+    "total_time_ms", "hints_used", "retries", "keypress_count", "hesitation_ms", "performance_score",
+)
+COGNITIVE_COLUMNS = (
+    "modules", "questions", "avg_accuracy", "avg_time_seconds", "avg_hesitation_seconds", "avg_retries",
+)
+COLUMNS = KEY_COLUMNS + BEHAVIORAL_COLUMNS + COGNITIVE_COLUMNS
+
+# rows scored per batch while catching up with the store
+SYNC_BATCH = 2048
+
+
+def _empty_series() -> Dict[str, Dict[str, List[Any]]]:
+    return {
+        "cognitive": {
+            "index": [],
+            "accuracy_pct": [],
+            "avg_time_s": [],
+            "avg_hesitation_s": [],
+            "avg_retries": [],
+        },
+        "behavioral": {
+            "index": [],
+            "performance_score": [],
+            "total_time_s": [],
+            "hints": [],
+            "retries": [],
+            "hesitation_s": [],
+        },
+    }
+
+
+class MetricsTable:
+    """Columnar per-session metrics plus chart-ready dashboard series."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset(0)
+
+    def _reset(self, generation: int) -> None:
+        self.generation = generation
+        self.cursor: Optional[Position] = None
+        self.columns: Dict[str, List[Any]] = {c: [] for c in COLUMNS}
+        self.series = _empty_series()
+        self.keys: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.columns["session_key"])
+
+    # ---------- sync ----------
+
+    def sync(self) -> "MetricsTable":
+        """Score rows appended to the store since the last sync."""
+        store = get_store()
+        with self._lock:
+            if store.generation != self.generation:
+                self._reset(store.generation)
+            pending: List[Tuple[str, Dict[str, Any]]] = []
+            last = self.cursor
+            try:
+                for line, pos in store.iter_raw_from(self.cursor):
+                    last = pos
+                    try:
+                        row = json.loads(line)
+                    except Exception:
+                        continue
+                    pending.append(("%d:%d:%d" % pos, row))
+                    if len(pending) >= SYNC_BATCH:
+                        self._add_rows(pending)
+                        self.cursor, pending = last, []
+            except ValueError:
+                # store rewritten mid-sync; rebuild on the next call
+                self._reset(-1)
+                return self
+            self._add_rows(pending)
+            # only past rows that are in the table
+            self.cursor = last
+        return self
+
+    def _add_rows(self, rows: List[Tuple[str, Dict[str, Any]]]) -> None:
+        if not rows:
+            return
+        behavioral = [r for _, r in rows if isinstance(r, dict) and "events" in r]
+        try:
+            batch = iter(compute_behavioral_metrics_batch(behavioral))
+        except Exception:
+            batch = None  # a bad row in the batch: score behavioral rows one by one
+        for position, row in rows:
+            try:
+                if isinstance(row, dict) and "events" in row:
+                    kind = "behavioral"
+                    m = next(batch) if batch is not None else compute_behavioral_metrics(row)
+                else:
+                    kind, m = session_metrics(row)
+            except Exception:
+                # a malformed row is kept as unscored instead of failing the sync
+                kind, m = "unknown", {}
+            self._append(position, row if isinstance(row, dict) else {}, kind, m)
+
+    def _append(self, position: str, row: Dict[str, Any], kind: str, m: Dict[str, Any]) -> None:
+        cols = self.columns
+        key = str(row.get("session_id") or position)
+        self.keys[key] = len(cols["session_key"])
+        cols["session_key"].append(key)
+        cols["kind"].append(kind)
+        cols["participant_id"].append(row.get("participant_id"))
+        cols["task_id"].append(row.get("task_id"))
+        cols["server_ts"].append(row.get("server_ts"))
+        for c in BEHAVIORAL_COLUMNS:
+            cols[c].append(m.get(c) if kind == "behavioral" else None)
+        for c in COGNITIVE_COLUMNS:
+            cols[c].append(m.get(c) if kind == "cognitive" else None)
+
+        if kind == "behavioral":
+            s = self.series["behavioral"]
+            total_ms = m["total_time_ms"]
+            s["index"].append(len(s["index"]) + 1)
+            s["performance_score"].append(m["performance_score"])
+            s["total_time_s"].append(round(total_ms / 1000.0, 3) if total_ms else None)
+            s["hints"].append(m["hints_used"])
+            s["retries"].append(m["retries"])
+            s["hesitation_s"].append(round(m["hesitation_ms"] / 1000.0, 3))
+        elif kind == "cognitive" and m.get("questions"):
+            s = self.series["cognitive"]
+            s["index"].append(len(s["index"]) + 1)
+            s["accuracy_pct"].append(m["avg_accuracy"])
+            s["avg_time_s"].append(m["avg_time_seconds"])
+            s["avg_hesitation_s"].append(m["avg_hesitation_seconds"])
+            s["avg_retries"].append(m["avg_retries"])
+
+    # ---------- reads ----------
+
+    def get(self, session_key: str) -> Optional[Dict[str, Any]]:
+        """Return one session's row by session id (or store position for legacy rows)."""
+        with self._lock:
+            i = self.keys.get(session_key)
+            if i is None:
+                return None
+            return {c: self.columns[c][i] for c in COLUMNS}
+
+    def dashboard(self) -> Dict[str, Dict[str, List[Any]]]:
+        """Chart series for /export/dashboard (copies, safe to serialize outside the lock)."""
+        with self._lock:
+            return {kind: {name: list(values) for name, values in series.items()}
+                    for kind, series in self.series.items()}
+
+    def snapshot_columns(self, names=COLUMNS, start: int = 0) -> Tuple[int, Dict[str, List[Any]]]:
+        """Return (generation, columns sliced from row ``start``) taken under one lock."""
+        with self._lock:
+            return self.generation, {c: self.columns[c][start:] for c in names}
+
+
+_TABLE: Optional[MetricsTable] = None
+_TABLE_LOCK = threading.Lock()
+
+
+def get_metrics_table() -> MetricsTable:
+    """Process-wide table, synced with the store on every call."""
+    global _TABLE
+    with _TABLE_LOCK:
+        if _TABLE is None:
+            _TABLE = MetricsTable()
+    return _TABLE.sync()
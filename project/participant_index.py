@@ -0,0 +1,264 @@
+"""
+Sidecar participant index for the JSONL logs written by append_jsonl_secure.
+
+For a log ``<path>`` the index lives in ``<path>.idx``::
+
+    {"v": 1, "ino": <inode of the log it describes>}
+    {"k": "<participant id>", "o": <byte offset>, "n": <line length>}
+    {"o": <byte offset>, "n": <line length>}      (line without identifiers)
+    ...
+
+append_jsonl_secure adds entries as it writes, so a per-participant lookup
+reads the (small) index once per process, then ``pread``s only that
+participant's lines. The index is rebuilt from the log when it is missing or
+describes another inode (rotation, erase rewrites), and any log tail written
+without an index entry is indexed on the next lookup.
+
+Only identifier-carrying fields are indexed: top-level ``participant_id``,
+``actor`` and ``subject`` (whole value and the part after the last ``:``),
+plus ``extra.participant_id`` / ``extra.target_id``.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from project.processors.segment_log import exclusive_lock
+
+INDEX_VERSION = 1
+
+# path -> {"ino", "idx_pos", "covered", "map"}
+_CACHE: Dict[str, Dict[str, Any]] = {}
+_LOCK = threading.RLock()
+
+
+def index_path(path: str) -> str:
+    return path + ".idx"
+
+
+def _lock_path(path: str) -> str:
+    return path + ".idx.lock"
+
+
+def participant_keys(obj: Any) -> Set[str]:
+    """Identifiers a record can be looked up by."""
+    keys: Set[str] = set()
+    if not isinstance(obj, dict):
+        return keys
+
+    def add(val):
+        if isinstance(val, str) and val:
+            keys.add(val)
+            if ":" in val:
+                tail = val.rsplit(":", 1)[1]
+                if tail:
+                    keys.add(tail)
+
+    pid = obj.get("participant_id")
+    if isinstance(pid, str) and pid:
+        keys.add(pid)
+    add(obj.get("actor"))
+    add(obj.get("subject"))
+    extra = obj.get("extra")
+    if isinstance(extra, dict):
+        for field in ("participant_id", "target_id"):
+            val = extra.get(field)
+            if isinstance(val, str) and val:
+                keys.add(val)
+    return keys
+
+
+def _entry_lines(keys: Iterable[str], offset: int, length: int) -> bytes:
+    keys = sorted(keys)
+    if not keys:
+        # still recorded so the index knows how far into the log it reaches
+        return (json.dumps({"o": offset, "n": length}) + "\n").encode("utf-8")
+    return b"".join(
+        (json.dumps({"k": k, "o": offset, "n": length}, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        for k in keys
+    )
+
+
+def _header(ino: int) -> bytes:
+    return (json.dumps({"v": INDEX_VERSION, "ino": ino}) + "\n").encode("utf-8")
+
+
+def _log_ino(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def record_append(path: str, offset: int, length: int, obj: Any) -> None:
+    """Index one line just appended at ``offset`` (called by append_jsonl_secure)."""
+    keys = participant_keys(obj)
+    try:
+        with exclusive_lock(_lock_path(path)):
+            idx = index_path(path)
+            ino = _log_ino(path)
+            if ino is None:
+                return
+            entry = _entry_lines(keys, offset, length)
+            if _read_header_ino(idx) != ino:
+                if offset:
+                    # stale/missing sidecar: the next lookup rebuilds it from the log
+                    return
+                entry = _header(ino) + entry  # first line of a fresh log
+                mode = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+            else:
+                mode = os.O_WRONLY | os.O_APPEND
+            fd = os.open(idx, mode, 0o644)
+            try:
+                os.write(fd, entry)
+            finally:
+                os.close(fd)
+    except OSError:
+        # the index is an accelerator; lookups heal it from the log
+        pass
+
+
+def _read_header_ino(idx: str) -> Optional[int]:
+    try:
+        with open(idx, "rb") as f:
+            header = json.loads(f.readline() or b"{}")
+    except (FileNotFoundError, ValueError):
+        return None
+    if header.get("v") != INDEX_VERSION:
+        return None
+    return header.get("ino")
+
+
+def _scan_lines(path: str, start: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset, raw line) for complete lines from byte ``start``."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            yield offset, line
+            offset += len(line)
+
+
+def _index_lines(path: str, start: int) -> bytes:
+    chunks = []
+    for offset, line in _scan_lines(path, start):
+        try:
+            obj = json.loads(line)
+        except Exception:
+            obj = None  # still recorded as covered so it is not rescanned
+        chunks.append(_entry_lines(participant_keys(obj), offset, len(line)))
+    return b"".join(chunks)
+
+
+def rebuild(path: str) -> None:
+    """Rewrite ``<path>.idx`` from a full scan of the log (also used after rotation)."""
+    with exclusive_lock(_lock_path(path)):
+        ino = _log_ino(path)
+        if ino is None:
+            return
+        idx = index_path(path)
+        tmp = idx + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_header(ino))
+            f.write(_index_lines(path, 0))
+        os.replace(tmp, idx)
+    with _LOCK:
+        _CACHE.pop(path, None)
+
+
+def _read_delta(cache: Dict[str, Any], idx: str) -> None:
+    """Merge index entries appended since our last look (by this or other workers)."""
+    with open(idx, "rb") as f:
+        if cache["idx_pos"] == 0:
+            f.readline()  # header
+        else:
+            f.seek(cache["idx_pos"])
+        pos = f.tell()
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            pos += len(line)
+            try:
+                e = json.loads(line)
+            except Exception:
+                continue
+            end = e.get("o", 0) + e.get("n", 0)
+            if end > cache["covered"]:
+                cache["covered"] = end
+            if "k" in e:
+                cache["map"].setdefault(e["k"], []).append((e["o"], e["n"]))
+        cache["idx_pos"] = pos
+
+
+def _refresh(path: str) -> Optional[Dict[str, Any]]:
+    """Bring the in-process map for ``path`` up to date; returns None if the log is missing."""
+    ino = _log_ino(path)
+    if ino is None:
+        return None
+    idx = index_path(path)
+    if _read_header_ino(idx) != ino:
+        rebuild(path)
+
+    cache = _CACHE.get(path)
+    if cache is None or cache["ino"] != ino:
+        cache = {"ino": ino, "idx_pos": 0, "covered": 0, "map": {}}
+        _CACHE[path] = cache
+    _read_delta(cache, idx)
+    size = os.path.getsize(path)
+    if size < cache["covered"]:
+        # log shrank under the same inode (truncate / inode reuse): start over
+        rebuild(path)
+        cache = {"ino": ino, "idx_pos": 0, "covered": 0, "map": {}}
+        _CACHE[path] = cache
+        _read_delta(cache, idx)
+
+    # index any tail written without index entries (crash, older code paths)
+    if size > cache["covered"]:
+        with exclusive_lock(_lock_path(path)):
+            if _read_header_ino(idx) == ino:
+                _read_delta(cache, idx)
+                tail = _index_lines(path, cache["covered"])
+                if tail:
+                    fd = os.open(idx, os.O_WRONLY | os.O_APPEND)
+                    try:
+                        os.write(fd, tail)
+                    finally:
+                        os.close(fd)
+                    _read_delta(cache, idx)
+    return cache
+
+
+def spans(path: str, participant_id: str) -> List[Tuple[int, int]]:
+    """Sorted (offset, length) of the lines indexed under ``participant_id``."""
+    with _LOCK:
+        cache = _refresh(path)
+        if cache is None:
+            return []
+        return sorted(set(cache["map"].get(participant_id, ())))
+
+
+def iter_lookup(path: str, participant_id: str) -> Iterator[Dict[str, Any]]:
+    """Yield decoded log records indexed under ``participant_id``, in file order."""
+    found = spans(path, participant_id)
+    if not found:
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        for offset, length in found:
+            raw = os.pread(fd, length, offset)
+            try:
+                yield json.loads(raw)
+            except Exception:
+                continue
+    finally:
+        os.close(fd)
+
+
+def lookup(path: str, participant_id: str) -> List[Dict[str, Any]]:
+    """Return decoded log records indexed under ``participant_id``, in file order."""
+    return list(iter_lookup(path, participant_id))
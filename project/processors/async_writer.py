@@ -0,0 +1,115 @@
+"""
+Event persistence for the async sandbox endpoints.
+
+Handlers put events on a bounded asyncio queue and await a future; one writer
+task drains whatever is queued (group commit, up to ``max_batch`` events) and
+hands it to ``log_events`` on a dedicated single-thread executor, so the
+event loop never blocks on validation or file I/O and writes stay serialized.
+A full queue raises ``QueueFull`` straight away so the endpoint can answer 429
+instead of queueing without bound.
+
+``start`` is normally called from the app's lifespan hook. If it was not (a
+plain TestClient, a mounted sub-app), the first ``submit`` starts the writer
+on the running loop, and so does a submit from a different loop than the
+one the writer was started on.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .event_logger import get_event_log, log_events, EVENT_LOG_BACKEND
+
+QueueFull = asyncio.QueueFull
+
+_Item = Tuple[List[Dict[str, Any]], asyncio.Future]
+
+
+class AsyncEventWriter:
+    def __init__(self,
+                 write_batch: Callable[[List[Dict[str, Any]]], List[List[str]]] = log_events,
+                 max_queue: int = 1000,
+                 max_batch: int = 2000):
+        self.write_batch = write_batch
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ---------- lifecycle (FastAPI startup / shutdown) ----------
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        if self._executor is None:
+            # kept across restarts so writes stay on one thread
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-writer")
+        self._task = asyncio.create_task(self._run(), name="event-writer")
+
+    async def stop(self) -> None:
+        """Write everything already queued, then stop the writer."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        loop = asyncio.get_running_loop()
+        if EVENT_LOG_BACKEND == "ndjson":
+            await loop.run_in_executor(self._executor, get_event_log().flush)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # ---------- producer side ----------
+
+    async def submit(self, events: List[Dict[str, Any]]) -> List[List[str]]:
+        """
+        Queue ``events`` and wait until they are written. Returns per-event
+        error messages (empty list = stored); raises QueueFull under backpressure.
+        """
+        loop = asyncio.get_running_loop()
+        if not self.running or self._loop is not loop:
+            await self.start()
+        fut = loop.create_future()
+        self._queue.put_nowait((events, fut))
+        return await fut
+
+    # ---------- writer task ----------
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        q = self._queue
+        while True:
+            batch: List[_Item] = [await q.get()]
+            size = len(batch[0][0])
+            while size < self.max_batch and not q.empty():
+                item = q.get_nowait()
+                batch.append(item)
+                size += len(item[0])
+            events = [e for evs, _ in batch for e in evs]
+            try:
+                errors = await loop.run_in_executor(self._executor, self.write_batch, events)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                pos = 0
+                for evs, fut in batch:
+                    if not fut.done():
+                        fut.set_result(errors[pos:pos + len(evs)])
+                    pos += len(evs)
+            finally:
+                for _ in batch:
+                    q.task_done()
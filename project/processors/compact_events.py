@@ -0,0 +1,48 @@
+"""
+Compact the NDJSON event log into the JSON array format.
+
+    cd project
+    python -m processors.compact_events                    # -> test_data/session_data.json
+    python -m processors.compact_events --output out.json
+
+The array is written to a temporary file and moved into place, so readers
+never see a half-written file. The segment log itself is left untouched.
+"""
+import argparse
+import os
+import sys
+
+from . import event_logger
+
+
+def compact(output: str) -> int:
+    """Write every logged event to ``output`` as a JSON array; returns the count."""
+    store = event_logger.get_event_log()
+    store.flush()
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    tmp = f"{output}.tmp.{os.getpid()}"
+    n = 0
+    with open(tmp, "wb") as f:
+        f.write(b"[")
+        for line in store.iter_raw():
+            f.write(b"\n" if n == 0 else b",\n")
+            f.write(line)
+            n += 1
+        f.write(b"\n]\n" if n else b"]\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, output)
+    return n
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compact the NDJSON event log into a JSON array file.")
+    parser.add_argument("--output", default=event_logger.LOG_FILE, help="default: %(default)s")
+    args = parser.parse_args(argv)
+    n = compact(args.output)
+    print(f"Compacted {n} events into {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,42 @@
 import json
 import datetime
+import logging
 import os
-from jsonschema import validate, ValidationError
+from typing import Any, Dict, Iterator, Optional
+from jsonschema import ValidationError
+
+from .schema_validator import get_validator
+from .segment_log import SegmentLog
+
+logger = logging.getLogger(__name__)
 
 # SCHEMA_PATH points up one level to the schemas folder
 SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "schemas", "behavioral_schema.json")
 LOG_FILE = os.path.join(os.path.dirname(__file__), "..", "test_data", "session_data.json")
 
-# load schema once
-with open(os.path.abspath(SCHEMA_PATH), "r") as f:
-    SCHEMA = json.load(f)
+# "ndjson": append-only segment log under EVENT_LOG_DIR (default)
+# "json":   the original single JSON array in LOG_FILE, rewritten on every event
+EVENT_LOG_BACKEND = os.environ.get("EVENT_LOG_BACKEND", "ndjson").strip().lower()
+EVENT_LOG_DIR = os.environ.get(
+    "EVENT_LOG_DIR", os.path.join(os.path.dirname(__file__), "..", "test_data", "event_log")
+)
+EVENT_SEGMENT_MAX_BYTES = int(os.environ.get("EVENT_SEGMENT_MAX_BYTES", 8 * 1024 * 1024))
+EVENT_FSYNC_EVERY = int(os.environ.get("EVENT_FSYNC_EVERY", 32))
+EVENT_FSYNC_INTERVAL_MS = int(os.environ.get("EVENT_FSYNC_INTERVAL_MS", 200))
+
+BACKENDS = ("ndjson", "json")
+if EVENT_LOG_BACKEND not in BACKENDS:
+    raise ValueError(f"EVENT_LOG_BACKEND must be one of {BACKENDS}, got {EVENT_LOG_BACKEND!r}")
+
+# compiled once; recompiled when the schema file changes
+VALIDATOR = get_validator(SCHEMA_PATH)
+SCHEMA = VALIDATOR.schema
+
+logger.debug("Loaded schema path: %s", os.path.abspath(SCHEMA_PATH))
+logger.debug("Schema 'required' keys: %s", SCHEMA.get("required"))
+
+_EVENT_LOG: Optional[SegmentLog] = None
 
-print("DEBUG: Loaded schema path:", os.path.abspath(SCHEMA_PATH))
-print("DEBUG: Schema 'required' keys:", SCHEMA.get("required"))
 
 def _ensure_logfile():
     d = os.path.dirname(LOG_FILE)
@@ -22,15 +46,40 @@ def _ensure_logfile():
         with open(LOG_FILE, "w") as f:
             json.dump([], f)
 
-def log_event(event: dict):
-    # ensure timestamp present (ISO + Z)
-    if "timestamp" not in event or (event.get("timestamp") is None):
-        event["timestamp"] = datetime.datetime.utcnow().isoformat() + "Z"
+
+def _read_array_log():
     try:
-        validate(instance=event, schema=SCHEMA)
-    except ValidationError as e:
-        print("Validation error:", e.message)
-        raise
+        with open(LOG_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    return data if isinstance(data, list) else []
+
+
+def get_event_log() -> SegmentLog:
+    """Open the NDJSON event log, importing events from the JSON array log once."""
+    global _EVENT_LOG
+    if _EVENT_LOG is None:
+        store = SegmentLog(
+            EVENT_LOG_DIR,
+            segment_max_bytes=EVENT_SEGMENT_MAX_BYTES,
+            fsync_every=EVENT_FSYNC_EVERY,
+            fsync_interval_ms=EVENT_FSYNC_INTERVAL_MS,
+        )
+        # the store's meta.json marks the import as done; LOG_FILE is left as is
+        store.bootstrap(_read_array_log)
+        _EVENT_LOG = store
+    return _EVENT_LOG
+
+
+def iter_events() -> Iterator[Dict[str, Any]]:
+    """Stream logged events in append order from the configured backend."""
+    if EVENT_LOG_BACKEND == "ndjson":
+        return get_event_log().iter_rows()
+    return iter(_read_array_log())
+
+
+def _append_array(*events: dict):
     _ensure_logfile()
     # append safely
     with open(LOG_FILE, "r+", encoding="utf-8") as f:
@@ -38,8 +87,52 @@ def log_event(event: dict):
             data = json.load(f)
         except json.JSONDecodeError:
             data = []
-        data.append(event)
+        data.extend(events)
         f.seek(0)
         json.dump(data, f, indent=2)
         f.truncate()
-    print(f"Event logged: task_id={event.get('task_id')} participant={event.get('participant_id')}")
+
+
+def validate_events(events):
+    """Per-event schema error messages, aligned with ``events`` (empty list = valid)."""
+    return VALIDATOR.validate_batch(events)
+
+
+def _stamp(event: dict):
+    # ensure timestamp present (ISO + Z)
+    if "timestamp" not in event or (event.get("timestamp") is None):
+        event["timestamp"] = datetime.datetime.utcnow().isoformat() + "Z"
+
+
+def log_events(events):
+    """
+    Validate a batch and persist the valid events with a single write.
+    Returns per-event error messages aligned with ``events`` (empty list = stored).
+    """
+    events = list(events)
+    for event in events:
+        if isinstance(event, dict):
+            _stamp(event)
+    errors = validate_events(events)
+    valid = [e for e, errs in zip(events, errors) if not errs]
+    if valid:
+        if EVENT_LOG_BACKEND == "ndjson":
+            get_event_log().append_many(valid)
+        else:
+            _append_array(*valid)
+    logger.debug("Events logged: %d stored, %d rejected", len(valid), len(events) - len(valid))
+    return errors
+
+
+def log_event(event: dict):
+    _stamp(event)
+    try:
+        VALIDATOR.validate(event)
+    except ValidationError as e:
+        logger.debug("Validation error: %s", e.message)
+        raise
+    if EVENT_LOG_BACKEND == "ndjson":
+        get_event_log().append(event)
+    else:
+        _append_array(event)
+    logger.debug("Event logged: task_id=%s participant=%s", event.get("task_id"), event.get("participant_id"))
@@ -0,0 +1,124 @@
+"""
+Compiled, cached JSON Schema validator for event ingestion.
+
+The schema file is read and compiled once: into a fastjsonschema function
+when that package is installed, otherwise into a cached jsonschema validator
+(Draft 7 unless the schema names another draft). The file's mtime/size is
+re-checked at most every ``check_interval`` seconds and the validator is
+recompiled when it changes; a schema edit that fails to load or compile is
+reported and the previous validator stays in use.
+
+jsonschema stays the reference: fastjsonschema only fast-paths valid events,
+and anything it rejects is re-checked with jsonschema, so the accepted set and
+the ValidationError raised are the same with or without it.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from jsonschema import Draft7Validator, ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+
+def format_error(err: ValidationError) -> str:
+    """``path.to.field: message`` (or just the message for top-level errors)."""
+    path = ".".join(str(p) for p in err.absolute_path)
+    return f"{path}: {err.message}" if path else err.message
+
+
+class SchemaValidator:
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = os.path.abspath(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self.schema: Dict[str, Any] = {}
+        self._validator = None
+        self._fast: Optional[Callable[[Any], Any]] = None
+        self._load(self._stat())
+
+    # ---------- loading ----------
+
+    def _stat(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self, stamp: Tuple[int, int]) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            schema = json.load(f)
+        cls = validator_for(schema, default=Draft7Validator)
+        cls.check_schema(schema)
+        validator = cls(schema)
+        fast = fastjsonschema.compile(schema) if fastjsonschema is not None else None
+        # swap everything at once so concurrent callers never mix versions
+        self.schema, self._validator, self._fast, self._stamp = schema, validator, fast, stamp
+        self._checked_at = time.monotonic()
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                stamp = self._stat()
+                if stamp != self._stamp:
+                    self._load(stamp)
+            except Exception as e:
+                print(f"[WARN] schema reload failed for {self.path}: {e}")
+
+    # ---------- validation ----------
+
+    def _is_valid_fast(self, instance: Any) -> bool:
+        fast = self._fast
+        if fast is None:
+            return False
+        try:
+            fast(instance)
+            return True
+        except Exception:
+            return False
+
+    def iter_errors(self, instance: Any) -> List[ValidationError]:
+        self._maybe_reload()
+        if self._is_valid_fast(instance):
+            return []
+        return sorted(self._validator.iter_errors(instance), key=lambda e: list(e.absolute_path))
+
+    def validate(self, instance: Any) -> None:
+        """Raise jsonschema.ValidationError (the most relevant one) if ``instance`` is invalid."""
+        errors = self.iter_errors(instance)
+        if errors:
+            raise best_match(errors)
+
+    def is_valid(self, instance: Any) -> bool:
+        return not self.iter_errors(instance)
+
+    def validate_batch(self, instances: Iterable[Any]) -> List[List[str]]:
+        """Per-item error messages, aligned with ``instances`` (an empty list means valid)."""
+        return [[format_error(e) for e in self.iter_errors(inst)] for inst in instances]
+
+
+_VALIDATORS: Dict[str, SchemaValidator] = {}
+_VALIDATORS_LOCK = threading.Lock()
+
+
+def get_validator(path: str) -> SchemaValidator:
+    """Process-wide validator for the schema at ``path``."""
+    key = os.path.abspath(path)
+    with _VALIDATORS_LOCK:
+        v = _VALIDATORS.get(key)
+        if v is None:
+            v = _VALIDATORS[key] = SchemaValidator(key)
+        return v
@@ -0,0 +1,446 @@
+"""
+Append-only NDJSON segment log.
+
+On-disk layout under ``root``::
+
+    meta.json                 {"version": 1, "generation": N}
+    store.lock                cross-process lock for appends / rewrites
+    g000001/000001.ndjson     sealed segment
+    g000001/000001.commit     {"lines": .., "bytes": ..} written atomically on seal
+    g000001/000002.ndjson     active segment (no commit marker yet)
+
+Appends are a single O_APPEND write of complete lines, so their cost does not
+depend on how much is already stored. fsync is batched (every ``fsync_every``
+appends or ``fsync_interval_ms``, whichever comes first) and a segment is
+sealed with an atomic commit marker once it grows past ``segment_max_bytes``.
+Readers only trust sealed segments up to their committed length and skip a
+torn trailing line in the active segment.
+
+Rewrites (erasure) build a new generation directory and switch ``meta.json``
+atomically, so readers never observe a half-written store.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import atexit
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX dev machines
+    fcntl = None
+
+STORE_VERSION = 1
+
+# (generation, segment index, byte offset) - orderable within one generation
+Position = Tuple[int, int, int]
+
+
+def _dumps(row: Dict[str, Any]) -> bytes:
+    return (json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def write_atomic(path: Path, data: bytes, fsync: bool = True) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def exclusive_lock(path: Path):
+    """Hold an exclusive cross-process flock on ``path`` for the duration of the block."""
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # closing the descriptor releases the flock
+
+
+class SegmentLog:
+    """Append-only, segmented NDJSON log safe for several writer processes."""
+
+    def __init__(self,
+                 root: Path,
+                 segment_max_bytes: int = 8 * 1024 * 1024,
+                 fsync_every: int = 32,
+                 fsync_interval_ms: int = 200):
+        self.root = Path(root)
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval_ms = fsync_interval_ms
+
+        self._tlock = threading.RLock()
+        self._pid = None
+        self._lock_fd: Optional[int] = None
+        self._meta_stat = None
+        self._generation = 0
+        self._active_idx: Optional[int] = None
+        self._active_fd: Optional[int] = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        atexit.register(self.flush)
+
+    # ---------- locking / meta ----------
+
+    def _reset_after_fork(self) -> None:
+        # descriptors (and flock ownership) must not be shared with a parent process
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock_fd = None
+        self._active_fd = None
+        self._active_idx = None
+        self._meta_stat = None
+        self._unsynced = 0
+
+    @contextmanager
+    def _locked(self):
+        with self._tlock:
+            self._reset_after_fork()
+            if fcntl is None:
+                yield
+                return
+            if self._lock_fd is None:
+                self._lock_fd = os.open(str(self.root / "store.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _meta_path(self) -> Path:
+        return self.root / "meta.json"
+
+    def _refresh_meta(self) -> None:
+        """Reload meta.json only when it changed on disk (another process rewrote)."""
+        try:
+            st = os.stat(self._meta_path())
+        except FileNotFoundError:
+            self._meta_stat = None
+            self._generation = 0
+            return
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if key == self._meta_stat:
+            return
+        try:
+            meta = json.loads(self._meta_path().read_text(encoding="utf-8"))
+            generation = int(meta.get("generation", 0))
+        except Exception:
+            generation = 0
+        if generation != self._generation:
+            self._close_active()
+        self._generation = generation
+        self._meta_stat = key
+
+    def _write_meta(self, generation: int) -> None:
+        payload = {"version": STORE_VERSION, "generation": generation}
+        write_atomic(self._meta_path(), json.dumps(payload).encode("utf-8"))
+        _fsync_dir(self.root)
+        self._meta_stat = None
+        self._refresh_meta()
+
+    @property
+    def generation(self) -> int:
+        """Changes whenever the store is rewritten; consumers use it to invalidate cursors."""
+        with self._tlock:
+            self._refresh_meta()
+            return self._generation
+
+    # ---------- segment helpers ----------
+
+    def _gen_dir(self, generation: Optional[int] = None) -> Path:
+        return self.root / f"g{(self._generation if generation is None else generation):06d}"
+
+    @staticmethod
+    def _seg_name(idx: int) -> str:
+        return f"{idx:06d}"
+
+    def _seg_path(self, idx: int, generation: Optional[int] = None) -> Path:
+        return self._gen_dir(generation) / (self._seg_name(idx) + ".ndjson")
+
+    def _commit_path(self, idx: int, generation: Optional[int] = None) -> Path:
+        return self._gen_dir(generation) / (self._seg_name(idx) + ".commit")
+
+    def _segment_indexes(self, generation: Optional[int] = None) -> List[int]:
+        try:
+            names = os.listdir(self._gen_dir(generation))
+        except FileNotFoundError:
+            return []
+        out = []
+        for name in names:
+            if name.endswith(".ndjson"):
+                try:
+                    out.append(int(name[:-len(".ndjson")]))
+                except ValueError:
+                    continue
+        return sorted(out)
+
+    def _read_commit(self, idx: int, generation: Optional[int] = None) -> Optional[Dict[str, int]]:
+        try:
+            with open(self._commit_path(idx, generation), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _close_active(self) -> None:
+        if self._active_fd is not None:
+            try:
+                if self._unsynced:
+                    os.fsync(self._active_fd)
+            except OSError:
+                pass
+            os.close(self._active_fd)
+        self._active_fd = None
+        self._active_idx = None
+        self._unsynced = 0
+
+    def _ensure_active(self) -> int:
+        """Return an fd for the active segment, moving on if another writer sealed ours."""
+        if self._generation == 0:
+            self._write_meta(1)
+        if self._active_fd is not None and not self._commit_path(self._active_idx).exists():
+            return self._active_fd
+        self._close_active()
+        self._gen_dir().mkdir(parents=True, exist_ok=True)
+        indexes = self._segment_indexes()
+        idx = indexes[-1] if indexes else 1
+        if self._commit_path(idx).exists():
+            idx += 1
+        self._active_idx = idx
+        self._active_fd = os.open(str(self._seg_path(idx)), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._active_fd
+
+    def _seal_active(self) -> None:
+        fd, idx = self._active_fd, self._active_idx
+        os.fsync(fd)
+        size = os.fstat(fd).st_size
+        lines = self._count_lines(self._seg_path(idx))
+        write_atomic(self._commit_path(idx), json.dumps({"lines": lines, "bytes": size}).encode("utf-8"))
+        _fsync_dir(self._gen_dir())
+        self._unsynced = 0
+        self._close_active()
+
+    def _maybe_sync(self, fd: int) -> None:
+        now = time.monotonic()
+        if self._unsynced >= self.fsync_every or (now - self._last_sync) * 1000 >= self.fsync_interval_ms:
+            os.fsync(fd)
+            self._unsynced = 0
+            self._last_sync = now
+
+    # ---------- writes ----------
+
+    def append(self, row: Dict[str, Any]) -> Tuple[Position, Position]:
+        return self.append_many([row])
+
+    def append_many(self, rows: Iterable[Dict[str, Any]]) -> Tuple[Position, Position]:
+        """
+        Append rows with one write. Returns the (start, end) positions of the
+        written lines so callers can tell whether they have seen everything before them.
+        """
+        data = b"".join(_dumps(r) for r in rows)
+        with self._locked():
+            self._refresh_meta()
+            fd = self._ensure_active()
+            offset = os.fstat(fd).st_size
+            start = (self._generation, self._active_idx, offset)
+            if not data:
+                return start, start
+            os.write(fd, data)
+            end = (self._generation, self._active_idx, offset + len(data))
+            self._unsynced += data.count(b"\n")
+            if end[2] >= self.segment_max_bytes:
+                self._seal_active()
+            else:
+                self._maybe_sync(fd)
+        return start, end
+
+    def flush(self) -> None:
+        """fsync anything appended since the last batch sync."""
+        with self._tlock:
+            if self._pid != os.getpid():
+                return
+            if self._active_fd is not None and self._unsynced:
+                try:
+                    os.fsync(self._active_fd)
+                except OSError:
+                    pass
+                self._unsynced = 0
+                self._last_sync = time.monotonic()
+
+    def rewrite(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Replace the whole store with ``rows`` as a new generation; returns rows kept."""
+        with self._locked():
+            return self._rewrite_locked(rows)
+
+    def _rewrite_locked(self, rows: Iterable[Dict[str, Any]]) -> int:
+        self._refresh_meta()
+        old_gen = self._generation
+        new_gen = old_gen + 1
+        self._close_active()
+        gen_dir = self._gen_dir(new_gen)
+        if gen_dir.exists():
+            shutil.rmtree(gen_dir)
+        gen_dir.mkdir(parents=True)
+
+        written = 0
+        idx, lines = 1, 0
+        out = open(self._seg_path(idx, new_gen), "wb")
+        try:
+            for row in rows:
+                out.write(_dumps(row))
+                written += 1
+                lines += 1
+                if out.tell() >= self.segment_max_bytes:
+                    out.flush()
+                    os.fsync(out.fileno())
+                    commit = {"lines": lines, "bytes": out.tell()}
+                    write_atomic(self._commit_path(idx, new_gen), json.dumps(commit).encode("utf-8"))
+                    out.close()
+                    idx, lines = idx + 1, 0
+                    out = open(self._seg_path(idx, new_gen), "wb")
+            out.flush()
+            os.fsync(out.fileno())
+        finally:
+            out.close()
+        _fsync_dir(gen_dir)
+
+        self._write_meta(new_gen)
+        if old_gen:
+            shutil.rmtree(self._gen_dir(old_gen), ignore_errors=True)
+        return written
+
+    def bootstrap(self, rows_fn: Callable[[], Iterable[Dict[str, Any]]]) -> bool:
+        """Seed a brand-new store from ``rows_fn()``; no-op once the store exists."""
+        with self._locked():
+            self._refresh_meta()
+            if self._generation:
+                return False
+            self._rewrite_locked(rows_fn())
+            return True
+
+    # ---------- reads ----------
+
+    @staticmethod
+    def _count_lines(path: Path) -> int:
+        with open(path, "rb") as f:
+            return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+
+    def iter_raw(self, start: int = 0) -> Iterator[bytes]:
+        """Yield committed NDJSON lines (bytes, newline stripped) from row ``start`` on."""
+        with self._tlock:
+            self._refresh_meta()
+            generation = self._generation
+        if not generation:
+            return
+        skip = start
+        for idx in self._segment_indexes(generation):
+            commit = self._read_commit(idx, generation)
+            if commit is not None and skip >= commit.get("lines", 0):
+                skip -= commit.get("lines", 0)
+                continue
+            limit = commit.get("bytes") if commit is not None else None
+            try:
+                f = open(self._seg_path(idx, generation), "rb")
+            except FileNotFoundError:
+                return  # store was rewritten underneath us
+            with f:
+                consumed = 0
+                for line in f:
+                    consumed += len(line)
+                    if limit is not None and consumed > limit:
+                        break
+                    if not line.endswith(b"\n"):
+                        break  # torn tail of the active segment
+                    if skip:
+                        skip -= 1
+                        continue
+                    line = line.rstrip(b"\r\n")
+                    if line:
+                        yield line
+
+    def iter_raw_from(self, pos: Optional[Position]) -> Iterator[Tuple[bytes, Position]]:
+        """
+        Yield ``(line, position_after_line)`` for committed lines after ``pos``.
+        ``pos`` must come from this generation; ``None`` means the beginning.
+        """
+        with self._tlock:
+            self._refresh_meta()
+            generation = self._generation
+        if not generation:
+            return
+        if pos is not None and pos[0] != generation:
+            raise ValueError("position belongs to another store generation")
+        first_idx, first_off = (pos[1], pos[2]) if pos is not None else (0, 0)
+        for idx in self._segment_indexes(generation):
+            if idx < first_idx:
+                continue
+            offset = first_off if idx == first_idx else 0
+            commit = self._read_commit(idx, generation)
+            limit = commit.get("bytes") if commit is not None else None
+            if limit is not None and offset >= limit:
+                continue
+            try:
+                f = open(self._seg_path(idx, generation), "rb")
+            except FileNotFoundError:
+                return
+            with f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    offset += len(line)
+                    if limit is not None and offset > limit:
+                        break
+                    line = line.rstrip(b"\r\n")
+                    if line:
+                        yield line, (generation, idx, offset)
+
+    def iter_rows(self, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """Yield decoded rows in append order, skipping malformed lines."""
+        for line in self.iter_raw(start):
+            try:
+                yield json.loads(line)
+            except Exception:
+                continue
+
+    def count(self) -> int:
+        """Number of stored rows; sealed segments are counted from their markers."""
+        with self._tlock:
+            self._refresh_meta()
+            generation = self._generation
+        total = 0
+        for idx in self._segment_indexes(generation):
+            commit = self._read_commit(idx, generation)
+            if commit is not None:
+                total += commit.get("lines", 0)
+                continue
+            try:
+                total += self._count_lines(self._seg_path(idx, generation))
+            except FileNotFoundError:
+                continue
+        return total
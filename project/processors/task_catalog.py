@@ -0,0 +1,107 @@
+"""
+In-memory task catalog for the sandbox.
+
+schemas/task_catalog.json is loaded once and indexed by task_id and by
+(category, difficulty), with wildcard buckets for either filter, so lookups
+and random selection cost O(1) regardless of catalog size. The file is
+re-stat'ed at most every ``check_interval`` seconds; a changed file is loaded
+into a new snapshot that replaces the old one in a single assignment, so a
+request always sees one consistent catalog version.
+"""
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), "..", "schemas", "task_catalog.json")
+
+BucketKey = Tuple[Optional[str], Optional[int]]
+
+
+class _Snapshot:
+    __slots__ = ("stamp", "tasks", "by_id", "buckets", "difficulties")
+
+    def __init__(self, stamp: Tuple[int, int], tasks: List[Dict[str, Any]]):
+        self.stamp = stamp
+        self.tasks = tasks
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.buckets: Dict[BucketKey, List[Dict[str, Any]]] = {}
+        for t in tasks:
+            if "task_id" in t:
+                self.by_id[t["task_id"]] = t
+            cat, diff = t.get("category"), t.get("difficulty")
+            for key in ((cat, diff), (cat, None), (None, diff), (None, None)):
+                self.buckets.setdefault(key, []).append(t)
+        self.difficulties: List[int] = sorted(d for c, d in self.buckets if c is None and isinstance(d, int))
+
+
+class TaskCatalog:
+    def __init__(self, path: str = CATALOG_PATH, check_interval: float = 1.0):
+        self.path = os.path.abspath(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._snap: Optional[_Snapshot] = None
+
+    def _stat(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self, stamp: Tuple[int, int]) -> _Snapshot:
+        with open(self.path, "r", encoding="utf-8") as f:
+            tasks = json.load(f).get("tasks", [])
+        return _Snapshot(stamp, [t for t in tasks if isinstance(t, dict)])
+
+    def snapshot(self) -> _Snapshot:
+        """Current catalog version, reloading first if the file changed."""
+        snap = self._snap
+        now = time.monotonic()
+        if snap is not None and now - self._checked_at < self.check_interval:
+            return snap
+        with self._lock:
+            snap = self._snap
+            if snap is not None and now - self._checked_at < self.check_interval:
+                return snap
+            self._checked_at = now
+            try:
+                stamp = self._stat()
+                if snap is None or stamp != snap.stamp:
+                    self._snap = snap = self._load(stamp)
+            except Exception as e:
+                if snap is None:
+                    raise  # nothing loaded yet: let the caller report it
+                print(f"[WARN] task catalog reload failed for {self.path}: {e}")
+            return snap
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.snapshot().by_id.get(task_id)
+        except TypeError:
+            return None  # unhashable id from a request body (list/object): no such task
+
+    def bucket(self, category: Optional[str] = None, difficulty: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Tasks matching the filters (None matches any); treat as read-only."""
+        return self.snapshot().buckets.get((category, difficulty), [])
+
+    def choose(self, category: Optional[str] = None, difficulty: Optional[int] = None,
+               rng: random.Random = random) -> Optional[Dict[str, Any]]:
+        tasks = self.bucket(category, difficulty)
+        return rng.choice(tasks) if tasks else None
+
+    def __len__(self) -> int:
+        return len(self.snapshot().tasks)
+
+
+_CATALOG: Optional[TaskCatalog] = None
+_CATALOG_LOCK = threading.Lock()
+
+
+def get_catalog() -> TaskCatalog:
+    """Process-wide catalog for CATALOG_PATH."""
+    global _CATALOG
+    with _CATALOG_LOCK:
+        if _CATALOG is None:
+            _CATALOG = TaskCatalog()
+        return _CATALOG
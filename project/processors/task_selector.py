@@ -0,0 +1,170 @@
+"""
+Adaptive task selection for the sandbox.
+
+Per participant the selector keeps the tasks already seen, a rolling window
+of recent accuracy from ``task_response`` events and a current difficulty.
+The difficulty steps up after a strong window and down after a weak one.
+The next task is taken from the catalog's precomputed (category, difficulty)
+bucket: each participant walks each bucket from a fixed per-participant
+starting point and skips tasks already seen, so a pick costs amortized O(1).
+
+State is built once from the event log (``build``, done at sandbox startup)
+and then kept current by ``observe`` as new events are stored. Only
+participants with a stored ``task_response`` get state; ``next_task`` for
+any other id uses a throwaway default state. At most MAX_PARTICIPANTS states
+are kept. When the table is full, the least recently used one is evicted and
+starts over at the lowest difficulty if it comes back.
+"""
+import random
+import threading
+import zlib
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from .task_catalog import TaskCatalog
+
+# rolling accuracy window and the thresholds that move difficulty
+WINDOW = 5
+MIN_RESPONSES = 3
+STEP_UP_ACCURACY = 0.8
+STEP_DOWN_ACCURACY = 0.4
+# participant states kept (least recently used evicted first)
+MAX_PARTICIPANTS = 50000
+
+
+class ParticipantState:
+    __slots__ = ("seen", "recent", "difficulty", "cursors")
+
+    def __init__(self, difficulty: int):
+        self.seen: Set[str] = set()
+        self.recent: Deque[int] = deque(maxlen=WINDOW)
+        self.difficulty = difficulty
+        # (catalog stamp, category, difficulty) -> tasks of that bucket already walked
+        self.cursors: Dict[Tuple[Any, Optional[str], int], int] = {}
+
+    def accuracy(self) -> Optional[float]:
+        return sum(self.recent) / len(self.recent) if self.recent else None
+
+
+class TaskSelector:
+    def __init__(self, catalog: TaskCatalog, events: Callable[[], Iterable[Dict[str, Any]]]):
+        self.catalog = catalog
+        self.events = events
+        self._lock = threading.RLock()
+        self._state: "OrderedDict[str, ParticipantState]" = OrderedDict()
+        self._built = False
+
+    # ---------- state ----------
+
+    def _levels(self) -> List[int]:
+        return self.catalog.snapshot().difficulties or [1]
+
+    def _participant(self, participant_id: str, create: bool = True) -> Optional[ParticipantState]:
+        st = self._state.get(participant_id)
+        if st is not None:
+            self._state.move_to_end(participant_id)
+        elif create:
+            st = self._state[participant_id] = ParticipantState(self._levels()[0])
+            if len(self._state) > MAX_PARTICIPANTS:
+                self._state.popitem(last=False)
+        return st
+
+    def build(self) -> int:
+        """Replay the event log once; returns the number of events applied."""
+        with self._lock:
+            if self._built:
+                return 0
+            self._state = OrderedDict()
+            n = 0
+            for event in self.events():
+                n += self._apply(event)
+            self._built = True
+            return n
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        """Fold one newly stored event into its participant's state."""
+        with self._lock:
+            if self._built:
+                self._apply(event)
+            # before build() the event is picked up from the log instead
+
+    def _apply(self, event: Dict[str, Any]) -> int:
+        if not isinstance(event, dict) or event.get("event_type") != "task_response":
+            return 0
+        pid = event.get("participant_id")
+        if not pid:
+            return 0
+        st = self._participant(pid)
+        if event.get("task_id"):
+            st.seen.add(event["task_id"])
+        accuracy = (event.get("metrics") or {}).get("accuracy")
+        if accuracy not in (0, 1):
+            return 1
+        st.recent.append(int(accuracy))
+        if len(st.recent) >= MIN_RESPONSES:
+            acc = st.accuracy()
+            levels = self._levels()
+            i = _level_index(levels, st.difficulty)
+            if acc >= STEP_UP_ACCURACY and i + 1 < len(levels):
+                st.difficulty = levels[i + 1]
+                st.recent.clear()
+            elif acc <= STEP_DOWN_ACCURACY and i > 0:
+                st.difficulty = levels[i - 1]
+                st.recent.clear()
+        return 1
+
+    def state(self, participant_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self.build()
+            st = self._state.get(participant_id)
+            if st is None:
+                return None
+            return {"difficulty": st.difficulty, "seen": len(st.seen), "recent_accuracy": st.accuracy()}
+
+    # ---------- selection ----------
+
+    def _next_unseen(self, pid: str, st: ParticipantState, snap, category: Optional[str],
+                     difficulty: int) -> Optional[Dict[str, Any]]:
+        bucket = snap.buckets.get((category, difficulty))
+        if not bucket:
+            return None
+        key = (snap.stamp, category, difficulty)
+        walked = st.cursors.get(key, 0)
+        start = zlib.crc32(pid.encode("utf-8")) % len(bucket)
+        while walked < len(bucket):
+            task = bucket[(start + walked) % len(bucket)]
+            if task.get("task_id") not in st.seen:
+                st.cursors[key] = walked
+                return task
+            walked += 1
+        st.cursors[key] = walked
+        return None
+
+    def next_task(self, participant_id: str, category: Optional[str] = None,
+                  difficulty: Optional[int] = None, rng: random.Random = random) -> Optional[Dict[str, Any]]:
+        """
+        Next unseen task at the participant's difficulty (or ``difficulty`` if
+        given), trying the nearest other difficulties before repeating a task.
+        """
+        with self._lock:
+            self.build()
+            snap = self.catalog.snapshot()
+            # unknown ids (any query value) get a throwaway state instead of a table entry
+            st = self._participant(participant_id, create=False) or ParticipantState(self._levels()[0])
+            target = st.difficulty if difficulty is None else difficulty
+            levels = [target] if difficulty is not None else \
+                sorted(snap.difficulties, key=lambda d: (abs(d - target), d))
+            for level in levels:
+                task = self._next_unseen(participant_id, st, snap, category, level)
+                if task is not None:
+                    return task
+            # everything matching has been seen: repeat one at the target difficulty
+            pool = snap.buckets.get((category, target)) or snap.buckets.get((category, None)) or []
+            return rng.choice(pool) if pool else None
+
+
+def _level_index(levels: List[int], difficulty: int) -> int:
+    for i, d in enumerate(levels):
+        if d >= difficulty:
+            return i
+    return len(levels) - 1
@@ -1,10 +1,55 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any
-from processors.event_logger import log_event
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from typing import Dict, Any, List
+from processors.async_writer import AsyncEventWriter, QueueFull
+from processors.event_logger import iter_events, log_events
+from processors.task_catalog import CATALOG_PATH, get_catalog
+from processors.task_selector import TaskSelector
+
+# upper bound on events accepted by one /api/log_events request
+MAX_BATCH_EVENTS = 1000
+
+# pending write requests before ingest endpoints answer 429
+EVENT_QUEUE_MAX = int(os.environ.get("EVENT_QUEUE_MAX", 1000))
+
+task_selector = TaskSelector(get_catalog(), iter_events)
+
+
+def _store_events(events):
+    """Runs on the writer thread: persist, then feed stored events to the task selector."""
+    errors = log_events(events)
+    for event, errs in zip(events, errors):
+        if not errs:
+            task_selector.observe(event)
+    return errors
+
+
+event_writer = AsyncEventWriter(_store_events, max_queue=EVENT_QUEUE_MAX)
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    # replay the event log into the selector once, before serving
+    await asyncio.get_running_loop().run_in_executor(None, task_selector.build)
+    await event_writer.start()
+    try:
+        yield
+    finally:
+        # drain queued events before the process exits
+        await event_writer.stop()
+
+
+def _busy():
+    return HTTPException(status_code=429, detail="event queue full, retry shortly",
+                         headers={"Retry-After": "1"})
+
 
 # Create FastAPI instance
-app = FastAPI(title="Cognitive Behavioral Sandbox API")
+app = FastAPI(title="Cognitive Behavioral Sandbox API", lifespan=lifespan)
 
 # Define the expected data structure for incoming requests
 class EventPayload(BaseModel):
@@ -26,11 +71,16 @@ async def api_log_event(payload: EventPayload):
     Receives a behavioral event from the frontend or external test client.
     Validates the JSON schema using event_logger and appends the event to session_data.json.
     """
-    event = payload.dict()
+    # unset optional fields are left out; the event schema has no nullable top-level fields
+    event = payload.dict(exclude_none=True)
     try:
-        log_event(event)
+        errors = (await event_writer.submit([event]))[0]
+    except QueueFull:
+        raise _busy()
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"failed to store event: {e}")
+    if errors:
+        raise HTTPException(status_code=400, detail="; ".join(errors))
     return {
         "status": "stored",
         "task_id": event.get("task_id"),
@@ -38,39 +88,98 @@ async def api_log_event(payload: EventPayload):
     }
 
 
-import json
-import random
+def _parse_batch(body: bytes) -> List[Any]:
+    """A JSON array, or NDJSON (one event per line). Unparseable lines become per-item errors."""
+    text = body.decode("utf-8").strip()
+    if text.startswith("["):
+        items = json.loads(text)
+        if not isinstance(items, list):
+            raise ValueError("expected a JSON array")
+        return items
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(e)
+    return items
+
+
+@app.post("/api/log_events")
+async def api_log_events(request: Request):
+    """
+    Batch version of /api/log_event: accepts a JSON array or an NDJSON body of
+    EventPayload objects, validates them together and stores the valid ones
+    with a single write. Returns a status per event, in request order.
+    """
+    try:
+        items = _parse_batch(await request.body())
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid batch body: {e}")
+    if len(items) > MAX_BATCH_EVENTS:
+        raise HTTPException(status_code=413, detail=f"at most {MAX_BATCH_EVENTS} events per batch")
+
+    results: List[Dict[str, Any]] = [{"index": i} for i in range(len(items))]
+    events, positions = [], []
+    for i, item in enumerate(items):
+        if isinstance(item, Exception):
+            results[i].update(status="rejected", errors=[f"invalid JSON: {item}"])
+            continue
+        try:
+            events.append(EventPayload.parse_obj(item).dict(exclude_none=True))
+            positions.append(i)
+        except ValidationError as e:
+            results[i].update(status="rejected", errors=[
+                ".".join(str(p) for p in err["loc"]) + ": " + err["msg"] for err in e.errors()
+            ])
+
+    try:
+        errors = await event_writer.submit(events) if events else []
+    except QueueFull:
+        raise _busy()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"failed to store batch: {e}")
+    for i, errs in zip(positions, errors):
+        if errs:
+            results[i].update(status="rejected", errors=errs)
+        else:
+            results[i].update(status="stored")
+
+    stored = sum(1 for r in results if r["status"] == "stored")
+    return {"stored": stored, "rejected": len(results) - stored, "results": results}
+
+
 from fastapi import Query
 
 @app.get("/api/get_task")
-def get_task(category: str | None = Query(None), difficulty: int | None = Query(None)):
+def get_task(category: str | None = Query(None), difficulty: int | None = Query(None),
+             participant_id: str | None = Query(None)):
     """
-    Returns a random task from schemas/task_catalog.json filtered by optional
-    category and difficulty query parameters.
+    Returns a task from schemas/task_catalog.json filtered by optional
+    category and difficulty query parameters. With participant_id the
+    adaptive selector picks the next unseen task at that participant's
+    current difficulty; without it the pick is random.
     """
-    catalog_path = "schemas/task_catalog.json"
     try:
-        with open(catalog_path, "r", encoding="utf-8") as f:
-            data = json.load(f).get("tasks", [])
+        if participant_id:
+            task = task_selector.next_task(participant_id, category or None, difficulty)
+        else:
+            task = get_catalog().choose(category or None, difficulty)
     except FileNotFoundError:
-        raise HTTPException(status_code=500, detail=f"Task catalog not found at {catalog_path}")
+        raise HTTPException(status_code=500, detail=f"Task catalog not found at {CATALOG_PATH}")
 
-    filtered = data
-    if category:
-        filtered = [t for t in filtered if t.get("category") == category]
-    if difficulty is not None:
-        filtered = [t for t in filtered if t.get("difficulty") == difficulty]
-
-    if not filtered:
+    if task is None:
         raise HTTPException(status_code=404, detail="No matching task found")
 
-    return random.choice(filtered)
+    return task
 
 
 from fastapi import Body
 
 @app.post("/api/submit_response")
-def submit_response(payload: dict = Body(...)):
+async def submit_response(payload: dict = Body(...)):
     """
     Receives a submitted task response, compares it to the catalog,
     calculates accuracy, and logs a task_response event.
@@ -79,11 +188,8 @@ def submit_response(payload: dict = Body(...)):
     participant_id = payload.get("participant_id", "anonymous")
     answer = payload.get("answer")
 
-    # --- Load task catalog ---
-    with open("schemas/task_catalog.json", "r", encoding="utf-8") as f:
-        catalog = json.load(f)["tasks"]
-
-    task = next((t for t in catalog if t["task_id"] == task_id), None)
+    # --- Look up task ---
+    task = get_catalog().get(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
@@ -108,7 +214,12 @@ def submit_response(payload: dict = Body(...)):
         },
         "consent_version": "1.0"
     }
-    log_event(event)
+    try:
+        errors = (await event_writer.submit([event]))[0]
+    except QueueFull:
+        raise _busy()
+    if errors:
+        raise HTTPException(status_code=400, detail="; ".join(errors))
 
     return {
         "task_id": task_id,
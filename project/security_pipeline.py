@@ -0,0 +1,128 @@
+"""
+Per-request security pipeline for the Flask app.
+
+Every request gets one ``RequestContext`` that holds what the security
+checks share: the host without port, the honeypot cookie (split and
+verified once) and the request body (parsed on first use). The stages run
+in registration order from a single before_request hook. The first stage
+that returns a response stops the pipeline, and that response is sent.
+
+Stages may also be run on demand (``run_stage``, e.g. the bot tripwire from
+the routes that accept submissions). Their result is cached on the context,
+so a stage never runs twice for one request.
+
+Each stage's wall time is recorded on the context (``ctx.timings``, in ms)
+and summed into the pipeline's process-wide ``stats``. ``server_timing``
+formats a context's timings as a ``Server-Timing`` header value.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_UNSET = object()
+
+
+class RequestContext:
+    """What the security stages know about the current request."""
+
+    def __init__(self, request, hp_parse: Callable[[str], Optional[str]], hp_default: str):
+        self.request = request
+        self.path = request.path
+        self.ip = request.remote_addr
+        self.host = (request.host or "").split(":")[0]
+        # raw "hp_field" cookie: "<name>|<sig>" when we issued it, a bare name when client JS did
+        self.hp_raw = request.cookies.get("hp_field", "")
+        self.hp_verified = hp_parse(self.hp_raw) if self.hp_raw else None
+        self.hp_default = hp_default
+        self.hp_cookie_to_set: Optional[str] = None
+        self.client_key: Optional[str] = None  # hashed client address, filled on first use
+        self.timings: List[Tuple[str, float]] = []
+        self._results: Dict[str, Any] = {}
+        self._body: Any = _UNSET
+
+    @property
+    def hp_name(self) -> str:
+        """Honeypot field name to expect: the verified cookie name, else the configured default."""
+        return self.hp_verified or self.hp_default
+
+    def hp_fields(self) -> List[str]:
+        """Every field name a honeypot input may have been rendered under for this client."""
+        names = [self.hp_name]
+        # templates and client JS use the raw cookie value as the input name
+        if self.hp_raw and self.hp_raw not in names:
+            names.append(self.hp_raw)
+        return names
+
+    @property
+    def body(self) -> Dict[str, Any]:
+        """JSON object or form fields of the request, parsed once."""
+        if self._body is _UNSET:
+            req = self.request
+            if req.is_json:
+                data = req.get_json(silent=True)
+                self._body = data if isinstance(data, dict) else {}
+            else:
+                self._body = req.form
+        return self._body
+
+
+class SecurityPipeline:
+    """Ordered security stages, each ``fn(ctx) -> response or None``."""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, Callable[[RequestContext], Any]]] = []
+        self._on_demand: Dict[str, Callable[[RequestContext], Any]] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def stage(self, name: str, on_demand: bool = False):
+        """Decorator registering ``fn`` as stage ``name`` (on_demand: only via ``run_stage``)."""
+        def register(fn):
+            if on_demand:
+                self._on_demand[name] = fn
+            else:
+                self.stages.append((name, fn))
+            return fn
+        return register
+
+    def _time(self, ctx: RequestContext, name: str, fn) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return fn(ctx)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            ctx.timings.append((name, ms))
+            with self._lock:
+                s = self._stats.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                s["count"] += 1
+                s["total_ms"] += ms
+                s["max_ms"] = max(s["max_ms"], ms)
+
+    def run(self, ctx: RequestContext) -> Any:
+        """Run the registered stages in order; return the first blocking response."""
+        for name, fn in self.stages:
+            result = self._time(ctx, name, fn)
+            if result is not None:
+                return result
+        return None
+
+    def run_stage(self, ctx: RequestContext, name: str) -> Any:
+        """Run on-demand stage ``name`` for this request (at most once)."""
+        if name not in ctx._results:
+            ctx._results[name] = self._time(ctx, name, self._on_demand[name])
+        return ctx._results[name]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage {"count", "total_ms", "avg_ms", "max_ms"} since process start."""
+        with self._lock:
+            return {
+                name: {**s, "avg_ms": (s["total_ms"] / s["count"]) if s["count"] else 0.0}
+                for name, s in self._stats.items()
+            }
+
+
+def server_timing(ctx: RequestContext) -> str:
+    """``Server-Timing`` value: one ``sec-<stage>`` metric per stage plus the total."""
+    parts = [f"sec-{name};dur={ms:.3f}" for name, ms in ctx.timings]
+    parts.append(f"sec;dur={sum(ms for _, ms in ctx.timings):.3f}")
+    return ", ".join(parts)
@@ -1,2 +1,19 @@
 import sys, pathlib
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+import pytest
+
+
+@pytest.fixture
+def app_module(monkeypatch, tmp_path):
+    """The Flask app module with its session store and logs redirected under tmp_path."""
+    pytest.importorskip("flask_limiter")
+    monkeypatch.setenv("SESSION_STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setenv("LIMITER_STORAGE_URI", "memory://")
+    monkeypatch.setenv("ALLOWED_ORIGIN_HOST", "localhost")
+    monkeypatch.setenv("ADMIN_TOKEN", "t")
+    import app
+
+    monkeypatch.setattr(app, "DATA_LOG", str(tmp_path / "data_log.jsonl"))
+    monkeypatch.setattr(app, "AUDIT_LOG", str(tmp_path / "audit_log.jsonl"))
+    return app
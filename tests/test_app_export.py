@@ -0,0 +1,86 @@
+import gzip
+
+import pytest
+
+from project import export_stream
+
+
+def test_export_includes_sealed_segments(app_module):
+    app = app_module
+    app.append_jsonl_secure(app.DATA_LOG, {"participant_id": "p1", "n": 1})
+    app.append_jsonl_secure(app.DATA_LOG, {"participant_id": "p2", "n": 2})
+    with app._log_write_lock(app.DATA_LOG):
+        app.log_segments.seal(app.DATA_LOG, keep=5)
+    app.append_jsonl_secure(app.DATA_LOG, {"participant_id": "p1", "n": 3})
+    assert len(app.log_segments.segment_files(app.DATA_LOG)) == 2
+
+    r = app.app.test_client().get("/export/p1", headers={"Host": "localhost", "Authorization": "Bearer t"})
+    assert r.status_code == 200
+    assert [e["n"] for e in r.get_json()["events"]] == [1, 3]
+
+
+
+# ---------------------------
+# Streaming export tests
+# ---------------------------
+
+ADMIN = {"Host": "localhost", "Authorization": "Bearer t"}
+
+
+@pytest.fixture
+def export_app(app_module, monkeypatch, tmp_path):
+    import project.analyze_events as ae
+    monkeypatch.setattr(ae, "DATA_PATH", tmp_path / "session_data.json")
+    monkeypatch.setattr(ae, "STORE_DIR", tmp_path / "sessions")
+    monkeypatch.setattr(ae, "SEGMENT_MAX_BYTES", 300)  # several store segments
+    monkeypatch.setattr(ae, "_STORE", None)
+    monkeypatch.setattr(app_module.limiter, "enabled", False)
+    return app_module
+
+
+def _get(app, url, **headers):
+    r = app.app.test_client().get(url, headers={**ADMIN, **headers})
+    assert r.status_code == 200
+    body = r.get_data()
+    return gzip.decompress(body) if r.headers.get("Content-Encoding") == "gzip" else body
+
+
+def _export_variants(app, url):
+    sep = "&" if "?" in url else "?"
+    return [_get(app, url), _get(app, url + sep + "gzip=1"), _get(app, url, **{"Accept-Encoding": "gzip"})]
+
+
+@pytest.mark.parametrize("n_sessions", [0, 40])
+def test_streamed_export_matches_full_encoding(export_app, tmp_path, n_sessions):
+    app = export_app
+    for i in range(n_sessions):
+        app.save_session_result({"participant_id": f"p{i}", "task_id": "t", "note": "é" * (i % 3)})
+    rows = app.export_all()
+    assert len(rows) == n_sessions
+    if n_sessions:
+        assert len(list((tmp_path / "sessions").rglob("*.ndjson"))) > 1
+
+    full_json = export_stream.dumps_bytes(rows)
+    full_ndjson = b"".join(export_stream.dumps_bytes(r) + b"\n" for r in rows)
+    assert _export_variants(app, "/export") == [full_json] * 3
+    assert _export_variants(app, "/export?format=ndjson") == [full_ndjson] * 3
+
+
+def test_streamed_download_matches_full_encoding(export_app):
+    app = export_app
+    assert _get(app, "/admin/download/nobody") == export_stream.dumps_bytes(
+        {"ok": True, "participant_id": "nobody", "records": [], "matches": 0})
+
+    for n in range(6):
+        app.append_jsonl_secure(app.DATA_LOG, {"participant_id": "p1" if n % 2 else "p2", "n": n})
+        if n in (1, 3):
+            with app._log_write_lock(app.DATA_LOG):
+                app.log_segments.seal(app.DATA_LOG, keep=5)
+    assert len(app.log_segments.segment_files(app.DATA_LOG)) == 3
+
+    records = app._collect_participant_records("p1")
+    assert [r["record"]["n"] for r in records] == [1, 3, 5]
+    full = export_stream.dumps_bytes({"ok": True, "participant_id": "p1", "records": records, "matches": 3})
+    full_ndjson = b"".join(export_stream.dumps_bytes(r) + b"\n" for r in records)
+    assert _export_variants(app, "/admin/download/p1") == [full] * 3
+    assert _export_variants(app, "/admin/download/p1?format=ndjson") == [full_ndjson] * 3
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("jsonschema")
+
+from project.processors.async_writer import AsyncEventWriter, QueueFull
+
+
+def test_batches_queued_events_and_splits_results():
+    calls = []
+
+    def write_batch(events):
+        calls.append(list(events))
+        return [["bad"] if e.get("bad") else [] for e in events]
+
+    async def main():
+        writer = AsyncEventWriter(write_batch, max_queue=10)
+        await writer.start()
+        results = await asyncio.gather(
+            writer.submit([{"i": 0}]),
+            writer.submit([{"i": 1, "bad": True}, {"i": 2}]),
+            writer.submit([{"i": 3}]),
+        )
+        await writer.stop()
+        return results
+
+    results = asyncio.run(main())
+    assert results == [[[]], [["bad"], []], [[]]]
+    # the first submit is written alone; the two queued behind it share one write
+    assert sum(len(c) for c in calls) == 4 and len(calls) <= 2
+
+
+def test_full_queue_raises_instead_of_blocking():
+    writing, release = threading.Event(), threading.Event()
+
+    def write_batch(events):
+        writing.set()
+        release.wait(5)
+        return [[] for _ in events]
+
+    async def main():
+        writer = AsyncEventWriter(write_batch, max_queue=1)
+        await writer.start()
+        first = asyncio.ensure_future(writer.submit([{"i": 0}]))
+        while not writing.is_set():  # writer is now busy with the first event
+            await asyncio.sleep(0.001)
+        second = asyncio.ensure_future(writer.submit([{"i": 1}]))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull):
+            await writer.submit([{"i": 2}])
+        release.set()
+        assert await asyncio.gather(first, second) == [[[]], [[]]]
+        await writer.stop()
+
+    asyncio.run(main())
+
+
+def test_submit_starts_the_writer_when_lifespan_did_not():
+    calls = []
+
+    def write_batch(events):
+        calls.append(list(events))
+        return [[] for _ in events]
+
+    writer = AsyncEventWriter(write_batch)
+
+    async def submit(i):
+        return await writer.submit([{"i": i}])
+
+    # no start(); a second loop (e.g. a TestClient without a context manager) restarts it
+    assert asyncio.run(submit(0)) == [[]]
+    assert asyncio.run(submit(1)) == [[]]
+    assert calls == [[{"i": 0}], [{"i": 1}]]
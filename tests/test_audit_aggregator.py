@@ -0,0 +1,42 @@
+from project.audit_aggregator import AuditAggregator
+
+
+def _denied(ip, path, ts):
+    return {"ts": ts, "ip": ip, "action": "host_block", "status": "denied", "extra": {"path": path}}
+
+
+def test_repeats_are_folded_into_one_summary_per_key():
+    out = []
+    agg = AuditAggregator(out.append, interval_s=3600, sample_paths=2)
+    assert not agg.add({"action": "consent_given", "ip": "1.1.1.1"})
+    assert not agg.add(_denied("1.1.1.1", "/a", "t0"))  # first one is written in full
+    assert all(agg.add(_denied("1.1.1.1", p, f"t{i}")) for i, p in enumerate(["/a", "/b", "/c"], 1))
+    assert not agg.add(_denied("2.2.2.2", "/a", "t9"))
+
+    assert agg.flush() == 1
+    (summary,) = out
+    assert summary["action"] == "host_block" and summary["ip"] == "1.1.1.1"
+    assert summary["extra"]["aggregate"] == {
+        "count": 3, "first_ts": "t1", "last_ts": "t3", "paths": ["/a", "/b"], "window_s": 3600,
+    }
+    # the next event after a window closes starts a new one
+    assert not agg.add(_denied("1.1.1.1", "/a", "t10"))
+
+
+def test_only_due_windows_close_and_key_table_is_bounded():
+    out = []
+    agg = AuditAggregator(out.append, interval_s=3600, max_keys=1)
+    agg.add(_denied("1.1.1.1", "/a", "t0"))
+    assert not agg.add(_denied("2.2.2.2", "/a", "t1"))  # opens the overflow window
+    assert agg.add(_denied("3.3.3.3", "/b", "t2"))
+    assert agg.flush(due_only=True) == 0
+    assert agg.flush() == 1 and out[0]["ip"] == "*"
+
+
+def test_reading_the_audit_log_does_not_close_open_windows(app_module):
+    app = app_module
+    client = app.app.test_client()
+    for _ in range(3):
+        client.get("/status", headers={"Host": "elsewhere"})  # host_block
+    app.flush_audit()
+    assert [w["count"] for k, w in app.audit_aggregator._windows.items() if k[0] == "host_block"] == [2]
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from project.audit_writer import LogWriter
+
+# ---------------------------
+# Group-commit writer tests
+# ---------------------------
+
+def _recorder():
+    batches = []
+    lock = threading.Lock()
+
+    def write_batch(path, records, fsync):
+        with lock:
+            batches.append((path, list(records), fsync))
+    return batches, write_batch
+
+
+def test_async_mode_batches_and_flushes():
+    batches, write_batch = _recorder()
+    w = LogWriter(write_batch, mode="async", batch_ms=50)
+    for i in range(20):
+        w.submit("audit.jsonl", {"i": i})
+    w.flush()
+    written = [r["i"] for _, records, _ in batches for r in records]
+    assert written == list(range(20))
+    assert len(batches) < 20  # lines shared writes
+    w.close()
+
+
+def test_sync_mode_writes_inline():
+    batches, write_batch = _recorder()
+    w = LogWriter(write_batch, mode="sync")
+    w.submit("audit.jsonl", {"i": 1})
+    assert batches == [("audit.jsonl", [{"i": 1}], True)]
+
+
+def test_group_mode_waits_for_commit():
+    batches, write_batch = _recorder()
+    w = LogWriter(write_batch, mode="group", batch_ms=1)
+    w.submit("audit.jsonl", {"i": 1})
+    assert batches and batches[0][1] == [{"i": 1}]
+    w.close()
+
+
+def _blocked_writer():
+    entered, release = threading.Event(), threading.Event()
+
+    def write_batch(path, records, fsync):
+        entered.set()
+        release.wait(5)
+    w = LogWriter(write_batch, mode="async", batch_ms=1, max_batch=1)
+    w.submit("audit.jsonl", {"i": 0})
+    assert entered.wait(5)
+    return w, release
+
+
+def test_pending_counts_queued_records():
+    w, release = _blocked_writer()
+    w.submit("audit.jsonl", {"i": 1})
+    w.submit("audit.jsonl", {"i": 2})
+    assert w.pending() == 2
+    release.set()
+    w.flush()
+    assert w.pending() == 0
+    w.close()
+
+
+def test_status_does_not_wait_for_the_audit_writer(app_module, monkeypatch):
+    w, release = _blocked_writer()
+    monkeypatch.setattr(app_module, "audit_writer", w)
+    w.submit("audit.jsonl", {"i": 1})
+    try:
+        t0 = time.monotonic()
+        resp = app_module.app.test_client().get("/status", headers={"Host": "localhost"})
+        assert time.monotonic() - t0 < 2
+        assert resp.status_code == 200
+        assert resp.get_json()["counts"]["audit_queue_depth"] >= 1
+    finally:
+        release.set()
+        w.close()
+
+
+def test_failed_batch_is_retried_per_record_and_reported(monkeypatch):
+    import project.audit_writer as aw
+    monkeypatch.setattr(aw, "RETRY_DELAY_S", 0)
+    written = []
+
+    def write_batch(path, records, fsync):
+        if len(records) > 1 or records[0]["i"] == 2:
+            raise OSError("disk full")
+        written.append(records[0]["i"])
+
+    w = LogWriter(write_batch, mode="async", batch_ms=50)
+    for i in range(4):
+        w.submit("audit.jsonl", {"i": i})
+    with pytest.raises(aw.AuditWriteError):
+        w.flush()
+    assert sorted(written) == [0, 1, 3] and w.failed == 1
+    w.flush()  # nothing lost since the last flush
+    w.close()
+
+    g = LogWriter(write_batch, mode="group", batch_ms=1)
+    with pytest.raises(aw.AuditWriteError):
+        g.submit("audit.jsonl", {"i": 2})
+    g.close()
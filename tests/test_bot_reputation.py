@@ -0,0 +1,26 @@
+from project.bot_reputation import ReputationTable, event_weight
+
+
+def test_event_weights():
+    assert event_weight({"action": "consent_given"}) == 0
+    assert event_weight({"action": "honeypot_trigger"}) == 5
+    slow = {"action": "snare_trigger", "extra": {"payload": {"elapsed_ms": 9000}}}
+    fast = {"action": "snare_trigger", "extra": {"payload": {"elapsed_ms": 120}}}
+    assert (event_weight(slow), event_weight(fast)) == (1, 3)
+
+
+def test_scores_accumulate_and_decay():
+    t = ReputationTable(half_life_s=60, suspect_score=3, block_score=8)
+    t.observe("a", 2, now=0)
+    assert t.observe("a", 2, now=0) == 4
+    assert abs(t.score("a", now=60) - 2) < 1e-9  # one half-life later
+    t.observe("b", 9)
+    assert t.blocked("b") and t.suspect("b") and not t.suspect("nobody")
+    assert [k for k, _ in t.top(1)] == ["b"]
+
+
+def test_table_is_bounded():
+    t = ReputationTable(max_entries=2)
+    for key in ("a", "b", "c"):
+        t.observe(key, 1)
+    assert t.score("a") == 0 and t.score("c") > 0
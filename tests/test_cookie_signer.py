@@ -0,0 +1,31 @@
+import hashlib
+import hmac
+
+from project.cookie_signer import CookieSigner
+
+
+def _ref(key, val):
+    return hmac.new(key.encode(), val.encode(), hashlib.sha256).hexdigest()
+
+
+def test_cached_signatures_match_plain_hmac_and_reject_forgeries():
+    s = CookieSigner("k1", max_entries=2)
+    sig = s.sign("hp_a")
+    assert sig == _ref("k1", "hp_a")
+    assert s.verify("hp_a", sig) and s.hits == 1
+    assert not s.verify("hp_a", "0" * 64)  # cached name, forged signature
+
+    s.sign("hp_b")
+    s.sign("hp_c")  # evicts hp_a (least recently used)
+    misses = s.misses
+    assert s.verify("hp_a", sig) and s.misses == misses + 1
+
+
+def test_key_rotation_drops_cached_signatures():
+    s = CookieSigner("k1")
+    old = s.sign("hp_a")
+    s.ensure_key("k1")
+    assert s.verify("hp_a", old)
+    s.ensure_key("k2")
+    assert not s.verify("hp_a", old)
+    assert s.verify("hp_a", _ref("k2", "hp_a"))
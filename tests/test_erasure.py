@@ -0,0 +1,82 @@
+import json
+
+from project import erasure, log_metrics, log_segments, participant_index
+
+
+def _write(path, recs):
+    with open(path, "a", encoding="utf-8") as f:
+        for r in recs:
+            f.write(json.dumps(r) + "\n")
+
+
+def _lines(path):
+    return open(path, "rb").read().splitlines(keepends=True)
+
+
+def test_batch_erase_rewrites_matching_lines_in_place(tmp_path):
+    path = tmp_path / "data_log.jsonl"
+    _write(path, [{"participant_id": "p1", "score": 1}, {"participant_id": "p2", "score": 2}])
+    log_segments.seal(str(path), keep=5)
+    _write(path, [{"participant_id": "p3", "score": 3},
+                  {"actor": "participant:p1", "action": "export", "extra": {"participant_id": "p1"}}])
+    before = {seg: _lines(seg) for seg in log_segments.segment_files(str(path))}
+
+    job = erasure.ErasureJob([str(path)], {"p1": "x1", "p2": "x2"}, str(tmp_path / "bk"))
+    result = job.run()
+
+    assert result["changed_lines"] == 3 and result["tombstoned"] == 0
+    records = list(log_segments.iter_records(str(path)))
+    assert [r.get("participant_id") for r in records] == ["x1", "x2", "p3", None]
+    assert records[3]["actor"] == "participant:x1" and records[3]["extra"]["participant_id"] == "x1"
+    # same byte layout, so offsets held by the index and cursors stay valid
+    for seg, lines in before.items():
+        assert [len(ln) for ln in _lines(seg)] == [len(ln) for ln in lines]
+    assert participant_index.lookup(str(path), "p3") == [{"participant_id": "p3", "score": 3}]
+
+    assert erasure.restore(result["backup"]) == 3
+    assert {seg: _lines(seg) for seg in before} == before
+
+
+def test_tombstone_mode_and_fallback(tmp_path):
+    path = tmp_path / "data_log.jsonl"
+    _write(path, [{"participant_id": "p1", "ts": "2024-01-01T00:00:00"}, {"participant_id": "p2"}])
+
+    erasure.ErasureJob([str(path)], {"p1": ""}, str(tmp_path / "bk"), mode="tombstone").run()
+    assert json.loads(_lines(path)[0]) == {"_erased": True, "ts": "2024-01-01T00:00:00"}
+
+    # a token too long for the line falls back to a tombstone
+    result = erasure.ErasureJob([str(path)], {"p2": "y" * 40}, str(tmp_path / "bk")).run()
+    assert result["tombstoned"] == 1
+    assert [r for r in log_segments.iter_records(str(path))][1] == {"_erased": True}
+
+
+def test_rewrites_keep_chain_fields_and_refresh_index_and_ring(tmp_path):
+    path = str(tmp_path / "data_log.jsonl")
+    _write(path, [{"participant_id": "p1", "score": 1, "_p": None, "_h": "h1"},
+                  {"participant_id": "p2", "score": 2, "_p": "h1", "_h": "h2"}])
+    assert participant_index.spans(path, "p1")
+    assert log_metrics.recent(path, 2)[1]["participant_id"] == "p2"
+
+    erasure.ErasureJob([path], {"p1": "x1"}, str(tmp_path / "bk")).run()
+    erasure.ErasureJob([path], {"p2": ""}, str(tmp_path / "bk"), mode="tombstone").run()
+
+    records = list(log_segments.iter_records(path))
+    assert records[0] == {"participant_id": "x1", "score": 1, "_p": None, "_h": "h1"}
+    assert records[1] == {"_erased": True, "_p": "h1", "_h": "h2"}
+    assert participant_index.spans(path, "p1") == []
+    assert participant_index.lookup(path, "x1") == [records[0]]
+    assert "p1" not in open(participant_index.index_path(path), encoding="utf-8").read()
+    assert log_metrics.recent(path, 2) == records
+
+
+def test_anonymize_data_for_participant_keeps_records(app_module):
+    pid = "0b7e6f0e-5f5c-4a57-9d4e-2f0c6c1d8a31"
+    app_module.append_jsonl_secure(app_module.DATA_LOG, {"participant_id": pid, "kind": "behavioral", "score": 3})
+    app_module.append_jsonl_secure(app_module.DATA_LOG, {"participant_id": pid})
+
+    ok, msg = app_module.anonymize_data_for_participant(pid)
+
+    assert ok and msg.startswith("2 entries anonymized")
+    records = list(log_segments.iter_records(app_module.DATA_LOG))
+    assert all(r["participant_id"].startswith("erased_") and r["erased"] is True for r in records)
+    assert records[0]["score"] == 3 and not any("_erased" in r for r in records)
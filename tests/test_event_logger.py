@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+pytest.importorskip("jsonschema")
+
+from project.processors import compact_events, event_logger
+from project.processors.mock_events import make_mock_event
+
+
+def _use_tmp_log(monkeypatch, tmp_path, backend):
+    monkeypatch.setattr(event_logger, "EVENT_LOG_BACKEND", backend)
+    monkeypatch.setattr(event_logger, "EVENT_LOG_DIR", str(tmp_path / "event_log"))
+    monkeypatch.setattr(event_logger, "LOG_FILE", str(tmp_path / "session_data.json"))
+    monkeypatch.setattr(event_logger, "_EVENT_LOG", None)
+
+
+def test_ndjson_backend_imports_array_log_and_compacts(monkeypatch, tmp_path):
+    _use_tmp_log(monkeypatch, tmp_path, "ndjson")
+    legacy = [make_mock_event(participant_id="old", task_id="t0")]
+    legacy[0]["timestamp"] = "2025-01-01T00:00:00Z"
+    (tmp_path / "session_data.json").write_text(json.dumps(legacy))
+
+    for i in range(5):
+        event_logger.log_event(make_mock_event(participant_id=f"p{i}", task_id=f"t{i}"))
+
+    events = list(event_logger.iter_events())
+    assert [e["participant_id"] for e in events] == ["old", "p0", "p1", "p2", "p3", "p4"]
+    # the import is one-way and runs once; the array log itself is not rewritten
+    assert json.loads((tmp_path / "session_data.json").read_text()) == legacy
+
+    out = tmp_path / "compacted.json"
+    assert compact_events.compact(str(out)) == 6
+    assert json.loads(out.read_text()) == events
+
+
+def test_json_backend_keeps_array_file(monkeypatch, tmp_path):
+    _use_tmp_log(monkeypatch, tmp_path, "json")
+    event_logger.log_event(make_mock_event(participant_id="p1"))
+    data = json.loads((tmp_path / "session_data.json").read_text())
+    assert [e["participant_id"] for e in data] == ["p1"]
+    assert not (tmp_path / "event_log").exists()
+
+
+def test_log_events_stores_valid_items_in_one_write(monkeypatch, tmp_path):
+    _use_tmp_log(monkeypatch, tmp_path, "ndjson")
+    store = event_logger.get_event_log()
+    writes = []
+    real_append_many = store.append_many
+    monkeypatch.setattr(store, "append_many", lambda rows: writes.append(rows) or real_append_many(rows))
+
+    bad = make_mock_event(participant_id="bad")
+    bad["metrics"]["accuracy"] = 7
+    errors = event_logger.log_events([make_mock_event(participant_id="a"), bad, "nope",
+                                      make_mock_event(participant_id="b")])
+
+    assert errors[0] == [] and errors[3] == []
+    assert errors[1] == ["metrics.accuracy: 7 is greater than the maximum of 1"]
+    assert errors[2] and len(writes) == 1
+    assert [e["participant_id"] for e in event_logger.iter_events()] == ["a", "b"]
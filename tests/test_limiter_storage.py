@@ -0,0 +1,36 @@
+import multiprocessing
+
+from limits import parse, strategies
+from limits.storage import storage_from_string
+
+from project.limiter_storage import SQLiteStorage
+
+
+def _hammer(uri, strategy, n, out):
+    limiter = strategy(storage_from_string(uri))
+    out.put(sum(limiter.hit(parse("25/minute"), "consent", "1.2.3.4") for _ in range(n)))
+
+
+def test_scheme_is_registered_and_counters_expire(tmp_path):
+    storage = storage_from_string(f"sqlite:///{tmp_path}/rl.sqlite")
+    assert isinstance(storage, SQLiteStorage) and storage.check()
+    assert storage.incr("k", 60) == 1 and storage.incr("k", 60, amount=2) == 3
+    assert storage.incr("gone", -1) == 1 and storage.get("gone") == 0
+    assert storage.incr("gone", 60) == 1  # an expired window restarts
+    storage.clear("k")
+    assert storage.get("k") == 0
+
+
+def test_limit_is_shared_across_processes(tmp_path):
+    uri = f"sqlite:///{tmp_path}/rl.sqlite"
+    ctx = multiprocessing.get_context("fork")
+    for strategy in (strategies.FixedWindowRateLimiter, strategies.SlidingWindowCounterRateLimiter):
+        storage_from_string(uri).reset()
+        out = ctx.Queue()
+        procs = [ctx.Process(target=_hammer, args=(uri, strategy, 20, out)) for _ in range(4)]
+        for p in procs:
+            p.start()
+        allowed = sum(out.get(timeout=30) for _ in procs)
+        for p in procs:
+            p.join()
+        assert allowed == 25
@@ -0,0 +1,58 @@
+import hashlib
+import hmac
+import json
+
+from project import log_segments
+
+KEY = "ab" * 32
+
+
+def _use_key(app, monkeypatch):
+    monkeypatch.setattr(app, "LOG_HMAC_KEY_HEX", KEY)
+    monkeypatch.setattr(app, "_LOG_HMAC_KEY_BYTES", bytes.fromhex(KEY))
+
+
+def _verify_chain(path):
+    """Every line links to the previous _h and its _h is the HMAC of (prev || payload)."""
+    prev = None
+    n = 0
+    for rec in log_segments.iter_records(path):
+        payload = {k: v for k, v in rec.items() if k not in ("_p", "_h")}
+        hm = hmac.new(bytes.fromhex(KEY), digestmod=hashlib.sha256)
+        if prev:
+            hm.update(prev.encode("utf-8"))
+        hm.update(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        assert rec["_p"] == prev and rec["_h"] == hm.hexdigest(), rec
+        prev = rec["_h"]
+        n += 1
+    return n
+
+
+def test_chain_continues_across_sealed_segments(app_module, monkeypatch, tmp_path):
+    app = app_module
+    _use_key(app, monkeypatch)
+    monkeypatch.setattr(app, "LOG_MAX_BYTES", 600)
+    monkeypatch.setattr(app, "LOG_BACKUPS", 50)
+    path = str(tmp_path / "chain.jsonl")
+
+    for i in range(20):
+        app.append_jsonl_secure(path, {"i": i, "pad": "x" * 40})
+
+    assert len(log_segments.segment_files(path)) >= 3
+    assert _verify_chain(path) == 20
+
+
+def test_stale_chain_head_is_reread_after_another_writer(app_module, monkeypatch, tmp_path):
+    app = app_module
+    _use_key(app, monkeypatch)
+    path = str(tmp_path / "chain.jsonl")
+
+    app.append_jsonl_secure(path, {"i": 0})
+    stale = app._CHAIN_HEADS[path]
+    app.append_jsonl_secure(path, {"i": 1})  # another worker's append
+    # this worker still caches the head it saw before that append
+    monkeypatch.setitem(app._CHAIN_HEADS, path, stale)
+    app.append_jsonl_secure_many(path, [{"i": 2}, {"i": 3}])
+
+    assert _verify_chain(path) == 4
+    assert app._CHAIN_HEADS[path][2] == list(log_segments.iter_records(path))[-1]["_h"]
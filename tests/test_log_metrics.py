@@ -0,0 +1,43 @@
+import json
+import os
+
+from project import log_metrics, log_segments
+
+
+def _write(path, recs):
+    data = b"".join((json.dumps(r) + "\n").encode() for r in recs)
+    with open(path, "ab") as f:
+        start = f.tell()
+        f.write(data)
+        end = f.tell()
+    log_metrics.record_append(str(path), os.stat(path).st_ino, start, end, len(recs), recs)
+
+
+def test_counts_follow_appends_seals_and_other_writers(tmp_path):
+    path = tmp_path / "audit_log.jsonl"
+    _write(path, [{"i": i} for i in range(3)])
+    assert log_metrics.counts(str(path))["lines"] == 3
+
+    log_segments.seal(str(path), keep=5)
+    _write(path, [{"i": 3}])
+    c = log_metrics.counts(str(path))
+    assert (c["lines"], c["segments"], c["live_lines"]) == (4, 1, 1)
+    assert c["bytes"] == sum(os.path.getsize(f) for f in log_segments.segment_files(str(path)))
+
+    # a write this process did not see (another worker) is counted from the new bytes only
+    with open(path, "ab") as f:
+        f.write(b'{"i": 4}\n')
+    assert log_metrics.counts(str(path))["lines"] == 5
+
+
+def test_checkpoint_survives_restart_and_recent_ring(tmp_path, monkeypatch):
+    path = tmp_path / "audit_log.jsonl"
+    _write(path, [{"i": i} for i in range(4)])
+    assert [r["i"] for r in log_metrics.recent(str(path), 2)] == [2, 3]
+    _write(path, [{"i": 4}])
+    assert [r["i"] for r in log_metrics.recent(str(path), 2)] == [3, 4]
+
+    log_metrics.checkpoint(str(path))
+    monkeypatch.setattr(log_metrics, "_LIVE", {})
+    monkeypatch.setattr(log_metrics, "_count_newlines", lambda *a: 0)  # nothing left to scan
+    assert log_metrics.counts(str(path))["lines"] == 5
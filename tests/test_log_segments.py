@@ -0,0 +1,99 @@
+import json
+
+from project import log_segments, participant_index
+
+
+def _append(path, records):
+    with open(path, "ab") as f:
+        for rec in records:
+            line = (json.dumps(rec) + "\n").encode()
+            offset = f.tell()
+            f.write(line)
+            f.flush()
+            participant_index.record_append(str(path), offset, len(line), rec)
+
+
+def _rec(i, pid="p1"):
+    return {"ts": f"2025-01-01T00:00:{i:02d}+00:00", "participant_id": pid, "i": i, "_h": f"h{i}"}
+
+
+def test_seal_records_manifest_and_keeps_index(tmp_path):
+    path = tmp_path / "audit_log.jsonl"
+    _append(path, [_rec(i) for i in range(3)])
+    entry = log_segments.seal(str(path), keep=5)
+
+    assert entry["lines"] == 3 and entry["head"] == "h2"
+    assert entry["first_ts"].endswith(":00+00:00") and entry["last_ts"].endswith(":02+00:00")
+    assert (tmp_path / entry["file"]).exists() and path.stat().st_size == 0
+    assert log_segments.last_head(str(path)) == "h2"
+
+    _append(path, [_rec(3), _rec(4, pid="p2")])
+    files = log_segments.segment_files(str(path))
+    assert files[-1] == str(path) and len(files) == 2
+    # the sealed segment's sidecar index moved with it
+    assert [r["i"] for r in participant_index.lookup(files[0], "p1")] == [0, 1, 2]
+    assert [r["i"] for r in log_segments.iter_records(str(path))] == [0, 1, 2, 3, 4]
+
+
+def test_time_range_and_pruning(tmp_path):
+    path = tmp_path / "data_log.jsonl"
+    for batch in range(4):
+        _append(path, [_rec(batch * 10 + j) for j in range(2)])
+        log_segments.seal(str(path), keep=2)
+    manifest = log_segments.load_manifest(str(path))
+    assert [s["seq"] for s in manifest["segments"]] == [3, 4]
+    assert len(list(tmp_path.glob("data_log.jsonl.0*"))) == 2 + 2  # segments + index sidecars
+
+    got = log_segments.iter_records(str(path), since="2025-01-01T00:00:21+00:00",
+                                    until="2025-01-01T00:00:30+00:00")
+    assert [r["i"] for r in got] == [21, 30]
+
+
+def test_adopts_legacy_backups(tmp_path):
+    path = tmp_path / "consent_log.jsonl"
+    _append(tmp_path / "consent_log.jsonl.2", [_rec(0)])
+    _append(tmp_path / "consent_log.jsonl.1", [_rec(1)])
+    _append(path, [_rec(2)])
+    assert [r["i"] for r in log_segments.iter_records(str(path))] == [0, 1, 2]
+
+
+def test_legacy_backups_are_scanned_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "consent_log.jsonl")
+    _append(path + ".1", [_rec(0)])
+    scans = []
+    real_stats = log_segments.segment_stats
+    monkeypatch.setattr(log_segments, "segment_stats", lambda p: scans.append(p) or real_stats(p))
+
+    for _ in range(3):
+        log_segments.segment_files(path)
+    assert len(scans) == 1
+
+    log_segments.ensure_manifest(path)
+    assert json.load(open(log_segments.manifest_path(path)))["segments"][0]["file"] == "consent_log.jsonl.1"
+    log_segments.load_manifest(path)
+    assert len(scans) == 1
+
+
+def test_tail_pages_back_across_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_segments, "TAIL_BLOCK", 64)  # force lines to span blocks
+    path = tmp_path / "audit_log.jsonl"
+    for batch in range(3):
+        _append(path, [_rec(batch * 10 + j) for j in range(4)])
+        if batch < 2:
+            log_segments.seal(str(path), keep=5)
+    with open(path, "ab") as f:
+        f.write(b'{"ts": "torn')  # in-flight line is not returned
+
+    seen, before = [], None
+    while True:
+        page, before = log_segments.tail(str(path), 3, before)
+        seen = [r["i"] for r in page] + seen
+        if before is None:
+            break
+    assert seen == [0, 1, 2, 3, 10, 11, 12, 13, 20, 21, 22, 23]
+
+    page, before = log_segments.tail(str(path), 2)
+    assert [r["i"] for r in page] == [22, 23]
+    # a cursor into the live log survives sealing it
+    log_segments.seal(str(path), keep=5)
+    assert [r["i"] for r in log_segments.tail(str(path), 2, before)[0]] == [20, 21]
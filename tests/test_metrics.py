@@ -1,4 +1,7 @@
+import json
 import time
+
+import pytest
 from project.analyze_events import (
     compute_behavioral_metrics,
     compute_cognitive_metrics,
@@ -61,3 +64,176 @@ def test_cognitive_empty_modules_is_safe():
     assert m["type"] == "cognitive"
     assert m["modules"] == 0
     assert m["avg_accuracy"] == 0
+
+
+# ---------------------------
+# Incremental aggregate tests
+# ---------------------------
+
+def _use_tmp_store(monkeypatch, tmp_path):
+    import project.analyze_events as ae
+    monkeypatch.setattr(ae, "DATA_PATH", tmp_path / "session_data.json")
+    monkeypatch.setattr(ae, "STORE_DIR", tmp_path / "store")
+    monkeypatch.setattr(ae, "AGGREGATE_PATH", tmp_path / "store" / "aggregate.json")
+    monkeypatch.setattr(ae, "AGGREGATE_LOCK", tmp_path / "store" / "aggregate.lock")
+    monkeypatch.setattr(ae, "_STORE", None)
+    return ae
+
+
+def test_aggregate_matches_full_recompute(monkeypatch, tmp_path):
+    ae = _use_tmp_store(monkeypatch, tmp_path)
+    now = 1_700_000_000_000
+    sessions = []
+    for i in range(12):
+        if i % 3:
+            sessions.append({
+                "participant_id": f"p{i}", "task_id": "t",
+                "start_ts": now, "end_ts": now + 1000 * i,
+                "events": [{"type": "hint", "ts": now}, {"type": "retry", "ts": now + 400 * i}],
+            })
+        else:
+            sessions.append({"participant_id": f"p{i}", "task_id": "t", "modules": [
+                {"module_name": "m", "questions": [
+                    {"correct": i % 2 == 0, "time_taken_seconds": i, "hesitation_seconds": 1, "retries": 1},
+                ]},
+            ]})
+    for s in sessions:
+        ae.save_session_result(s)
+    # submits never write the aggregate state; reads catch it up
+    assert not ae.AGGREGATE_PATH.exists()
+
+    stored = ae.export_all()
+    assert ae.aggregate_metrics() == ae.aggregate_metrics(stored)
+    assert ae.aggregate_metrics()["count_total"] == 12
+
+    # erase starts a new store generation -> aggregate rebuilt from scratch
+    ae.erase_participant("p1")
+    assert ae.aggregate_metrics()["count_total"] == 11
+    assert ae.aggregate_metrics() == ae.aggregate_metrics(ae.export_all())
+
+
+def test_legacy_session_file_survives_migration(monkeypatch, tmp_path):
+    ae = _use_tmp_store(monkeypatch, tmp_path)
+    legacy = json.dumps([{"participant_id": "p1", "i": 0}, {"participant_id": "p2", "i": 1}])
+    ae.DATA_PATH.write_text(legacy, encoding="utf-8")
+
+    assert [r["i"] for r in ae.iter_sessions()] == [0, 1]
+    assert ae.DATA_PATH.read_text(encoding="utf-8") == legacy
+
+    # a reopened store does not import the legacy rows again
+    monkeypatch.setattr(ae, "_STORE", None)
+    ae.save_session_result({"participant_id": "p3", "i": 2})
+    assert [r["i"] for r in ae.iter_sessions()] == [0, 1, 2]
+
+
+# ---------------------------
+# Batch metrics tests
+# ---------------------------
+
+def test_behavioral_batch_matches_scalar():
+    import random
+    from project.analyze_events import compute_behavioral_metrics_batch
+
+    rng = random.Random(7)
+    now = 1_700_000_000_000
+    sessions = []
+    for i in range(300):
+        events = []
+        t = now
+        for _ in range(rng.randint(0, 12)):
+            t += rng.choice([50, 900, 1600, 4200])
+            ts = t + 0.5 if i % 7 == 0 else t
+            events.append({"type": rng.choice(["hint", "retry", "keypress", "click"]), "ts": ts})
+        if i % 11 == 0:
+            events.append({"type": "hint"})  # no ts -> counted but not in timeline
+        s = {"participant_id": f"p{i}", "events": events if i % 13 else None}
+        if i % 5:
+            s.update(start_ts=now, end_ts=now + rng.randint(0, 400_000))
+        sessions.append(s)
+
+    assert compute_behavioral_metrics_batch(sessions) == [compute_behavioral_metrics(s) for s in sessions]
+
+
+def test_columnar_snapshot_is_incremental(monkeypatch, tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    import project.metrics_table as mt
+    from project import columnar_export
+
+    ae = _use_tmp_store(monkeypatch, tmp_path)
+    monkeypatch.setattr(mt, "_TABLE", None)
+    monkeypatch.setattr(columnar_export, "_CACHE", {"generation": None, "rows": 0, "batches": []})
+    now = 1_700_000_000_000
+    for i in range(3):
+        ae.save_session_result({"participant_id": f"p{i}", "task_id": "t",
+                                "start_ts": now, "end_ts": now + 1000, "events": [{"type": "hint", "ts": now}]})
+    assert columnar_export.snapshot_table().num_rows == 3
+
+    ae.save_session_result({"participant_id": "p9", "task_id": "t", "modules": []})
+    table = pq.read_table(columnar_export.write_snapshot("parquet"))
+    assert table.num_rows == 4
+    assert len(columnar_export._CACHE["batches"]) == 2
+    assert table.column("participant_id").to_pylist() == ["p0", "p1", "p2", "p9"]
+    assert table.column("hints_used").to_pylist()[:3] == [1, 1, 1]
+
+
+def test_columnar_snapshot_retries_when_store_is_rewritten(monkeypatch, tmp_path):
+    pytest.importorskip("pyarrow")
+    import project.metrics_table as mt
+    from project import columnar_export
+
+    ae = _use_tmp_store(monkeypatch, tmp_path)
+    monkeypatch.setattr(mt, "_TABLE", None)
+    monkeypatch.setattr(columnar_export, "_CACHE", {"generation": None, "rows": 0, "batches": []})
+    for i in range(3):
+        ae.save_session_result({"participant_id": f"p{i}", "task_id": "t", "modules": []})
+
+    table = mt.get_metrics_table()
+    real_snapshot = table.snapshot_columns
+    erased = []
+
+    def erase_once(*args, **kwargs):
+        if not erased:
+            erased.append(ae.erase_participant("p0"))  # new store generation mid-snapshot
+        return real_snapshot(*args, **kwargs)
+
+    monkeypatch.setattr(table, "snapshot_columns", erase_once)
+    snap = columnar_export.snapshot_table()
+    assert snap.column("participant_id").to_pylist() == ["p1", "p2"]
+
+    # a store that never settles is an error, not an empty snapshot
+    monkeypatch.setattr(table, "snapshot_columns", lambda *a, **k: (-1, {}))
+    with pytest.raises(columnar_export.SnapshotUnavailable):
+        columnar_export.snapshot_table()
+
+
+def test_mixed_key_row_is_behavioral_and_null_fields_count_as_zero():
+    from project.analyze_events import session_metrics
+
+    now = 1_700_000_000_000
+    row = {"start_ts": now, "end_ts": now + 1000, "events": [{"type": "hint", "ts": now}],
+           "modules": [{"questions": [{"correct": True}]}]}
+    kind, m = session_metrics(row)
+    assert kind == "behavioral" and m["hints_used"] == 1
+
+    m = compute_cognitive_metrics({"modules": [{"questions": None},
+                                               {"questions": [{"correct": True, "retries": None}]}]})
+    assert (m["questions"], m["avg_retries"]) == (1, 0)
+
+
+def test_metrics_table_keeps_rows_around_a_malformed_one(monkeypatch, tmp_path):
+    import project.metrics_table as mt
+
+    ae = _use_tmp_store(monkeypatch, tmp_path)
+    now = 1_700_000_000_000
+    good = {"start_ts": now, "end_ts": now + 1000, "events": [{"type": "hint", "ts": now}]}
+    ae.save_session_result({**good, "session_id": "a"})
+    ae.save_session_result({"session_id": "bad", "events": "not-a-list"})
+    ae.save_session_result({**good, "session_id": "c"})
+
+    table = mt.MetricsTable().sync()
+    assert table.columns["session_key"] == ["a", "bad", "c"]
+    assert table.columns["kind"] == ["behavioral", "unknown", "behavioral"]
+    assert table.get("c")["hints_used"] == 1
+    # the cursor is past all three rows: nothing is re-added on the next sync
+    assert len(table.sync()) == 3
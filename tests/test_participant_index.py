@@ -0,0 +1,46 @@
+import json
+
+from project import participant_index
+
+# ---------------------------
+# Participant index tests
+# ---------------------------
+
+def _append(path, obj):
+    line = (json.dumps(obj) + "\n").encode("utf-8")
+    with open(path, "ab") as f:
+        f.write(line)
+        f.flush()
+        offset = f.tell() - len(line)
+    participant_index.record_append(str(path), offset, len(line), obj)
+
+
+def test_lookup_reads_only_indexed_lines(tmp_path):
+    log = tmp_path / "audit_log.jsonl"
+    _append(log, {"action": "consent_given", "actor": "participant:p1"})
+    _append(log, {"action": "host_block", "actor": None})
+    _append(log, {"participant_id": "p2", "result": "correct"})
+    _append(log, {"action": "export", "subject": "p1", "extra": {"count": 1}})
+
+    got = participant_index.lookup(str(log), "p1")
+    assert [r["action"] for r in got] == ["consent_given", "export"]
+    assert participant_index.lookup(str(log), "p2") == [{"participant_id": "p2", "result": "correct"}]
+    assert participant_index.lookup(str(log), "nobody") == []
+
+
+def test_index_heals_unindexed_tail_and_rewrites(tmp_path):
+    log = tmp_path / "data_log.jsonl"
+    _append(log, {"participant_id": "p1", "n": 1})
+    assert len(participant_index.lookup(str(log), "p1")) == 1
+
+    # line written without going through the index
+    with open(log, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"participant_id": "p1", "n": 2}) + "\n")
+    assert [r["n"] for r in participant_index.lookup(str(log), "p1")] == [1, 2]
+
+    # rewrite via temp file + move (new inode) -> index rebuilt
+    tmp = tmp_path / "rewrite.jsonl"
+    tmp.write_text(json.dumps({"participant_id": "p3"}) + "\n", encoding="utf-8")
+    tmp.replace(log)
+    assert participant_index.lookup(str(log), "p1") == []
+    assert participant_index.lookup(str(log), "p3") == [{"participant_id": "p3"}]
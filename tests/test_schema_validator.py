@@ -0,0 +1,49 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("jsonschema")
+
+from jsonschema import ValidationError
+
+from project.processors.schema_validator import SchemaValidator
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"n": {"type": "integer", "minimum": 0}},
+    "required": ["n"],
+}
+
+
+def _write(path, schema, mtime):
+    path.write_text(json.dumps(schema))
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_batch_reports_errors_per_item(tmp_path):
+    path = tmp_path / "schema.json"
+    _write(path, SCHEMA, 1_000_000_000)
+    v = SchemaValidator(str(path))
+
+    results = v.validate_batch([{"n": 1}, {"n": -1}, {}])
+    assert results[0] == []
+    assert results[1] == ["n: -1 is less than the minimum of 0"]
+    assert results[2] == ["'n' is a required property"]
+    with pytest.raises(ValidationError):
+        v.validate({"n": "x"})
+
+
+def test_reloads_when_schema_file_changes(tmp_path):
+    path = tmp_path / "schema.json"
+    _write(path, SCHEMA, 1_000_000_000)
+    v = SchemaValidator(str(path), check_interval=0)
+    assert v.is_valid({"n": 1})
+
+    _write(path, dict(SCHEMA, required=["n", "m"]), 2_000_000_000)
+    assert not v.is_valid({"n": 1})
+
+    # a broken edit keeps the last good validator
+    path.write_text("{not json")
+    os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+    assert v.validate_batch([{"n": 1, "m": 2}]) == [[]]
@@ -0,0 +1,60 @@
+from flask import Flask, jsonify
+
+from project.security_pipeline import RequestContext, SecurityPipeline, server_timing
+
+
+def _parse(raw):
+    name, _, sig = raw.partition("|")
+    return name if sig == "ok" else None
+
+
+def test_stages_run_in_order_and_stop_at_first_response():
+    app = Flask(__name__)
+    pipeline = SecurityPipeline()
+    seen = []
+
+    @pipeline.stage("host")
+    def host(ctx):
+        seen.append("host")
+        return (jsonify({"error": "host_not_allowed"}), 403) if ctx.host != "localhost" else None
+
+    @pipeline.stage("hp_cookie")
+    def hp_cookie(ctx):
+        seen.append("hp_cookie")
+        return None
+
+    with app.test_request_context("/x", headers={"Host": "localhost:5000", "Cookie": "hp_field=hp_a|ok"}):
+        from flask import request
+        ctx = RequestContext(request, _parse, "hp_website")
+        assert pipeline.run(ctx) is None
+        assert (ctx.host, ctx.hp_name, ctx.hp_fields()) == ("localhost", "hp_a", ["hp_a", "hp_a|ok"])
+
+    with app.test_request_context("/x", headers={"Host": "evil.example"}):
+        from flask import request
+        ctx = RequestContext(request, _parse, "hp_website")
+        assert pipeline.run(ctx)[1] == 403
+        assert ctx.hp_name == "hp_website"
+
+    assert seen == ["host", "hp_cookie", "host"]
+    assert [name for name, _ in ctx.timings] == ["host"]
+    assert server_timing(ctx).startswith("sec-host;dur=") and ", sec;dur=" in server_timing(ctx)
+    assert pipeline.stats()["host"]["count"] == 2
+
+
+def test_on_demand_stage_runs_once_and_body_is_parsed_once():
+    app = Flask(__name__)
+    pipeline = SecurityPipeline()
+    calls = []
+
+    @pipeline.stage("tripwire", on_demand=True)
+    def tripwire(ctx):
+        calls.append(ctx.body)
+        return "blocked" if ctx.body.get(ctx.hp_name) else None
+
+    with app.test_request_context("/consent", method="POST", json={"hp_website": "x"}):
+        from flask import request
+        ctx = RequestContext(request, _parse, "hp_website")
+        assert pipeline.run(ctx) is None  # on-demand stages are not part of the chain
+        assert pipeline.run_stage(ctx, "tripwire") == "blocked"
+        assert pipeline.run_stage(ctx, "tripwire") == "blocked"
+        assert len(calls) == 1 and ctx.body is calls[0]
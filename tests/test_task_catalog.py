@@ -0,0 +1,40 @@
+import json
+import os
+import random
+
+from project.processors.task_catalog import TaskCatalog
+
+
+def _write(path, tasks, mtime):
+    path.write_text(json.dumps({"tasks": tasks}))
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_indexes_by_id_and_bucket(tmp_path):
+    path = tmp_path / "catalog.json"
+    tasks = [{"task_id": f"t{i}", "category": "c%d" % (i % 2), "difficulty": i % 3 + 1} for i in range(30)]
+    _write(path, tasks, 1_000_000_000)
+    cat = TaskCatalog(str(path))
+
+    assert cat.get("t7") == tasks[7]
+    assert cat.get("missing") is None
+    assert cat.get(["t7"]) is None and cat.get({"task_id": "t7"}) is None
+    expected = [t for t in tasks if t["category"] == "c1" and t["difficulty"] == 2]
+    assert cat.bucket("c1", 2) == expected
+    assert len(cat.bucket("c0")) == 15 and len(cat.bucket(difficulty=3)) == 10
+    assert cat.choose("c1", 2, rng=random.Random(0)) in expected
+    assert cat.choose("nope") is None
+
+
+def test_reloads_changed_file_and_keeps_last_good(tmp_path):
+    path = tmp_path / "catalog.json"
+    _write(path, [{"task_id": "a", "category": "x", "difficulty": 1}], 1_000_000_000)
+    cat = TaskCatalog(str(path), check_interval=0)
+    assert len(cat) == 1
+
+    _write(path, [{"task_id": "a"}, {"task_id": "b", "category": "x", "difficulty": 1}], 2_000_000_000)
+    assert cat.get("b") is not None and len(cat) == 2
+
+    path.write_text("{broken")
+    os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+    assert cat.get("b") is not None
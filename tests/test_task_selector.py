@@ -0,0 +1,58 @@
+import json
+
+from project.processors.task_catalog import TaskCatalog
+from project.processors.task_selector import TaskSelector
+
+
+def _catalog(tmp_path):
+    tasks = [{"task_id": f"d{d}_{i}", "category": "c", "difficulty": d} for d in (1, 2, 3) for i in range(4)]
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"tasks": tasks}))
+    return TaskCatalog(str(path))
+
+
+def _response(pid, task_id, accuracy):
+    return {"event_type": "task_response", "participant_id": pid, "task_id": task_id,
+            "metrics": {"response_time_ms": 100, "accuracy": accuracy}}
+
+
+def test_picks_unseen_tasks_and_steps_difficulty(tmp_path):
+    log = [_response("p", "d1_0", 1), _response("p", "d1_1", 1)]
+    sel = TaskSelector(_catalog(tmp_path), lambda: iter(log))
+    assert sel.build() == 2
+
+    task = sel.next_task("p")
+    assert task["difficulty"] == 1 and task["task_id"] not in ("d1_0", "d1_1")
+
+    sel.observe(_response("p", task["task_id"], 1))  # third correct answer -> level 2
+    assert sel.state("p")["difficulty"] == 2
+    assert sel.next_task("p")["difficulty"] == 2
+
+    for i in range(3):
+        sel.observe(_response("p", f"d2_{i}", 0))
+    assert sel.state("p")["difficulty"] == 1
+
+
+def test_falls_back_to_nearest_difficulty_when_bucket_is_exhausted(tmp_path):
+    sel = TaskSelector(_catalog(tmp_path), lambda: iter([]))
+    sel.build()
+    for i in range(4):
+        sel.observe({"event_type": "task_response", "participant_id": "q",
+                     "task_id": f"d1_{i}", "metrics": {"response_time_ms": 1}})
+    assert sel.next_task("q")["difficulty"] == 2
+    assert sel.next_task("q", difficulty=1)["task_id"].startswith("d1_")  # repeats once all are seen
+
+
+def test_state_is_only_kept_for_known_participants_and_bounded(tmp_path, monkeypatch):
+    from project.processors import task_selector
+
+    sel = TaskSelector(_catalog(tmp_path), lambda: iter([]))
+    sel.build()
+    for i in range(100):
+        assert sel.next_task(f"probe{i}")["difficulty"] == 1
+    assert sel.state("probe0") is None and len(sel._state) == 0
+
+    monkeypatch.setattr(task_selector, "MAX_PARTICIPANTS", 2)
+    for pid in ("a", "b", "c"):
+        sel.observe(_response(pid, "d1_0", 1))
+    assert sel.state("a") is None and sel.state("c")["seen"] == 1